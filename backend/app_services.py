@@ -0,0 +1,39 @@
+"""
+Heavy services and their FastAPI dependencies.
+
+Importing the service modules is cheap: their singletons load nothing when
+constructed. The app lifespan validates the encryption key, and the
+expensive part (training the fraud model with sklearn/numpy, creating the
+web3 client and deploying the contract) runs as the background warm-up in
+health.py. Route handlers receive the services through the get_*
+dependencies, which read app.state, so tests can swap them with
+app.dependency_overrides.
+"""
+from fastapi import Request
+
+from blockchain_client import BlockchainClient, blockchain_client
+from ipfs_service import IPFSService, ipfs_service
+from ml_service import MLService, ml_service
+
+
+def attach_services(app):
+    app.state.ml_service = ml_service
+    app.state.ipfs_service = ipfs_service
+    app.state.blockchain_client = blockchain_client
+
+
+def check_configuration(state):
+    """Fail the boot on configuration errors (no I/O, so it runs before warm-up)"""
+    state.ipfs_service.encryption_service.load()
+
+
+def get_ml_service(request: Request) -> MLService:
+    return request.app.state.ml_service
+
+
+def get_ipfs_service(request: Request) -> IPFSService:
+    return request.app.state.ipfs_service
+
+
+def get_blockchain_client(request: Request) -> BlockchainClient:
+    return request.app.state.blockchain_client
@@ -1,11 +1,16 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
 import os
+import time
+import hashlib
 import secrets
 from dotenv import load_dotenv
 
@@ -20,7 +25,33 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Roles anyone may pick at /register; others (admin) are assigned server-side only.
+# Rate limits follow the role, so this also caps the tier a new account gets.
+SELF_REGISTER_ROLES = frozenset(
+    r.strip() for r in os.getenv("SELF_REGISTER_ROLES", "patient,hospital,insurer").split(",") if r.strip()
+)
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Revoked access tokens are shared by all workers through Redis (unset = this worker only)
+TOKEN_DENYLIST_URL = os.getenv("TOKEN_DENYLIST_URL", os.getenv("REDIS_URL"))
+TOKEN_DENYLIST_TIMEOUT_SECONDS = float(os.getenv("TOKEN_DENYLIST_TIMEOUT_SECONDS", "0.5"))
+TOKEN_DENYLIST_SYNC_SECONDS = float(os.getenv("TOKEN_DENYLIST_SYNC_SECONDS", "1"))
+# Past this lag behind Redis, fail closed (503 for authenticated requests) or open (accept)
+TOKEN_DENYLIST_MAX_LAG_SECONDS = float(os.getenv("TOKEN_DENYLIST_MAX_LAG_SECONDS", "30"))
+TOKEN_DENYLIST_FAIL_CLOSED = os.getenv("TOKEN_DENYLIST_FAIL_CLOSED", "true").lower() == "true"
+# bcrypt runs on a dedicated pool; beyond MAX_PENDING queued jobs requests get 503
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Hashes below BCRYPT_ROUNDS are upgraded transparently at the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 # Pydantic Models
@@ -52,13 +83,80 @@ class PasswordReset(BaseModel):
 class PasswordResetRequest(BaseModel):
     email: EmailStr
 
-# Password Hashing
+# Password Hashing (sync - scripts)
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# Password Hashing (async - request handlers)
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded thread pool so it never blocks the event loop
+    (bcrypt releases the GIL while hashing). Requests beyond max_pending are
+    rejected with 503 instead of queueing without limit.
+    """
+    
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+    
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        queued_at = time.perf_counter()
+        
+        def job():
+            wait = time.perf_counter() - queued_at
+            return fn(*args), wait
+        
+        try:
+            result, wait = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.total_queue_wait += wait
+        self.max_queue_wait = max(self.max_queue_wait, wait)
+        return result
+    
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also returns a new hash when the stored one uses outdated settings"""
+        valid, new_hash = await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+    
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_queue_wait_ms": (self.total_queue_wait / self.completed * 1000) if self.completed else 0.0,
+            "max_queue_wait_ms": self.max_queue_wait * 1000,
+        }
+
+password_hasher = PasswordHasher()
+
 # Token Generation
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -66,40 +164,230 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "type": "access"})
+    # jti names the token in the shared denylist when it is revoked
+    to_encode.update({"exp": expire, "type": "access", "jti": secrets.token_urlsafe(12)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # jti keeps tokens issued to the same user in the same second distinct
+    to_encode.update({"exp": expire, "type": "refresh", "jti": secrets.token_urlsafe(12)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def create_password_reset_token() -> str:
     return secrets.token_urlsafe(32)
 
-# Token Verification
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# Verified Token Cache
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified access tokens, keyed by SHA-256 digest.
+    Entries live until the token's exp, so a hit skips the HS256 check and
+    claim parsing. Revocation is checked separately, in RevokedTokenStore.
+    """
+    
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[float, Optional[str], TokenData]]" = OrderedDict()
+    
+    def get(self, digest: bytes) -> Optional[Tuple[Optional[str], TokenData]]:
+        """(jti, token data) of a cached, unexpired token"""
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        exp, jti, token_data = entry
+        if exp <= time.time():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return jti, token_data
+    
+    def put(self, digest: bytes, exp: float, jti: Optional[str], token_data: TokenData):
+        self._entries[digest] = (exp, jti, token_data)
+        self._entries.move_to_end(digest)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def revoke(self, digest: bytes):
+        self._entries.pop(digest, None)
+    
+    def clear(self):
+        self._entries.clear()
+
+token_cache = VerifiedTokenCache()
+
+class DenylistUnavailable(Exception):
+    """The revoked-token set is too far behind Redis to trust (fail closed)"""
+
+class RevokedTokenStore:
+    """
+    Revoked access token ids (jti), shared by all workers. Requests only look
+    them up in a local dict; no Redis call is made on the request path.
+    Revocations are appended to a Redis stream, trimmed to the access token
+    lifetime, and sync_loop() reads new entries into the dict every
+    TOKEN_DENYLIST_SYNC_SECONDS (redis.asyncio, on the event loop).
+
+    If the dict has not caught up with Redis for TOKEN_DENYLIST_MAX_LAG_SECONDS,
+    lookups raise DenylistUnavailable when TOKEN_DENYLIST_FAIL_CLOSED (the
+    default) and are answered from the stale dict otherwise. Without a
+    TOKEN_DENYLIST_URL revocations only reach this worker.
+    """
+    
+    def __init__(self, url: Optional[str] = TOKEN_DENYLIST_URL, key: str = "mumbai_hacks:revoked",
+                 max_lag: float = TOKEN_DENYLIST_MAX_LAG_SECONDS, fail_closed: bool = TOKEN_DENYLIST_FAIL_CLOSED):
+        self.url = url
+        self.key = key
+        self.max_lag = max_lag
+        self.fail_closed = fail_closed
+        self._revoked = {}  # jti -> exp
+        self._client = None
+        self._last_id: Optional[bytes] = None
+        # The first sync gets max_lag from startup before lookups fail
+        self._synced_at = time.monotonic()
+    
+    def _redis(self):
+        if self._client is None:
+            import redis.asyncio
+            self._client = redis.asyncio.Redis.from_url(
+                self.url,
+                socket_timeout=TOKEN_DENYLIST_TIMEOUT_SECONDS,
+                socket_connect_timeout=TOKEN_DENYLIST_TIMEOUT_SECONDS
+            )
+        return self._client
+    
+    def _remember(self, jti: str, exp: float):
+        now = time.time()
+        if exp <= now:
+            return
+        if len(self._revoked) >= TOKEN_CACHE_SIZE:
+            self._revoked = {j: e for j, e in self._revoked.items() if e > now}
+        self._revoked[jti] = exp
+    
+    async def add(self, jti: str, exp: float) -> bool:
+        """Deny jti here at once and on the other workers at their next sync"""
+        self._remember(jti, exp)
+        if not self.url:
+            return False
+        oldest = int((time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60) * 1000)
+        try:
+            await self._redis().xadd(self.key, {"jti": jti, "exp": repr(exp)}, minid=oldest)
+            return True
+        except Exception as e:
+            print(f"[!] Token denylist unreachable ({e}); revocation of {jti} only reaches this worker")
+            return False
+    
+    async def sync(self) -> int:
+        """Read revocations added since the last sync; returns how many"""
+        client = self._redis()
+        if self._last_id is None:
+            # Older entries are for tokens that have expired
+            self._last_id = f"{int((time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60) * 1000)}-0".encode()
+        count = 0
+        while True:
+            response = await client.xread({self.key: self._last_id}, count=1000)
+            entries = response[0][1] if response else []
+            for entry_id, fields in entries:
+                self._remember(fields[b"jti"].decode(), float(fields[b"exp"]))
+                self._last_id = entry_id
+            count += len(entries)
+            if len(entries) < 1000:
+                break
+        self._synced_at = time.monotonic()
+        return count
+    
+    async def sync_loop(self, interval: float = TOKEN_DENYLIST_SYNC_SECONDS):
+        failing = False
+        while True:
+            try:
+                await self.sync()
+                if failing:
+                    print("[+] Token denylist reachable again")
+                failing = False
+            except Exception as e:
+                if not failing:
+                    print(f"[!] Token denylist sync failed ({e}); {'failing closed' if self.fail_closed else 'accepting tokens'} after {self.max_lag:.0f}s")
+                failing = True
+            await asyncio.sleep(interval)
+    
+    def contains(self, jti: str) -> bool:
+        """Whether jti is revoked; raises DenylistUnavailable when stale and failing closed"""
+        exp = self._revoked.get(jti)
+        if exp is not None:
+            if exp > time.time():
+                return True
+            del self._revoked[jti]
+        if self.url and self.fail_closed and time.monotonic() - self._synced_at > self.max_lag:
+            raise DenylistUnavailable(f"token denylist not synced for {time.monotonic() - self._synced_at:.0f}s")
+        return False
+
+revoked_tokens = RevokedTokenStore()
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+def refresh_token_lookup(token: str) -> Tuple[int, str]:
+    """(lookup_key, token_hash) under which a refresh token is stored"""
+    digest = token_digest(token)
+    return int.from_bytes(digest[:8], "big", signed=True), digest.hex()
+
+async def revoke_token(token: str):
+    """Deny an access token on every worker for the rest of its lifetime"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        return
+    exp = claims.get("exp")
+    if exp is None:
+        exp = time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    digest = token_digest(token)
+    token_cache.revoke(digest)
+    # Tokens issued before access tokens carried a jti are denied by digest
+    await revoked_tokens.add(claims.get("jti") or digest.hex(), float(exp))
+
+# Token Verification
+def verify_access_token(token: str, check_revoked: bool = True) -> Optional[TokenData]:
+    """Claims of a valid, unrevoked access token (cached), else None"""
+    digest = token_digest(token)
+    cached = token_cache.get(digest)
+    if cached is not None:
+        jti, token_data = cached
+    else:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
         user_id: int = payload.get("user_id")
         username: str = payload.get("sub")
         role: str = payload.get("role")
         token_type: str = payload.get("type")
         
         if username is None or user_id is None or token_type != "access":
-            raise credentials_exception
-            
+            return None
+        
+        jti = payload.get("jti")
         token_data = TokenData(user_id=user_id, username=username, role=role)
-    except JWTError:
-        raise credentials_exception
+        exp = payload.get("exp")
+        if exp is not None:
+            token_cache.put(digest, float(exp), jti, token_data)
+    
+    # Checked on cache hits too: another worker may have revoked it since
+    if check_revoked and revoked_tokens.contains(jti or digest.hex()):
+        return None
+    return token_data
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    try:
+        token_data = verify_access_token(token)
+    except DenylistUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    if token_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return token_data
 
 async def get_current_active_user(current_user: TokenData = Depends(get_current_user)):
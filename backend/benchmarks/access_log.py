@@ -0,0 +1,78 @@
+"""
+Request-path cost of the access log.
+
+    python benchmarks/access_log.py --requests 200000
+
+Calls a trivial ASGI app directly (no HTTP client, no server) with and
+without AccessLogMiddleware and reports the difference per request: the
+cost every API request pays. The writer thread is then timed separately
+while it formats the buffered entries to a null handler; that work runs off
+the request path (on other cores when available).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from middleware.access_log import AccessLogMiddleware, AccessLogWriter
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"status":"ok"}'})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_scope():
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/claims",
+        "headers": [(b"host", b"bench"), (b"authorization", b"Bearer x")],
+        "client": ("127.0.0.1", 1234),
+    }
+
+
+async def per_request_us(handler, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        await handler(make_scope(), receive, send)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Access log overhead")
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("access-benchmark")
+    logger.addHandler(logging.NullHandler())
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    writer = AccessLogWriter(logger, sample_rate=args.sample_rate, maxsize=args.requests + 1)
+
+    bare = await per_request_us(app, args.requests)
+    logged = await per_request_us(AccessLogMiddleware(app, writer=writer), args.requests)
+    start = time.perf_counter()
+    writer.flush()
+    drain = time.perf_counter() - start
+
+    print(f"bare app             {bare:6.2f}µs/request")
+    print(f"with access log      {logged:6.2f}µs/request  (+{logged - bare:.2f}µs on the request path)")
+    print(f"writer thread        {drain / args.requests * 1e6:6.2f}µs/entry off the request path; stats: {writer.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,443 @@
+"""
+Reproducible end-to-end load test: boots the API with local stand-ins and
+drives a traffic mix at a fixed arrival rate.
+
+    python benchmarks/api_load.py --rate 50 --duration 60
+    python benchmarks/api_load.py --rate 50 --duration 60 --database-url postgresql://postgres@127.0.0.1:5432/mumbai_hacks
+    python benchmarks/api_load.py --rate 50 --rpc-url http://127.0.0.1:8545      # a local Hardhat node
+    python benchmarks/api_load.py --mix submit=1,list=4,status=3 --compare api_load-1a2b3c4d.json
+
+The script starts benchmarks/standins.py (fake Pinata/IPFS gateway and, unless
+--rpc-url is given, an in-process chain stub) and one uvicorn worker of the
+API, each on a free port, with the database from --database-url (default: a
+fresh SQLite file in a temp dir). It seeds hospitals and --users users, waits
+for /readyz, and then sends requests open-loop: arrivals follow a fixed
+schedule (or Poisson with --poisson) whether or not earlier requests have
+finished, and latency is measured from the scheduled send time, so a slow
+server shows up as latency instead of as a lower request rate
+(no coordinated omission). Arrivals that would exceed --max-in-flight are
+counted as dropped.
+
+Operations: submit (POST /api/claims/submit), list (GET /api/claims),
+status (GET /api/claims/{id}), stats (GET /api/stats), login
+(POST /api/auth/login). Results per operation and overall (throughput,
+p50/p95/p99/max latency, errors by status) are written to --output together
+with the git commit, arguments and environment, so runs from two commits can
+be compared with --compare; --max-regression makes the comparison exit 1
+when a p95/p99 or the error rate gets worse by more than that percentage.
+The API's log goes to <output>.log.
+
+Requires: pip install httpx
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPERATIONS = ("submit", "list", "status", "stats", "login")
+DEFAULT_MIX = "submit=10,list=40,status=30,stats=15,login=5"
+HOSPITAL_IDS = [f"APOLLO-DEL-{i:03d}" for i in range(1, 11)]
+PASSWORD = "bench-password-1"
+
+SEED = """
+import sys
+import database
+import models.user  # registers the users table for init_db
+database.init_db()
+db = database.SessionLocal()
+existing = {h.hospital_id for h in db.query(database.Hospital.hospital_id)}
+for hospital_id in sys.argv[1:]:
+    if hospital_id not in existing:
+        db.add(database.Hospital(hospital_id=hospital_id, name=hospital_id, address="Load test"))
+db.commit()
+db.close()
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_meta() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r} (expected one of {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def wait_http(url: str, timeout: float, process: subprocess.Popen, expect=(200,)):
+    deadline = time.monotonic() + timeout
+    last = None
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"process exited with code {process.returncode} before {url} came up")
+        try:
+            response = httpx.get(url, timeout=2)
+            if response.status_code in expect:
+                return
+            last = f"{response.status_code} {response.text[:300]}"
+        except httpx.HTTPError as e:
+            last = repr(e)
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s (last: {last})")
+
+
+def stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@contextmanager
+def stack(args, log_path: str):
+    """Start the stand-ins and the API; yield the API base URL"""
+    workdir = tempfile.mkdtemp(prefix="api_load-")
+    processes = []
+    log = open(log_path, "w")
+    try:
+        standins_url = f"http://127.0.0.1:{free_port()}"
+        standins = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "standins.py"),
+             "--port", standins_url.rsplit(":", 1)[1],
+             "--ipfs-latency-ms", str(args.ipfs_latency_ms), "--chain-latency-ms", str(args.chain_latency_ms)],
+            stdout=log, stderr=subprocess.STDOUT,
+        )
+        processes.append(standins)
+        wait_http(f"{standins_url}/ipfs/missing", 30, standins, expect=(404,))
+
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(workdir, 'load.sqlite')}",
+            "BLOCKCHAIN_RPC_URL": args.rpc_url or f"{standins_url}/rpc",
+            # Empty key: deploy and submit from the node's first unlocked account
+            "PRIVATE_KEY": "",
+            "PINATA_API_KEY": "load-test",
+            "PINATA_SECRET_API_KEY": "load-test",
+            "PINATA_API_URL": standins_url,
+            "IPFS_GATEWAY_URL": standins_url,
+            "RATE_LIMIT_STORAGE_URI": "memory://",
+            "RATE_LIMITS": "admin=1000000/minute,insurer=1000000/minute,hospital=1000000/minute,patient=1000000/minute,anonymous=1000000/minute",
+            "ACCESS_LOG_SAMPLE_RATE": "0",
+            "TRACE_EXPORT_PATH": os.path.join(workdir, "traces.jsonl"),
+            "PYTHONUNBUFFERED": "1",
+        })
+        env.setdefault("SECRET_KEY", secrets.token_urlsafe(32))
+        env.setdefault("ENCRYPTION_KEY", "ZmDfcTF7_60GrrY167zsiPd67pEvs0aGOv2oasOM1Pg=")
+        for name, value in args.env:
+            env[name] = value
+
+        seed = subprocess.run([sys.executable, "-c", SEED, *HOSPITAL_IDS],
+                              cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if seed.returncode != 0:
+            raise RuntimeError(f"seeding the database failed:\n{seed.stderr[-2000:]}")
+
+        api_url = f"http://127.0.0.1:{free_port()}"
+        api = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", api_url.rsplit(":", 1)[1], "--workers", "1", "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        processes.append(api)
+        wait_http(f"{api_url}/readyz", args.ready_timeout, api)
+        yield api_url
+    finally:
+        for process in reversed(processes):
+            stop(process)
+        log.close()
+
+
+class LoadState:
+    """Tokens and claim ids shared by the generated requests"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.users = []
+        self.tokens = []
+        self.claim_ids = []
+
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    def claim_payload(self) -> dict:
+        n = self.rng.randrange(1_000_000)
+        return {
+            "hospital_id": self.rng.choice(HOSPITAL_IDS),
+            "amount": round(self.rng.uniform(500, 250000), 2),
+            "currency": "INR",
+            "patient_details": {"name": f"Patient {n}", "id": f"P{n}"},
+            "diagnosis": self.rng.choice(("Dengue fever", "Appendectomy", "Fractured radius", "Type 2 diabetes")),
+        }
+
+
+async def login(client: httpx.AsyncClient, username: str) -> httpx.Response:
+    return await client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+
+
+async def prepare(client: httpx.AsyncClient, state: LoadState, users: int, claims: int):
+    """Register and log in the users, then submit the claims that status/list read"""
+    prefix = f"load{secrets.token_hex(3)}"
+    for i in range(users):
+        username = f"{prefix}_{i}"
+        response = await client.post("/api/auth/register", json={
+            "email": f"{username}@example.com", "username": username, "password": PASSWORD,
+            "full_name": f"Load User {i}", "role": "hospital",
+        })
+        response.raise_for_status()
+        response = await login(client, username)
+        response.raise_for_status()
+        state.users.append(username)
+        state.tokens.append(response.json()["access_token"])
+    for _ in range(claims):
+        response = await client.post("/api/claims/submit", json=state.claim_payload(), headers=state.headers())
+        response.raise_for_status()
+        state.claim_ids.append(response.json()["claim_id"])
+
+
+async def send(client: httpx.AsyncClient, state: LoadState, operation: str) -> httpx.Response:
+    if operation == "submit":
+        response = await client.post("/api/claims/submit", json=state.claim_payload(), headers=state.headers())
+        if response.status_code == 200:
+            state.claim_ids.append(response.json()["claim_id"])
+        return response
+    if operation == "list":
+        return await client.get("/api/claims", params={"limit": 50, "skip": state.rng.randrange(0, 100, 10)}, headers=state.headers())
+    if operation == "status":
+        return await client.get(f"/api/claims/{state.rng.choice(state.claim_ids)}", headers=state.headers())
+    if operation == "stats":
+        return await client.get("/api/stats", headers=state.headers())
+    return await login(client, state.rng.choice(state.users))
+
+
+async def drive(client: httpx.AsyncClient, state: LoadState, args) -> dict:
+    """Send arrivals on schedule; return the samples recorded after warm-up"""
+    operations = list(args.mix)
+    weights = [args.mix[name] for name in operations]
+    samples = {name: [] for name in operations}
+    errors = {name: {} for name in operations}
+    dropped = 0
+    max_lag = 0.0
+    in_flight = set()
+
+    async def request(operation: str, scheduled: float, record: bool):
+        try:
+            response = await send(client, state, operation)
+            outcome = response.status_code
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        latency = time.perf_counter() - scheduled
+        if not record:
+            return
+        if outcome == 200:
+            samples[operation].append(latency)
+        else:
+            errors[operation][str(outcome)] = errors[operation].get(str(outcome), 0) + 1
+
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    end = measure_from + args.duration
+    scheduled = start
+    while scheduled < end:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        record = scheduled >= measure_from
+        if record:
+            max_lag = max(max_lag, time.perf_counter() - scheduled)
+        operation = state.rng.choices(operations, weights)[0]
+        if len(in_flight) >= args.max_in_flight:
+            dropped += record
+        else:
+            task = asyncio.create_task(request(operation, scheduled, record))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        scheduled += state.rng.expovariate(args.rate) if args.poisson else 1 / args.rate
+    if in_flight:
+        await asyncio.wait(in_flight)
+    return {"samples": samples, "errors": errors, "dropped": dropped, "generator_max_lag_ms": max_lag * 1000}
+
+
+def percentile(ordered: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: list, errors: dict, duration: float) -> dict:
+    ordered = sorted(latencies)
+    error_count = sum(errors.values())
+    total = len(ordered) + error_count
+    summary = {
+        "requests": total,
+        "ok": len(ordered),
+        "errors": error_count,
+        "errors_by_status": errors,
+        "error_rate": error_count / total if total else 0.0,
+        "throughput_rps": len(ordered) / duration,
+    }
+    if ordered:
+        summary.update({
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p95_ms": percentile(ordered, 95) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+            "max_ms": ordered[-1] * 1000,
+            "mean_ms": sum(ordered) / len(ordered) * 1000,
+        })
+    return summary
+
+
+def report(result: dict) -> dict:
+    duration = result["meta"]["args"]["duration"]
+    operations = {
+        name: summarize(latencies, result["raw"]["errors"][name], duration)
+        for name, latencies in result["raw"]["samples"].items()
+    }
+    all_errors = {}
+    for errors in result["raw"]["errors"].values():
+        for status, count in errors.items():
+            all_errors[status] = all_errors.get(status, 0) + count
+    overall = summarize([x for latencies in result["raw"]["samples"].values() for x in latencies], all_errors, duration)
+    overall["dropped"] = result["raw"]["dropped"]
+    overall["generator_max_lag_ms"] = result["raw"]["generator_max_lag_ms"]
+    return {"overall": overall, "operations": operations}
+
+
+def print_summary(summary: dict):
+    print(f"{'operation':10s} {'requests':>9s} {'errors':>7s} {'rps':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}")
+    rows = list(summary["operations"].items()) + [("overall", summary["overall"])]
+    for name, s in rows:
+        print(f"{name:10s} {s['requests']:9d} {s['errors']:7d} {s['throughput_rps']:8.1f} "
+              f"{s.get('p50_ms', 0):8.1f} {s.get('p95_ms', 0):8.1f} {s.get('p99_ms', 0):8.1f} {s.get('max_ms', 0):8.1f}")
+    overall = summary["overall"]
+    print(f"dropped: {overall['dropped']}   generator max lag: {overall['generator_max_lag_ms']:.1f} ms")
+    if overall["errors_by_status"]:
+        print(f"errors by status: {overall['errors_by_status']}")
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> bool:
+    """Print the change against a baseline run; False if anything regressed past the limit"""
+    print(f"\nvs {baseline['meta']['git'].get('commit', '?')[:10]} ({baseline['meta']['timestamp']}):")
+    ok = True
+    names = [n for n in current["summary"]["operations"] if n in baseline["summary"]["operations"]] + ["overall"]
+    for name in names:
+        if name == "overall":
+            now, before = current["summary"]["overall"], baseline["summary"]["overall"]
+        else:
+            now, before = current["summary"]["operations"][name], baseline["summary"]["operations"][name]
+        deltas = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if before.get(metric) and now.get(metric) is not None:
+                change = (now[metric] - before[metric]) / before[metric] * 100
+                deltas.append(f"{metric} {before[metric]:.1f} -> {now[metric]:.1f} ({change:+.0f}%)")
+                if max_regression is not None and metric in ("p95_ms", "p99_ms") and change > max_regression:
+                    ok = False
+        error_change = (now["error_rate"] - before["error_rate"]) * 100
+        deltas.append(f"error rate {before['error_rate']:.2%} -> {now['error_rate']:.2%}")
+        if max_regression is not None and error_change > max_regression:
+            ok = False
+        print(f"  {name:10s} " + ", ".join(deltas))
+    differing = [key for key in ("rate", "mix", "poisson") if current["meta"]["args"][key] != baseline["meta"]["args"].get(key)]
+    differing += [key for key in ("database", "chain") if current["meta"][key] != baseline["meta"].get(key)]
+    if differing:
+        print(f"  [!] {', '.join(differing)} differ from the baseline run")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end API load test with local stand-ins")
+    parser.add_argument("--rate", type=float, default=20, help="arrivals per second")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of traffic before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of a fixed interval")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--claims", type=int, default=50, help="claims submitted before the run")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--database-url", help="default: a fresh SQLite file")
+    parser.add_argument("--rpc-url", help="JSON-RPC node to use instead of the chain stub (e.g. Hardhat)")
+    parser.add_argument("--ipfs-latency-ms", type=float, default=20)
+    parser.add_argument("--chain-latency-ms", type=float, default=5)
+    parser.add_argument("--env", action="append", default=[], type=lambda s: tuple(s.split("=", 1)),
+                        metavar="NAME=VALUE", help="extra environment for the API (repeatable)")
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--output", help="result JSON (default api_load-<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE_JSON")
+    parser.add_argument("--max-regression", type=float, help="exit 1 if p95/p99 or error rate worsen by more than this percent")
+    args = parser.parse_args()
+
+    git = git_meta()
+    output = args.output or f"api_load-{(git['commit'] or 'unknown')[:8]}.json"
+    state = LoadState(random.Random(args.seed))
+
+    async def run(api_url: str):
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=api_url, timeout=60, limits=limits) as client:
+            await prepare(client, state, args.users, args.claims)
+            print(f"[*] Driving {args.rate:g} req/s for {args.warmup:g}s warm-up + {args.duration:g}s")
+            return await drive(client, state, args)
+
+    print("[*] Starting stand-ins and API...")
+    with stack(args, output + ".log") as api_url:
+        raw = asyncio.run(run(api_url))
+
+    meta_args = {**vars(args), "mix": args.mix, "env": dict(args.env)}
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git": git,
+            "args": meta_args,
+            "database": (args.database_url or "sqlite (temp)").split("://", 1)[0].split("+", 1)[0],
+            "chain": "rpc" if args.rpc_url else "stub",
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "raw": raw,
+    }
+    result["summary"] = report(result)
+    del result["raw"]["samples"]
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print_summary(result["summary"])
+    print(f"[+] Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.max_regression):
+            print(f"[!] Regression above {args.max_regression}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
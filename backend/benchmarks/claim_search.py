@@ -0,0 +1,126 @@
+"""
+Claim search benchmark: p50/p95 latency of search_claims, split into the
+ranked page (candidate lookup and page queries) and the facet query.
+
+    python seed_data.py --claims 2000000                  # once
+    python benchmarks/claim_search.py --runs 20
+    python benchmarks/claim_search.py --explain -q "knee replacement"
+
+Runs against ASYNC_DATABASE_URL / DATABASE_URL from .env (PostgreSQL, with
+the search column from `python -m services.claim_search`). Each query runs
+once to warm the cache before it is timed. --explain prints EXPLAIN
+(ANALYZE, BUFFERS) for every statement of each query instead.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from database import AsyncSessionLocal, async_engine
+from services.claim_search import FACET_SCAN_LIMIT, RANK_CANDIDATE_LIMIT, search_claims
+import models.user  # noqa: F401 - register User for Claim.user relationship
+
+# Broad single terms, multi-term queries, rare terms and filters
+QUERIES = [
+    {"q": "fever"},
+    {"q": "fever dengue"},
+    {"q": "pneumonia"},
+    {"q": "knee replacement"},
+    {"q": "cancer chemotherapy"},
+    {"q": "type 2 diabetes"},
+    {"q": "appendectomy"},
+    {"q": "fractured"},
+    {"q": "fever", "status": "Rejected"},
+    {"q": "infection", "fraud_band": "high"},
+    {"status": "Settled", "min_amount": 50000},
+]
+
+statements = []
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _start(conn, cursor, statement, parameters, context, executemany):
+    context._bench_started = time.perf_counter()
+
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def _finish(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith("SELECT"):
+        statements.append((statement, parameters, (time.perf_counter() - context._bench_started) * 1000))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def label(query):
+    return " ".join(f"{key}={value}" for key, value in query.items())
+
+
+async def timed(query, runs):
+    """[(total_ms, page_ms, facets_ms)] over runs, after one warm-up run (the facet query runs last)"""
+    timings = []
+    async with AsyncSessionLocal() as db:
+        for run in range(runs + 1):
+            statements.clear()
+            start = time.perf_counter()
+            result = await search_claims(db, **query)
+            total = (time.perf_counter() - start) * 1000
+            if run:
+                timings.append((total, sum(ms for _, _, ms in statements[:-1]), statements[-1][2]))
+    return timings, result
+
+
+async def explain(query):
+    async with AsyncSessionLocal() as db:
+        statements.clear()
+        await search_claims(db, **query)
+        captured = list(statements)
+        connection = await db.connection()
+        for i, (statement, parameters, _) in enumerate(captured):
+            rows = (await connection.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)).all()
+            print(f"--- {label(query)}: {'facets' if i == len(captured) - 1 else f'statement {i + 1}'}")
+            print("\n".join(row[0] for row in rows))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Claim search benchmark")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("-q", "--query", help="benchmark only this search text")
+    parser.add_argument("--explain", action="store_true", help="print query plans instead of timings")
+    args = parser.parse_args()
+
+    if async_engine.dialect.name != "postgresql":
+        print("[!] The search benchmark needs the PostgreSQL full-text index")
+        return
+    queries = [{"q": args.query}] if args.query else QUERIES
+
+    try:
+        if args.explain:
+            for query in queries:
+                await explain(query)
+            return
+        print(f"[*] rank candidates={RANK_CANDIDATE_LIMIT} facet scan limit={FACET_SCAN_LIMIT} runs={args.runs}")
+        print(f"{'query':<36} {'matches':>8} {'p50':>8} {'p95':>8} {'page p50':>9} {'facets p50':>11}")
+        for query in queries:
+            timings, result = await timed(query, args.runs)
+            totals, pages, facets = zip(*timings)
+            matches = f"{result['total']}{'+' if result['total_is_estimate'] else ''}"
+            print(
+                f"{label(query):<36} {matches:>8} "
+                f"{statistics.median(totals):>6.1f}ms {percentile(totals, 0.95):>6.1f}ms "
+                f"{statistics.median(pages):>7.1f}ms {statistics.median(facets):>9.1f}ms"
+            )
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""
+Claim write-path benchmark: commits per claim and p50/p99 latency.
+
+Compares the old submit_claim persistence pattern (insert + commit + refresh,
+event + commit, final update + commit + refresh) with the current path (claim,
+events and settlement outbox row in one transaction, then the settlement in a
+second one).
+
+    python benchmarks/claim_write_path.py --claims 500
+
+Runs against ASYNC_DATABASE_URL / DATABASE_URL from .env. Rows created by the
+benchmark use a "BENCH-" claim id prefix and are removed afterwards.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, event, select
+
+from database import AsyncSessionLocal, async_engine, Claim, ClaimEvent, Hospital
+from services import settlement
+import models.user  # noqa: F401 - register User for Claim.user relationship
+
+commit_count = 0
+
+
+@event.listens_for(async_engine.sync_engine, "commit")
+def _count_commit(conn):
+    global commit_count
+    commit_count += 1
+
+
+def _claim(claim_id, hospital_id, **kwargs):
+    return Claim(
+        claim_id=claim_id,
+        hospital_id=hospital_id,
+        patient_name="Bench Patient",
+        patient_id="BENCH-P",
+        diagnosis="fever and infection",
+        amount=1500,
+        currency="INR",
+        **kwargs
+    )
+
+
+async def legacy_path(hospital_id):
+    """Persistence pattern of submit_claim before the unit-of-work change"""
+    claim_id = f"BENCH-{uuid.uuid4().hex[:16]}"
+    async with AsyncSessionLocal() as db:
+        db_claim = _claim(claim_id, hospital_id, status="Submitted", ipfs_hash="QmBench")
+        db.add(db_claim)
+        await db.commit()
+        await db.refresh(db_claim)
+
+        db.add(ClaimEvent(claim_id=claim_id, event_type="CLAIM_SUBMITTED", event_data={"amount": 1500}))
+        await db.commit()
+
+        db_claim.fraud_score = 5
+        db_claim.status = "Settled"
+        db_claim.tx_hash = "0xBench"
+        db.add(ClaimEvent(claim_id=claim_id, event_type="CLAIM_APPROVED", event_data={"fraud_score": 5}))
+        db.add(ClaimEvent(claim_id=claim_id, event_type="CLAIM_SETTLED", event_data={"tx_hash": "0xBench"}))
+        await db.commit()
+        await db.refresh(db_claim)
+
+
+async def unit_of_work_path(hospital_id):
+    """Current submit_claim persistence: claim, batched events and outbox row, then the settlement"""
+    claim_id = f"BENCH-{uuid.uuid4().hex[:16]}"
+    async with AsyncSessionLocal() as db:
+        db.add(_claim(
+            claim_id, hospital_id,
+            status="Submitted", fraud_score=5, ipfs_hash="QmBench"
+        ))
+        db.add_all([
+            ClaimEvent(claim_id=claim_id, event_type="CLAIM_SUBMITTED", event_data={"amount": 1500}),
+            ClaimEvent(claim_id=claim_id, event_type="CLAIM_APPROVED", event_data={"fraud_score": 5}),
+        ])
+        db.add(settlement.outbox_entry(claim_id))
+        await db.commit()
+        await settlement.record_settlement(db, claim_id, "0xBench")
+
+
+async def measure(name, fn, hospital_id, claims):
+    global commit_count
+    latencies = []
+    commit_count = 0
+    for _ in range(claims):
+        start = time.perf_counter()
+        await fn(hospital_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(
+        f"{name:<14} commits/claim={commit_count / claims:.2f} "
+        f"p50={statistics.median(latencies):.2f}ms "
+        f"p99={latencies[max(int(len(latencies) * 0.99) - 1, 0)]:.2f}ms"
+    )
+
+
+async def cleanup():
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ClaimEvent).where(ClaimEvent.claim_id.like("BENCH-%")))
+        await db.execute(delete(Claim).where(Claim.claim_id.like("BENCH-%")))
+        await db.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Claim write-path benchmark")
+    parser.add_argument("--claims", type=int, default=200)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        hospital = (await db.execute(select(Hospital))).scalars().first()
+    if not hospital:
+        print("[!] No hospitals found. Run 'python init_db.py' first.")
+        return
+
+    try:
+        await measure("legacy", legacy_path, hospital.hospital_id, args.claims)
+        await measure("unit-of-work", unit_of_work_path, hospital.hospital_id, args.claims)
+    finally:
+        await cleanup()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
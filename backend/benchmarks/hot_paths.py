@@ -0,0 +1,361 @@
+"""
+Micro-benchmarks for the backend's hot functions, with saved baselines.
+
+    python benchmarks/hot_paths.py                              # run everything
+    python benchmarks/hot_paths.py --filter encryption          # substring match on case names
+    python benchmarks/hot_paths.py --save baseline.json
+    python benchmarks/hot_paths.py --compare baseline.json --max-regression 10
+
+Cases: FraudDetector.predict, DriftMonitor.observe,
+MLService._extract_entities, EncryptionService encrypt/decrypt at 1 KiB /
+64 KiB / 1 MiB, auth.create_access_token, get_current_user (token cache hit, cache hit
+with 10k revoked tokens, and full verification; all include the revocation
+lookup), verify_password and ClaimSubmission validation.
+
+Each case is calibrated so one round lasts at least --min-round-ms, then
+timed for --rounds rounds after a warm-up round; the per-call time of every
+round is one sample (reported as min / median / IQR / mean / stddev, like
+pytest-benchmark). Cases marked with memory also run once more under
+tracemalloc: peak bytes allocated by one call, and bytes still held after
+--memory-calls calls (a steady increase points at a leak or an unbounded
+cache).
+
+--compare tests each case against the baseline's samples with a two-sided
+Mann-Whitney U test. A case counts as a regression when the difference is
+significant (p < --alpha) and the median is slower by more than
+--max-regression percent; the script then exits 1. Compare baselines taken on
+the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("ENCRYPTION_KEY", "ZmDfcTF7_60GrrY167zsiPd67pEvs0aGOv2oasOM1Pg=")
+
+SIZES = {"1KiB": 1024, "64KiB": 64 * 1024, "1MiB": 1024 * 1024}
+
+# name -> (setup returning the function to time, track memory, max rounds)
+CASES = {}
+
+
+def case(name: str, memory: bool = False, max_rounds: int = None):
+    def register(setup):
+        CASES[name] = (setup, memory, max_rounds)
+        return setup
+    return register
+
+
+def run_coroutine(coro):
+    """Run a coroutine that never suspends (no event loop overhead in the timing)"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+# --- Cases ---
+
+@case("fraud.predict")
+def fraud_predict():
+    from fraud_detection import fraud_detector
+    fraud_detector.load()
+    return lambda: fraud_detector.predict(45000, 0.8, 0.2, 0.3)
+
+
+@case("drift.observe")
+def drift_observe():
+    from fraud_detection import fraud_detector
+    fraud_detector.load()
+    artifact = fraud_detector.artifact
+    return lambda: fraud_detector.drift.observe(artifact, 45000, 0.8, 0.2, 0.3, 12)
+
+
+CLAIM_TEXT = (
+    "Discharge summary, Apollo Hospitals, admitted 12/03/2026, discharged 2026-03-15. "
+    "Patient presented with high fever and a suspected infection; diabetes noted. "
+    "Room charges ₹12,500.00, pharmacy ₹3,240.50, surgery consult $1,200.00. "
+)
+
+
+def extraction_case(repeat: int):
+    from ml_service import ml_service
+    text = CLAIM_TEXT * repeat
+    return lambda: ml_service._extract_entities(text)
+
+
+case("ml.extract_entities[1KiB]", memory=True)(lambda: extraction_case(4))
+case("ml.extract_entities[64KiB]", memory=True)(lambda: extraction_case(256))
+
+
+def encryption_case(size: int, decrypt: bool):
+    from services.encryption import encryption_service as service
+    data = os.urandom(size)
+    if decrypt:
+        token = service.encrypt(data)
+        return lambda: service.decrypt(token)
+    return lambda: service.encrypt(data)
+
+
+for label, size in SIZES.items():
+    case(f"encryption.encrypt[{label}]", memory=True)(lambda size=size: encryption_case(size, decrypt=False))
+    case(f"encryption.decrypt[{label}]", memory=True)(lambda size=size: encryption_case(size, decrypt=True))
+
+
+TOKEN_CLAIMS = {"sub": "bench", "user_id": 1, "role": "hospital"}
+
+
+@case("auth.create_access_token")
+def create_access_token():
+    import auth
+    return lambda: auth.create_access_token(TOKEN_CLAIMS)
+
+
+def revoked_tokens(count: int):
+    """Fill the local revoked-token set; lookups never go to Redis, so no sync task is needed"""
+    import auth
+    auth.revoked_tokens.url = None
+    exp = time.time() + 3600
+    for i in range(count):
+        auth.revoked_tokens._remember(f"revoked-{i}", exp)
+
+
+@case("auth.get_current_user[cached]")
+def get_current_user_cached():
+    import auth
+    revoked_tokens(0)
+    token = auth.create_access_token(TOKEN_CLAIMS)
+    return lambda: run_coroutine(auth.get_current_user(token))
+
+
+@case("auth.get_current_user[cached,10k revoked]")
+def get_current_user_cached_revoked():
+    import auth
+    revoked_tokens(10_000)
+    token = auth.create_access_token(TOKEN_CLAIMS)
+    return lambda: run_coroutine(auth.get_current_user(token))
+
+
+@case("auth.get_current_user[uncached]")
+def get_current_user_uncached():
+    import auth
+    token = auth.create_access_token(TOKEN_CLAIMS)
+
+    def call():
+        auth.token_cache.clear()
+        return run_coroutine(auth.get_current_user(token))
+    return call
+
+
+@case("auth.verify_password", max_rounds=10)
+def verify_password():
+    import auth
+    hashed = auth.get_password_hash("benchmark-password")
+    return lambda: auth.verify_password("benchmark-password", hashed)
+
+
+CLAIM_PAYLOAD = {
+    "hospital_id": "APOLLO-DEL-001",
+    "amount": 45000.5,
+    "currency": "INR",
+    "patient_details": {"name": "Asha Rao", "id": "P-1042", "age": 54},
+    "diagnosis": "Appendectomy with post-operative infection",
+}
+
+
+@case("claim_submission.validate")
+def claim_submission_validate():
+    from main import ClaimSubmission
+    return lambda: ClaimSubmission(**CLAIM_PAYLOAD)
+
+
+@case("claim_submission.validate[invalid]")
+def claim_submission_invalid():
+    from pydantic import ValidationError
+    from main import ClaimSubmission
+    payload = dict(CLAIM_PAYLOAD, amount=-1, patient_details={"name": "Asha Rao"})
+
+    def call():
+        try:
+            ClaimSubmission(**payload)
+        except ValidationError:
+            pass
+    return call
+
+
+# --- Runner ---
+
+def calibrate(fn, min_round: float) -> int:
+    """Iterations per round so a round lasts at least min_round seconds"""
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round:
+            return iterations
+        iterations = max(iterations * 2, int(iterations * min_round / max(elapsed, 1e-9)))
+
+
+def time_case(fn, rounds: int, min_round: float) -> dict:
+    iterations = calibrate(fn, min_round)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations)
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "iterations": iterations,
+        "rounds": rounds,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "iqr": quartiles[2] - quartiles[0],
+        "mean": statistics.fmean(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "ops": 1 / statistics.median(samples),
+        "samples": samples,
+    }
+
+
+def measure_memory(fn, calls: int) -> dict:
+    """Peak bytes allocated by one call, and bytes still held after calls calls"""
+    tracemalloc.start()
+    try:
+        fn()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        before, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            fn()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes_per_call": peak - base, "retained_bytes": after - before, "calls": calls}
+
+
+def git_meta() -> dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def format_bytes(count: int) -> str:
+    for unit, scale in (("MiB", 1 << 20), ("KiB", 1 << 10)):
+        if abs(count) >= scale:
+            return f"{count / scale:.1f} {unit}"
+    return f"{count} B"
+
+
+def compare(results: dict, baseline: dict, alpha: float, max_regression: float) -> list:
+    """Print each case against the baseline; return the names that regressed"""
+    from scipy.stats import mannwhitneyu
+
+    print(f"\nvs {(baseline['meta']['git'].get('commit') or '?')[:10]} ({baseline['meta']['timestamp']}):")
+    regressions = []
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:40s} (not in baseline)")
+            continue
+        change = (result["median"] - before["median"]) / before["median"] * 100
+        p_value = mannwhitneyu(result["samples"], before["samples"], alternative="two-sided").pvalue
+        if p_value >= alpha:
+            verdict = "no significant change"
+        elif change > max_regression:
+            verdict = "REGRESSION"
+            regressions.append(name)
+        elif change > 0:
+            verdict = "slower"
+        else:
+            verdict = "faster"
+        print(f"  {name:40s} {format_time(before['median']):>10s} -> {format_time(result['median']):>10s} "
+              f"({change:+6.1f}%, p={p_value:.3g})  {verdict}")
+    if baseline["meta"].get("machine") != platform.node():
+        print("  [!] baseline was recorded on a different machine")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot path micro-benchmarks")
+    parser.add_argument("--filter", action="append", default=[], help="only cases containing this substring (repeatable)")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--min-round-ms", type=float, default=10)
+    parser.add_argument("--memory-calls", type=int, default=100)
+    parser.add_argument("--save", metavar="JSON", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="JSON", help="baseline to compare with")
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level for the comparison")
+    parser.add_argument("--max-regression", type=float, default=10, help="percent slowdown (median) that fails the comparison")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if not args.filter or any(f in name for f in args.filter)]
+    if args.list or not names:
+        print("\n".join(names or CASES))
+        return
+
+    results = {}
+    print(f"{'case':40s} {'min':>10s} {'median':>10s} {'iqr':>10s} {'mean':>10s} {'stddev':>10s} {'ops/s':>10s}  memory")
+    for name in names:
+        setup, memory, max_rounds = CASES[name]
+        fn = setup()
+        fn()
+        result = time_case(fn, min(args.rounds, max_rounds or args.rounds), args.min_round_ms / 1000)
+        if memory:
+            result["memory"] = measure_memory(fn, args.memory_calls)
+        results[name] = result
+        memory_note = ""
+        if memory:
+            memory_note = (f"peak {format_bytes(result['memory']['peak_bytes_per_call'])}/call, "
+                           f"retained {format_bytes(result['memory']['retained_bytes'])}")
+        print(f"{name:40s} {format_time(result['min']):>10s} {format_time(result['median']):>10s} "
+              f"{format_time(result['iqr']):>10s} {format_time(result['mean']):>10s} "
+              f"{format_time(result['stddev']):>10s} {result['ops']:10.0f}  {memory_note}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "git": git_meta(),
+                    "machine": platform.node(),
+                    "python": platform.python_version(),
+                    "args": vars(args),
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"[+] Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.alpha, args.max_regression)
+        if regressions:
+            print(f"[!] {len(regressions)} regression(s) above {args.max_regression}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
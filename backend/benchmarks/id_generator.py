@@ -0,0 +1,89 @@
+"""
+Claim ID generator: throughput benchmark and uniqueness stress test.
+
+    python benchmarks/id_generator.py --ids 1000000 --threads 8 --processes 4
+
+Checks that IDs are unique across threads sharing one generator and across
+processes with distinct worker ids, that each generator's IDs are strictly
+increasing, and that the zero-padded string form sorts like the integers.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.id_generator import SnowflakeGenerator, format_id
+
+
+def throughput(count: int):
+    generator = SnowflakeGenerator(1)
+    start = time.perf_counter()
+    for _ in range(count):
+        generator.next_id()
+    elapsed = time.perf_counter() - start
+    print(f"throughput: {count / elapsed:,.0f} ids/s ({elapsed / count * 1e9:.0f} ns/id, single thread)")
+
+
+def thread_stress(count: int, threads: int):
+    generator = SnowflakeGenerator(2)
+    results = [[] for _ in range(threads)]
+
+    def worker(bucket):
+        for _ in range(count // threads):
+            bucket.append(generator.next_id())
+
+    pool = [threading.Thread(target=worker, args=(results[i],)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    all_ids = [i for bucket in results for i in bucket]
+    assert len(all_ids) == len(set(all_ids)), "duplicate IDs across threads"
+    for bucket in results:
+        assert all(a < b for a, b in zip(bucket, bucket[1:])), "IDs not increasing within a thread"
+    print(f"threads: {len(all_ids):,} ids from {threads} threads, all unique and per-thread increasing")
+
+
+def _process_worker(worker_id: int, count: int, queue):
+    generator = SnowflakeGenerator(worker_id)
+    queue.put([generator.next_id() for _ in range(count)])
+
+
+def process_stress(count: int, processes: int):
+    queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_process_worker, args=(worker_id, count // processes, queue))
+        for worker_id in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    batches = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    all_ids = [i for batch in batches for i in batch]
+    assert len(all_ids) == len(set(all_ids)), "duplicate IDs across processes"
+    as_strings = sorted(format_id(i) for i in all_ids)
+    assert as_strings == [format_id(i) for i in sorted(all_ids)], "string order differs from numeric order"
+    print(f"processes: {len(all_ids):,} ids from {processes} workers, all unique, string order == numeric order")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim ID generator benchmark")
+    parser.add_argument("--ids", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    throughput(args.ids)
+    thread_stress(args.ids, args.threads)
+    process_stress(args.ids, args.processes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Concurrency load test for a single uvicorn worker.
+
+Start the API with one worker, then run this script against it:
+
+    python -m uvicorn main:app --workers 1
+    python benchmarks/load_test.py --url http://127.0.0.1:8000/api/claims --token <access_token>
+
+For every concurrency level the script reports throughput, latency and the
+effective concurrency the worker sustained (Little's law: rps * mean latency).
+With blocking DB calls the effective concurrency stays near 1; with the async
+engine it should climb with the number of clients.
+
+Requires: pip install httpx
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run_level(url: str, headers: dict, concurrency: int, duration: float):
+    """Drive `concurrency` closed-loop clients for `duration` seconds"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url, headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    rps = len(latencies) / elapsed if elapsed else 0
+    mean = statistics.mean(latencies) if latencies else 0
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": rps,
+        "mean_ms": mean * 1000,
+        "p99_ms": p99 * 1000,
+        "effective_concurrency": rps * mean,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-worker concurrency load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/hospitals")
+    parser.add_argument("--token", help="Bearer token for protected endpoints")
+    parser.add_argument("--levels", default="1,4,16,64", help="Comma separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+
+    print(f"{'clients':>8} {'reqs':>8} {'errors':>7} {'rps':>9} {'mean ms':>9} {'p99 ms':>9} {'eff. conc':>10}")
+    for level in (int(x) for x in args.levels.split(",")):
+        r = await run_level(args.url, headers, level, args.duration)
+        print(
+            f"{r['concurrency']:>8} {r['requests']:>8} {r['errors']:>7} {r['rps']:>9.1f} "
+            f"{r['mean_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['effective_concurrency']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
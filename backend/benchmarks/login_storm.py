@@ -0,0 +1,80 @@
+"""
+Login storm: latency of an unrelated endpoint while logins hammer bcrypt.
+
+    python -m uvicorn main:app --workers 1
+    python benchmarks/login_storm.py --username testuser --password password123
+
+Samples GET --probe sequentially for --duration seconds, first alone and then
+while --concurrency clients log in continuously. With bcrypt on the event
+loop the probe latency during the storm rises to hundreds of ms; with the
+offloaded hasher it should stay close to the baseline.
+
+Requires: pip install httpx
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return (
+        f"n={len(latencies):5d} p50={statistics.median(latencies):7.2f}ms "
+        f"p99={latencies[max(int(len(latencies) * 0.99) - 1, 0)]:7.2f}ms max={latencies[-1]:7.2f}ms"
+    )
+
+
+async def probe(client, url, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def login_loop(client, url, credentials, stop, counters):
+    while not stop.is_set():
+        try:
+            status = (await client.post(url, json=credentials)).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        counters[status] = counters.get(status, 0) + 1
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Unrelated-endpoint latency during a login storm")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--probe", default="/")
+    parser.add_argument("--username", default="testuser")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    probe_url = args.base_url + args.probe
+    login_url = args.base_url + "/api/auth/login"
+    credentials = {"username": args.username, "password": args.password}
+
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=args.concurrency + 4)) as client:
+        baseline = await probe(client, probe_url, args.duration)
+        print(f"baseline       {summarize(baseline)}")
+
+        stop = asyncio.Event()
+        counters = {}
+        storm = [asyncio.create_task(login_loop(client, login_url, credentials, stop, counters)) for _ in range(args.concurrency)]
+        await asyncio.sleep(1)  # let the storm ramp up
+        during = await probe(client, probe_url, args.duration)
+        stop.set()
+        await asyncio.gather(*storm)
+        print(f"login storm    {summarize(during)}")
+        print(f"login responses by status: {counters}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Rate limiter overhead and multi-worker correctness.
+
+    python benchmarks/rate_limit.py                                   # memory:// stand-in
+    python benchmarks/rate_limit.py --storage-uri redis://localhost:6379
+
+1. Cost of one limit check (hit) per strategy against the given storage,
+   spread over --keys distinct clients.
+2. Cost of deriving the key from a bearer token (verified-token cache hit).
+3. --processes workers hammer one key with a --limit/minute budget. With a
+   shared store the total number of allowed requests equals the limit; with
+   memory:// every worker allows the full limit on its own.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+
+def check_overhead(storage_uri: str, keys: int, iterations: int):
+    limit = parse("1000000/minute")
+    for name, strategy in STRATEGIES.items():
+        limiter = strategy(storage_from_string(storage_uri))
+        limiter.storage.reset()
+        samples = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            limiter.hit(limit, "bench", f"user:{i % keys}")
+            samples.append((time.perf_counter() - start) * 1e6)
+        samples.sort()
+        print(
+            f"  {name:24s} p50={statistics.median(samples):7.1f}µs "
+            f"p99={samples[int(len(samples) * 0.99)]:7.1f}µs"
+        )
+
+
+def key_overhead(iterations: int):
+    from starlette.requests import Request
+
+    import auth
+    from rate_limit import rate_limit_key
+
+    token = auth.create_access_token({"sub": "bench", "user_id": 1, "role": "hospital"})
+    request = Request({
+        "type": "http",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1234),
+    })
+    rate_limit_key(request)  # warm the verified-token cache
+    start = time.perf_counter()
+    for _ in range(iterations):
+        rate_limit_key(request)
+    elapsed = time.perf_counter() - start
+    print(f"  rate_limit_key (cached token)  {elapsed / iterations * 1e6:7.1f}µs -> {rate_limit_key(request)}")
+
+
+def _worker(storage_uri: str, strategy: str, limit: str, attempts: int, queue):
+    limiter = STRATEGIES[strategy](storage_from_string(storage_uri))
+    item = parse(limit)
+    queue.put(sum(limiter.hit(item, "bench", "shared:1") for _ in range(attempts)))
+
+
+def shared_budget(storage_uri: str, strategy: str, processes: int, limit: int):
+    storage_from_string(storage_uri).reset()
+    queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_worker, args=(storage_uri, strategy, f"{limit}/minute", limit * 2, queue))
+        for _ in range(processes)
+    ]
+    for p in procs:
+        p.start()
+    allowed = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    verdict = "shared" if sum(allowed) == limit else "NOT shared"
+    print(f"  {processes} workers x {limit * 2} attempts, limit {limit}/minute: allowed {sum(allowed)} {allowed} ({verdict})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter benchmark")
+    parser.add_argument("--storage-uri", default="memory://")
+    parser.add_argument("--strategy", default="sliding-window-counter")
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"limit check overhead ({args.storage_uri}, {args.keys} keys)")
+    check_overhead(args.storage_uri, args.keys, args.iterations)
+    print("key derivation")
+    key_overhead(args.iterations)
+    print(f"multi-worker budget ({args.strategy})")
+    shared_budget(args.storage_uri, args.strategy, args.processes, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Security middleware stack: BaseHTTPMiddleware (legacy) vs plain ASGI.
+
+    python benchmarks/security_middleware.py --requests 5000
+
+Drives a minimal app in-process through httpx.ASGITransport, so the numbers
+are the cost of the middleware stack itself (headers, CSRF check, request
+logging) rather than of the network or the endpoints. The legacy classes are
+the ones middleware/security.py used before the ASGI rewrite.
+
+Requires: pip install httpx
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware import security
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Content-Security-Policy"] = (
+            "default-src 'self'; "
+            "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+            "style-src 'self' 'unsafe-inline'; "
+            "img-src 'self' data: https:; "
+            "font-src 'self' data:; "
+            "connect-src 'self' https://polygon-rpc.com https://rpc-mumbai.maticvigil.com"
+        )
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        return response
+
+
+class LegacyCSRFProtectionMiddleware(BaseHTTPMiddleware):
+    SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method in self.SAFE_METHODS:
+            return await call_next(request)
+        if request.headers.get("Authorization", "").startswith("Bearer "):
+            return await call_next(request)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="CSRF token missing or invalid")
+
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        import logging
+        logger = logging.getLogger("security")
+        client_ip = request.client.host if request.client else "unknown"
+        logger.info(f"{request.method} {request.url.path} from {client_ip}")
+        response = await call_next(request)
+        logger.info(f"Response: {response.status_code}")
+        return response
+
+
+def build_app(stack) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    @app.post("/submit")
+    async def submit():
+        return {"status": "accepted"}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(32):
+                yield b"x" * 1024
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    for middleware in stack:
+        app.add_middleware(middleware)
+    return app
+
+
+STACKS = {
+    "legacy (BaseHTTPMiddleware)": [
+        LegacySecurityHeadersMiddleware, LegacyCSRFProtectionMiddleware, LegacyRequestLoggingMiddleware
+    ],
+    "asgi": [
+        security.SecurityHeadersMiddleware, security.CSRFProtectionMiddleware, security.RequestLoggingMiddleware
+    ],
+}
+
+
+async def requests_per_second(app, method: str, path: str, count: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer benchmark"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.request(method, path, headers=headers)
+        assert response.status_code == 200, response.status_code
+        assert response.headers["x-frame-options"] == "DENY"
+
+        async def worker(n):
+            for _ in range(n):
+                await client.request(method, path, headers=headers)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(count // concurrency) for _ in range(concurrency)])
+        return (count // concurrency * concurrency) / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Security middleware benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+
+    targets = [("GET", "/ping"), ("POST", "/submit"), ("GET", "/stream")]
+    results = {}
+    for name, stack in STACKS.items():
+        app = build_app(stack)
+        for method, path in targets:
+            results[(name, path)] = await requests_per_second(app, method, path, args.requests, args.concurrency)
+
+    print(f"{'endpoint':10s} " + " ".join(f"{name:>28s}" for name in STACKS) + "   speedup")
+    legacy, asgi = list(STACKS)
+    for _, path in targets:
+        before, after = results[(legacy, path)], results[(asgi, path)]
+        print(f"{path:10s} {before:24.0f} r/s {after:24.0f} r/s   {after / before:5.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Serialization CPU per 1,000 claims for the /api/claims payload.
+
+    python benchmarks/serialization.py --claims 1000 --rounds 200
+
+Compares the previous path (ORM objects -> dicts with float()/isoformat() ->
+FastAPI's jsonable_encoder -> JSONResponse) with the current one (column rows
+-> row_dicts -> orjson), then the cost and ratio of compressing the result
+with gzip and, when the brotli package is installed, brotli. Times are CPU
+time (time.process_time), so they are what one worker spends per response.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from middleware import compression
+from serialization import ORJSONResponse, row_dicts
+
+CLAIM_LIST_FIELDS = ("claim_id", "hospital_id", "patient_name", "amount", "currency", "status", "fraud_score", "created_at")
+
+
+def make_rows(count: int):
+    start = datetime(2026, 1, 1)
+    return [
+        (
+            str(370000000000000000 + i),
+            f"APOLLO-DEL-{i % 50:03d}",
+            f"Patient {i}",
+            Decimal(random.randint(100, 500000)) / 100,
+            "INR",
+            random.choice(("Settled", "Rejected", "Pending")),
+            random.randint(0, 100),
+            start + timedelta(seconds=i * 37, microseconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_payload(claims):
+    return {
+        "total": len(claims),
+        "claims": [
+            {
+                "claim_id": c.claim_id,
+                "hospital_id": c.hospital_id,
+                "patient_name": c.patient_name,
+                "amount": float(c.amount),
+                "currency": c.currency,
+                "status": c.status,
+                "fraud_score": c.fraud_score,
+                "created_at": c.created_at.isoformat()
+            }
+            for c in claims
+        ]
+    }
+
+
+def cpu_ms(fn, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        fn()
+    return (time.process_time() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim list serialization CPU")
+    parser.add_argument("--claims", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = make_rows(args.claims)
+    orm_objects = [SimpleNamespace(**dict(zip(CLAIM_LIST_FIELDS, row))) for row in rows]
+    per_thousand = 1000 / args.claims
+
+    legacy = lambda: JSONResponse(jsonable_encoder(legacy_payload(orm_objects))).body
+    current = lambda: ORJSONResponse({"total": len(rows), "claims": row_dicts(CLAIM_LIST_FIELDS, rows)}).body
+    assert legacy().replace(b" ", b"") == current().replace(b" ", b""), "payloads differ"
+
+    legacy_ms = cpu_ms(legacy, args.rounds) * per_thousand
+    current_ms = cpu_ms(current, args.rounds) * per_thousand
+    body = current()
+    print(f"payload: {args.claims} claims, {len(body) / 1024:.0f} KiB")
+    print(f"jsonable_encoder + json     {legacy_ms:7.2f} ms CPU per 1,000 claims")
+    print(f"row_dicts + orjson          {current_ms:7.2f} ms CPU per 1,000 claims  ({legacy_ms / current_ms:.1f}x)")
+
+    for encoding in compression.SUPPORTED_ENCODINGS:
+        compressed = compression.compress(body, encoding)
+        ms = cpu_ms(lambda: compression.compress(body, encoding), max(args.rounds // 10, 1)) * per_thousand
+        print(f"+ {encoding:4s} compression         {ms:7.2f} ms CPU per 1,000 claims  ({len(body) / len(compressed):.1f}x smaller)")
+    if compression.brotli is None:
+        print("(install brotli to include br)")
+
+
+if __name__ == "__main__":
+    main()
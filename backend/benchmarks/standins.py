@@ -0,0 +1,179 @@
+"""
+Local stand-ins for the API's external services, for load tests.
+
+    python benchmarks/standins.py --port 8546 --ipfs-latency-ms 20 --chain-latency-ms 5
+
+One Starlette app serves:
+- a fake Pinata API and IPFS gateway (POST /pinning/pinFileToIPFS,
+  GET /ipfs/{cid}); uploads are kept in memory and returned by CID
+- a JSON-RPC chain stub on /rpc behaving like a dev node with one unlocked
+  account: transactions are "mined" instantly, contract creations get an
+  address, and receipts have the fields web3.py expects. It covers the calls
+  BlockchainClient makes (deploy, submitClaim, receipts, is_connected) and
+  does not execute any EVM code.
+
+Point the API at it with PINATA_API_URL / IPFS_GATEWAY_URL set to the
+server root and BLOCKCHAIN_RPC_URL set to <root>/rpc (benchmarks/api_load.py
+does this). Each request sleeps for the configured latency.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain_client import contract_address_for
+
+CHAIN_ID = 31337
+ACCOUNT = "0x" + "f39fd6e51aad88f6f4ce6ab8827279cfffb92266"
+GAS_PRICE = 10 ** 9
+
+
+class ChainStub:
+    def __init__(self):
+        self.block_number = 0
+        self.nonces = {}
+        self.receipts = {}
+        self.contracts = set()
+
+    def _send(self, tx: dict) -> str:
+        sender = (tx.get("from") or ACCOUNT).lower()
+        nonce = self.nonces.get(sender, 0)
+        self.nonces[sender] = nonce + 1
+        self.block_number += 1
+        tx_hash = "0x" + hashlib.sha256(f"{sender}:{nonce}:{os.urandom(8).hex()}".encode()).hexdigest()
+        contract_address = None
+        if not tx.get("to"):
+            # The address a real node gives the contract, so deployment retries can find it
+            contract_address = contract_address_for(sender, nonce).lower()
+            self.contracts.add(contract_address)
+        self.receipts[tx_hash] = {
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+            "blockHash": "0x" + hashlib.sha256(f"block{self.block_number}".encode()).hexdigest(),
+            "blockNumber": hex(self.block_number),
+            "from": sender,
+            "to": tx.get("to"),
+            "cumulativeGasUsed": "0x5208",
+            "gasUsed": "0x5208",
+            "effectiveGasPrice": hex(GAS_PRICE),
+            "contractAddress": contract_address,
+            "logs": [],
+            "logsBloom": "0x" + "00" * 256,
+            "status": "0x1",
+            "type": "0x0",
+        }
+        return tx_hash
+
+    def _block(self) -> dict:
+        return {
+            "number": hex(self.block_number),
+            "hash": "0x" + hashlib.sha256(f"block{self.block_number}".encode()).hexdigest(),
+            "parentHash": "0x" + "00" * 32,
+            "timestamp": hex(1_700_000_000 + self.block_number),
+            "gasLimit": hex(30_000_000),
+            "gasUsed": "0x0",
+            "baseFeePerGas": hex(GAS_PRICE),
+            "extraData": "0x",
+            "miner": "0x" + "00" * 20,
+            "transactions": [],
+        }
+
+    def call(self, method: str, params: list):
+        if method == "web3_clientVersion":
+            return "ChainStub/1.0"
+        if method == "eth_chainId":
+            return hex(CHAIN_ID)
+        if method == "net_version":
+            return str(CHAIN_ID)
+        if method == "eth_accounts":
+            return [ACCOUNT]
+        if method == "eth_blockNumber":
+            return hex(self.block_number)
+        if method == "eth_gasPrice":
+            return hex(GAS_PRICE)
+        if method == "eth_maxPriorityFeePerGas":
+            return "0x0"
+        if method == "eth_getTransactionCount":
+            return hex(self.nonces.get(params[0].lower(), 0))
+        if method == "eth_estimateGas":
+            return hex(200_000)
+        if method == "eth_call":
+            return "0x"
+        if method == "eth_sendTransaction":
+            return self._send(params[0])
+        if method == "eth_sendRawTransaction":
+            return self._send({"from": ACCOUNT, "to": None if len(params[0]) > 2000 else "0x" + "11" * 20})
+        if method == "eth_getCode":
+            return "0x6080" if params[0].lower() in self.contracts else "0x"
+        if method == "eth_getTransactionReceipt":
+            return self.receipts.get(params[0])
+        if method == "eth_getBlockByNumber":
+            return self._block()
+        raise LookupError(method)
+
+
+def create_app(ipfs_latency: float = 0.0, chain_latency: float = 0.0) -> Starlette:
+    chain = ChainStub()
+    pinned = {}
+
+    async def pin_file(request: Request):
+        await asyncio.sleep(ipfs_latency)
+        if not request.headers.get("pinata_api_key"):
+            return JSONResponse({"error": "missing credentials"}, status_code=401)
+        form = await request.form()
+        content = await form["file"].read()
+        cid = "Qm" + hashlib.sha256(content).hexdigest()[:44]
+        pinned[cid] = content
+        return JSONResponse({"IpfsHash": cid, "PinSize": len(content), "Timestamp": "1970-01-01T00:00:00Z"})
+
+    async def gateway(request: Request):
+        await asyncio.sleep(ipfs_latency)
+        content = pinned.get(request.path_params["cid"])
+        if content is None:
+            return Response(status_code=404)
+        return Response(content, media_type="application/octet-stream")
+
+    def rpc_response(message: dict) -> dict:
+        try:
+            result = chain.call(message["method"], message.get("params") or [])
+            return {"jsonrpc": "2.0", "id": message.get("id"), "result": result}
+        except LookupError:
+            return {"jsonrpc": "2.0", "id": message.get("id"), "error": {"code": -32601, "message": f"method not found: {message['method']}"}}
+
+    async def rpc(request: Request):
+        await asyncio.sleep(chain_latency)
+        payload = await request.json()
+        if isinstance(payload, list):
+            return JSONResponse([rpc_response(message) for message in payload])
+        return JSONResponse(rpc_response(payload))
+
+    return Starlette(routes=[
+        Route("/pinning/pinFileToIPFS", pin_file, methods=["POST"]),
+        Route("/ipfs/{cid}", gateway, methods=["GET"]),
+        Route("/rpc", rpc, methods=["POST"]),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IPFS and chain stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8546)
+    parser.add_argument("--ipfs-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chain-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    app = create_app(args.ipfs_latency_ms / 1000, args.chain_latency_ms / 1000)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Worker boot time: importing main, then running the app lifespan.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --profile      # slowest imports under main
+
+Each run is a fresh interpreter, so nothing is cached in sys.modules. Import
+time is what test collection and every uvicorn worker pay before serving;
+lifespan time is the service loading (encryption key, fraud model, web3 and
+contract deployment) that runs before the worker accepts requests. Uses the
+database and environment from .env like the API does.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app):
+    ready = time.perf_counter()
+print("STARTUP " + json.dumps({"import": imported - start, "lifespan": ready - imported}))
+"""
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_once() -> dict:
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[len("STARTUP "):])
+    raise RuntimeError(f"startup failed:\n{result.stdout[-2000:]}\n{result.stderr[-2000:]}")
+
+
+def import_profile(top: int):
+    """Modules imported directly by main, by cumulative import time"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR, capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match and len(match.group(3)) == 3:
+            entries.append((int(match.group(2)) / 1000, int(match.group(1)) / 1000, match.group(4)))
+    print(f"{'module':40s} {'cumulative ms':>14s} {'self ms':>10s}")
+    for cumulative, own, name in sorted(entries, reverse=True)[:top]:
+        print(f"{name:40s} {cumulative:14.1f} {own:10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profile", action="store_true", help="print the slowest imports under main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    if args.profile:
+        import_profile(args.top)
+        return
+
+    runs = [run_once() for _ in range(args.runs)]
+    for phase in ("import", "lifespan"):
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:10s} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Request-path cost of tracing.
+
+    python benchmarks/tracing.py --requests 100000 --spans 10
+
+Calls a trivial ASGI app directly, with and without TracingMiddleware, where
+the app opens --spans child spans (roughly what submit_claim does: five stages
+plus their service and SQL spans). Reported per request, for a tracer that
+keeps no traces (fast requests at TRACE_SAMPLE_RATE=0) and one that keeps all
+of them. Kept traces are serialized and written by the exporter thread; that
+is drained every 1000 requests and timed separately, as it runs off the
+request path.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from middleware.tracing import TracingMiddleware
+
+
+def make_app(spans: int):
+    async def app(scope, receive, send):
+        for i in range(spans):
+            with tracing.span("stage", index=i):
+                pass
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"status":"ok"}'})
+    return app
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_scope():
+    return {"type": "http", "method": "POST", "path": "/api/claims/submit", "headers": [(b"host", b"bench")]}
+
+
+async def per_request_us(handler, count: int, exporter=None):
+    """(µs per request, µs per exported trace)"""
+    elapsed = export = 0.0
+    for done in range(0, count, 1000):
+        start = time.perf_counter()
+        for _ in range(min(1000, count - done)):
+            await handler(make_scope(), receive, send)
+        elapsed += time.perf_counter() - start
+        if exporter is not None:
+            start = time.perf_counter()
+            exporter.flush()
+            export += time.perf_counter() - start
+    exported = exporter.exported if exporter is not None else 0
+    return elapsed / count * 1e6, (export / exported * 1e6 if exported else None)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tracing overhead")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--spans", type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app(args.spans)
+    bare, _ = await per_request_us(app, args.requests)
+    print(f"untraced app ({args.spans} span() calls, no-op)   {bare:6.2f}µs/request")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, sample_rate in (("traced, none kept", 0.0), ("traced, all kept", 1.0)):
+            exporter = tracing.TraceExporter(os.path.join(directory, "traces.jsonl"))
+            tracer = tracing.Tracer(exporter, sample_rate=sample_rate, slow_ms=float("inf"), enabled=True)
+            traced, export = await per_request_us(TracingMiddleware(app, tracer=tracer), args.requests, exporter)
+            print(f"{label:38s} {traced:6.2f}µs/request  (+{traced - bare:.2f}µs)", end="")
+            print(f"; export {export:.2f}µs/trace off the request path" if export else "")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,35 +2,92 @@ import os
 import json
 import time
 import random
-from web3 import Web3
-# Web3.py v7 renamed geth_poa_middleware to ExtraDataToPOAMiddleware
-from web3.middleware import ExtraDataToPOAMiddleware
+import threading
 from dotenv import load_dotenv
+import metrics
+import tracing
 
 load_dotenv()
 
+def make_provider(rpc_url: str):
+    """HTTPProvider that records JSON-RPC call counts and latency per method"""
+    from web3 import Web3
+    
+    class InstrumentedHTTPProvider(Web3.HTTPProvider):
+        def make_request(self, method, params):
+            start = time.perf_counter()
+            outcome = "error"
+            with tracing.span(f"rpc.{method}") as span:
+                try:
+                    response = super().make_request(method, params)
+                    if "error" not in response:
+                        outcome = "ok"
+                    return response
+                finally:
+                    metrics.RPC_SECONDS.observe(time.perf_counter() - start, (str(method), outcome))
+                    span.set(outcome=outcome)
+    
+    return InstrumentedHTTPProvider(rpc_url)
+
+def contract_address_for(sender: str, nonce: int) -> str:
+    """Address of the contract created by sender's transaction with this nonce"""
+    import rlp
+    from eth_utils import keccak, to_bytes, to_checksum_address
+    
+    return to_checksum_address(keccak(rlp.encode([to_bytes(hexstr=sender), nonce]))[12:])
+
 class BlockchainClient:
+    """
+    Web3 client for the ClaimSettlement contract. web3 is imported and the
+    account key loaded on connect() (run by the app lifespan, or on first use
+    of w3), not when this module is imported.
+    """
     def __init__(self):
         self.rpc_url = os.getenv("BLOCKCHAIN_RPC_URL", "http://127.0.0.1:8545")
         self.private_key = os.getenv("PRIVATE_KEY")
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
-        
-        # Add middleware for PoA networks (like Polygon Mumbai)
-        # Required for chains that use more than 32 bytes in extraData field
-        self.w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+        self._w3 = None
+        self._lock = threading.Lock()
         
         self.contract_address = None
         self.contract = None
+        self.deploy_block = 0
         self.account = None
-        
-        if self.private_key:
-            self.account = self.w3.eth.account.from_key(self.private_key)
-            print(f"[*] Blockchain: Loaded account {self.account.address}")
-        else:
-            print("[!] Blockchain: No PRIVATE_KEY found. Read-only mode or local node.")
+        # Nonce and hash of the pending deployment, reused by retries
+        self._deploy_nonce = None
+        self._deploy_tx = None
+    
+    @property
+    def w3(self):
+        if self._w3 is None:
+            self.connect()
+        return self._w3
+    
+    def connect(self):
+        """Create the Web3 client and load the signing account (once)"""
+        with self._lock:
+            if self._w3 is not None:
+                return
+            from web3 import Web3
+            # Web3.py v7 renamed geth_poa_middleware to ExtraDataToPOAMiddleware
+            from web3.middleware import ExtraDataToPOAMiddleware
+            
+            w3 = Web3(make_provider(self.rpc_url))
+            
+            # Add middleware for PoA networks (like Polygon Mumbai)
+            # Required for chains that use more than 32 bytes in extraData field
+            w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+            
+            if self.private_key:
+                self.account = w3.eth.account.from_key(self.private_key)
+                print(f"[*] Blockchain: Loaded account {self.account.address}")
+            else:
+                print("[!] Blockchain: No PRIVATE_KEY found. Read-only mode or local node.")
+            self._w3 = w3
 
     def deploy_contract(self):
-        """Deploy smart contract to blockchain with retry logic"""
+        """Deploy smart contract to blockchain; safe to call again after a failed attempt"""
+        if self.contract is not None:
+            return
         if not self.private_key:
             # Fallback for local hardhat node without env key
             if self.w3.is_connected() and self.w3.eth.accounts:
@@ -51,26 +108,44 @@ class BlockchainClient:
                 abi = artifact["abi"]
                 bytecode = artifact["bytecode"]
 
-            # Deploy
-            ClaimSettlement = self.w3.eth.contract(abi=abi, bytecode=bytecode)
+            # Every attempt deploys with the same nonce, so a retry after a lost
+            # response or receipt finds the first contract instead of creating a second
+            sender = self.account if isinstance(self.account, str) else self.account.address
+            if self._deploy_nonce is None:
+                self._deploy_nonce = self.w3.eth.get_transaction_count(sender)
+            address = contract_address_for(sender, self._deploy_nonce)
             
-            # Build transaction
-            if isinstance(self.account, str): # Local node account address
-                tx_hash = ClaimSettlement.constructor().transact({'from': self.account})
-            else: # Account object with private key
-                construct_txn = ClaimSettlement.constructor().build_transaction({
-                    'from': self.account.address,
-                    'nonce': self.w3.eth.get_transaction_count(self.account.address),
-                    'gas': 2000000,
-                    'gasPrice': self.w3.eth.gas_price
-                })
-                signed_txn = self.w3.eth.account.sign_transaction(construct_txn, private_key=self.private_key)
-                tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            if self.w3.eth.get_code(address):
+                print("[*] Blockchain: Found the contract deployed by an earlier attempt")
+            else:
+                if self._deploy_tx is None:
+                    # Deploy
+                    ClaimSettlement = self.w3.eth.contract(abi=abi, bytecode=bytecode)
+                    
+                    # Build transaction
+                    if isinstance(self.account, str): # Local node account address
+                        self._deploy_tx = ClaimSettlement.constructor().transact({'from': sender, 'nonce': self._deploy_nonce})
+                    else: # Account object with private key
+                        construct_txn = ClaimSettlement.constructor().build_transaction({
+                            'from': sender,
+                            'nonce': self._deploy_nonce,
+                            'gas': 2000000,
+                            'gasPrice': self.w3.eth.gas_price
+                        })
+                        signed_txn = self.w3.eth.account.sign_transaction(construct_txn, private_key=self.private_key)
+                        self._deploy_tx = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
 
-            # Wait for receipt
-            tx_receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+                # Wait for receipt
+                tx_receipt = self.w3.eth.wait_for_transaction_receipt(self._deploy_tx)
+                if tx_receipt.status != 1:
+                    # The nonce is used up; the next attempt deploys with a new one
+                    self._deploy_nonce = self._deploy_tx = None
+                    print("[!] Blockchain: Deployment transaction reverted")
+                    return
+                address = tx_receipt.contractAddress
+                self.deploy_block = tx_receipt.blockNumber
             
-            self.contract_address = tx_receipt.contractAddress
+            self.contract_address = address
             self.contract = self.w3.eth.contract(address=self.contract_address, abi=abi)
             print(f"[+] Blockchain: Contract deployed at {self.contract_address}")
             
@@ -79,6 +154,25 @@ class BlockchainClient:
 
     def submit_claim_on_chain(self, claim_id, amount, ipfs_hash="QmHash"):
         """Submit claim with retry logic and gas estimation"""
+        with tracing.span("chain.submit_claim", claim_id=str(claim_id)) as span:
+            tx_hash = self._submit_claim_on_chain(claim_id, amount, ipfs_hash)
+            if tx_hash.startswith("0xError"):
+                span.record_error("settlement failed after retries")
+            return tx_hash
+
+    def find_claim_on_chain(self, claim_id):
+        """Hash of the transaction that submitted claim_id, or None if it is not on chain"""
+        if not self.contract:
+            return None
+        with tracing.span("chain.find_claim", claim_id=str(claim_id)):
+            if not self.contract.functions.claimExists(int(claim_id)).call():
+                return None
+            logs = self.contract.events.ClaimSubmitted.get_logs(
+                from_block=self.deploy_block, argument_filters={"id": int(claim_id)}
+            )
+            return logs[-1].transactionHash.hex() if logs else f"0xUnknown{claim_id}"
+
+    def _submit_claim_on_chain(self, claim_id, amount, ipfs_hash):
         if not self.contract:
             print("[!] No contract deployed, returning mock tx hash")
             return f"0xMock{random.randint(100000, 999999)}"
@@ -0,0 +1,300 @@
+"""
+Feature drift and score distribution monitoring for the fraud model.
+
+FraudDetector.predict() records every scored claim: the four model inputs
+(amount, hospital_trust, patient_risk, diagnosis_risk) and the fraud score
+each go into a fixed-bin histogram, so recording is a bisect and an add per
+value and memory does not grow with traffic. The bins are the quantile edges
+of the model's baseline (artifact.info["baseline"], written by
+services/model_training.py from the latest claims, scored with the model's
+own risk tables); models without one (the synthetic model) are binned with
+DEFAULT_EDGES and report no drift. Warm-up predictions pass record=False.
+
+Counts are kept per DRIFT_WINDOW_SECONDS window; the last DRIFT_WINDOWS
+windows are kept, so reports cover roughly the last day of traffic.
+Histograms with the same edges merge by adding counts: with METRICS_DIR set,
+every worker writes its summary to <METRICS_DIR>/drift/ and reports cover all
+workers running the same model version.
+
+drift_loop() recomputes the report every DRIFT_CHECK_SECONDS: per feature,
+the population stability index (PSI) and a two-sample Kolmogorov-Smirnov
+test on the binned distributions, against the baseline.
+GET /api/model/drift serves the latest report.
+"""
+import asyncio
+import math
+import os
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, List, Optional
+
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+DRIFT_WINDOW_SECONDS = float(os.getenv("DRIFT_WINDOW_SECONDS", "3600"))
+DRIFT_WINDOWS = int(os.getenv("DRIFT_WINDOWS", "24"))
+DRIFT_CHECK_SECONDS = float(os.getenv("DRIFT_CHECK_SECONDS", "60"))
+DRIFT_MIN_OBSERVATIONS = int(os.getenv("DRIFT_MIN_OBSERVATIONS", "500"))
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "10"))
+
+# Usual PSI reading: below 0.1 stable, 0.1-0.25 worth a look, above 0.25 shifted
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+KS_ALPHA = 0.01
+
+FEATURES = ("amount", "hospital_trust", "patient_risk", "diagnosis_risk", "fraud_score")
+
+# Bins for models without a baseline (upper-exclusive edges, values below the first go in bin 0)
+_RISK_EDGES = [round(0.1 * i, 1) for i in range(1, 10)]
+DEFAULT_EDGES = {
+    "amount": [1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000],
+    "hospital_trust": _RISK_EDGES,
+    "patient_risk": _RISK_EDGES,
+    "diagnosis_risk": _RISK_EDGES,
+    "fraud_score": list(range(10, 100, 10)),
+}
+
+
+# --- Baseline (training time, numpy) ---
+
+def quantile_edges(values, bins: int = DRIFT_BINS) -> List[float]:
+    """Interior bin edges at the quantiles of values; one bin per value when there are few distinct values"""
+    import numpy as np
+    distinct = np.unique(values)
+    if len(distinct) <= bins:
+        return [float(edge) for edge in distinct]
+    quantiles = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    return [float(edge) for edge in np.unique(quantiles)]
+
+
+def bin_counts(values, edges: List[float]) -> List[int]:
+    """Counts per bin, binned like DriftMonitor.observe (bisect_right)"""
+    import numpy as np
+    index = np.searchsorted(np.asarray(edges, dtype=np.float64), values, side="right")
+    return np.bincount(index, minlength=len(edges) + 1).tolist()
+
+
+def baseline_histograms(columns: Dict[str, object], bins: int = DRIFT_BINS) -> dict:
+    """{feature: {"edges", "counts"}} for the model's reference data"""
+    histograms = {}
+    for feature in FEATURES:
+        edges = quantile_edges(columns[feature], bins)
+        histograms[feature] = {"edges": edges, "counts": bin_counts(columns[feature], edges)}
+    return histograms
+
+
+# --- Drift statistics ---
+
+def _proportions(counts: List[int], floor: float = 1e-4) -> List[float]:
+    total = sum(counts)
+    return [max(count / total, floor) for count in counts]
+
+
+def psi(expected: List[int], actual: List[int]) -> float:
+    """Population stability index of two histograms over the same bins"""
+    return sum((a - e) * math.log(a / e) for e, a in zip(_proportions(expected), _proportions(actual)))
+
+
+def kolmogorov_p_value(statistic: float, n: int, m: int) -> float:
+    """Asymptotic two-sample KS p-value (Numerical Recipes' probks)"""
+    effective = math.sqrt(n * m / (n + m))
+    lam = (effective + 0.12 + 0.11 / effective) * statistic
+    if lam < 0.2:
+        return 1.0
+    total = sum(2 * (-1) ** (k - 1) * math.exp(-2 * k * k * lam * lam) for k in range(1, 101))
+    return min(max(total, 0.0), 1.0)
+
+
+def ks(expected: List[int], actual: List[int]):
+    """(statistic, p-value) of the two-sample KS test on binned data"""
+    n, m = sum(expected), sum(actual)
+    statistic = cdf_expected = cdf_actual = 0.0
+    for e, a in zip(expected, actual):
+        cdf_expected += e / n
+        cdf_actual += a / m
+        statistic = max(statistic, abs(cdf_expected - cdf_actual))
+    return statistic, kolmogorov_p_value(statistic, n, m)
+
+
+def feature_drift(baseline: Optional[dict], counts: List[int], edges: List[float]) -> dict:
+    observations = sum(counts)
+    result = {"observations": observations, "edges": edges, "counts": counts}
+    if baseline is None:
+        result["status"] = "no_baseline"
+        return result
+    result["baseline_counts"] = baseline["counts"]
+    if observations < DRIFT_MIN_OBSERVATIONS:
+        result["status"] = "insufficient_data"
+        return result
+    index = psi(baseline["counts"], counts)
+    statistic, p_value = ks(baseline["counts"], counts)
+    if index >= PSI_DRIFT:
+        status = "drift"
+    elif index >= PSI_WARNING or p_value < KS_ALPHA:
+        status = "warning"
+    else:
+        status = "stable"
+    result.update(psi=round(index, 4), ks=round(statistic, 4), ks_p_value=float(f"{p_value:.3g}"), status=status)
+    return result
+
+
+STATUS_ORDER = ("no_baseline", "insufficient_data", "stable", "warning", "drift")
+
+
+class DriftMonitor:
+    """
+    Windowed histograms of the fraud model's inputs and scores for one worker.
+    observe() runs on the scoring path; everything else runs from drift_loop().
+    Like metrics.py, counts are updated without a lock.
+    """
+    def __init__(self, window_seconds: float = DRIFT_WINDOW_SECONDS, windows: int = DRIFT_WINDOWS):
+        self.window_seconds = window_seconds
+        self.closed = deque(maxlen=windows)
+        self.artifact = None
+        self.version = None
+        self.baseline = None
+        self.edges = tuple(DEFAULT_EDGES[feature] for feature in FEATURES)
+        self.current = self._empty()
+        self.window_started = time.monotonic()
+        self.report: Optional[dict] = None
+
+    def _empty(self) -> List[List[int]]:
+        return [[0] * (len(edges) + 1) for edges in self.edges]
+
+    def reset(self, artifact):
+        """Start over with the bins of a newly loaded model"""
+        baseline = (artifact.info or {}).get("baseline")
+        self.edges = tuple(baseline[feature]["edges"] if baseline else DEFAULT_EDGES[feature] for feature in FEATURES)
+        self.baseline = baseline
+        self.version = artifact.version
+        self.closed.clear()
+        self.current = self._empty()
+        self.window_started = time.monotonic()
+        self.report = None
+        self.artifact = artifact
+
+    def observe(self, artifact, amount, hospital_trust, patient_risk, diagnosis_risk, fraud_score):
+        if artifact is not self.artifact:
+            self.reset(artifact)
+        edges = self.edges
+        counts = self.current
+        counts[0][bisect_right(edges[0], amount)] += 1
+        counts[1][bisect_right(edges[1], hospital_trust)] += 1
+        counts[2][bisect_right(edges[2], patient_risk)] += 1
+        counts[3][bisect_right(edges[3], diagnosis_risk)] += 1
+        counts[4][bisect_right(edges[4], fraud_score)] += 1
+
+    def rotate(self):
+        """Close the current window (the oldest one drops out)"""
+        if sum(self.current[0]):
+            self.closed.append(self.current)
+            self.current = self._empty()
+        self.window_started = time.monotonic()
+
+    def summary(self) -> dict:
+        counts = [list(series) for series in self.current]
+        for window in list(self.closed):
+            for total, series in zip(counts, window):
+                for i, count in enumerate(series):
+                    total[i] += count
+        return {"version": self.version, "counts": dict(zip(FEATURES, counts))}
+
+    # --- Worker summaries (METRICS_DIR) ---
+
+    def write_summary(self, directory: str):
+        directory = os.path.join(directory, "drift")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(self.summary()))
+        os.replace(tmp, path)
+
+    def worker_summaries(self, directory: str, max_age: float) -> List[dict]:
+        """This worker's summary plus the recent summaries of the others"""
+        summaries = [self.summary()]
+        directory = os.path.join(directory, "drift")
+        own = f"{os.getpid()}.json"
+        now = time.time()
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return summaries
+        for name in names:
+            if not name.endswith(".json") or name == own:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    continue
+                with open(path, "rb") as f:
+                    summaries.append(orjson.loads(f.read()))
+            except (OSError, ValueError):
+                continue
+        return summaries
+
+    def remove_summary(self, directory: str):
+        try:
+            os.remove(os.path.join(directory, "drift", f"{os.getpid()}.json"))
+        except OSError:
+            pass
+
+    def compute_report(self) -> dict:
+        """Drift of the merged summaries (workers on this worker's model version) against the baseline"""
+        if METRICS_DIR:
+            summaries = self.worker_summaries(METRICS_DIR, DRIFT_CHECK_SECONDS * 3)
+        else:
+            summaries = [self.summary()]
+        merged = [[0] * (len(edges) + 1) for edges in self.edges]
+        workers = 0
+        for summary in summaries:
+            if summary["version"] != self.version:
+                continue
+            workers += 1
+            for total, feature in zip(merged, FEATURES):
+                for i, count in enumerate(summary["counts"][feature]):
+                    total[i] += count
+        features = {
+            feature: feature_drift(self.baseline and self.baseline[feature], counts, list(edges))
+            for feature, edges, counts in zip(FEATURES, self.edges, merged)
+        }
+        return {
+            "model_version": self.version,
+            "status": max((result["status"] for result in features.values()), key=STATUS_ORDER.index),
+            "workers": workers,
+            "other_versions": len(summaries) - workers,
+            "window_seconds": self.window_seconds,
+            "windows": len(self.closed) + 1,
+            "computed_at": time.time(),
+            "features": features,
+        }
+
+    def latest_report(self) -> dict:
+        return self.report or self.compute_report()
+
+    async def drift_loop(self, interval: float = DRIFT_CHECK_SECONDS):
+        """Rotate windows, share this worker's summary and recompute the report"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if time.monotonic() - self.window_started >= self.window_seconds:
+                    self.rotate()
+                if METRICS_DIR:
+                    self.write_summary(METRICS_DIR)
+                previous = self.report["status"] if self.report else None
+                self.report = self.compute_report()
+                if self.report["status"] in ("warning", "drift") and self.report["status"] != previous:
+                    shifted = ", ".join(
+                        f"{feature} (PSI {result['psi']})" for feature, result in self.report["features"].items()
+                        if result["status"] in ("warning", "drift")
+                    )
+                    print(f"[!] Fraud model {self.version}: input {self.report['status']} in {shifted}")
+            except Exception as e:
+                print(f"[!] Drift check failed: {e}")
+
+
+drift_monitor = DriftMonitor()
@@ -1,54 +1,230 @@
-import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-import joblib
+import asyncio
+import json
 import os
+import pickle
+import threading
+import zlib
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from drift import drift_monitor
+
+load_dotenv()
+
+# Promoted models: <FRAUD_MODEL_DIR>/<version>.pkl plus current.json naming the active one
+FRAUD_MODEL_DIR = os.getenv("FRAUD_MODEL_DIR", "model_store/fraud")
+FRAUD_MODEL_RELOAD_SECONDS = float(os.getenv("FRAUD_MODEL_RELOAD_SECONDS", "60"))
+
+# Investigation outcomes recorded as claim events; these are the training labels
+FRAUD_LABEL_EVENTS = {"FRAUD_CONFIRMED": 1, "FRAUD_CLEARED": 0}
+
+# Patient history is kept per hash bucket so the table size does not grow with patients
+PATIENT_BUCKETS = 1 << 16
+
+# Risk inputs used before any history is known (and by the synthetic model)
+DEFAULT_HOSPITAL_TRUST = 0.9
+DEFAULT_PATIENT_RISK = 0.1
+DEFAULT_DIAGNOSIS_RISK = 0.1
+DIAGNOSIS_RISK_KEYWORDS = (("cancer", 0.3), ("surgery", 0.3), ("cosmetic", 0.9))
+
+
+def diagnosis_risk(text: str) -> float:
+    lowered = (text or "").lower()
+    return max([risk for keyword, risk in DIAGNOSIS_RISK_KEYWORDS if keyword in lowered], default=DEFAULT_DIAGNOSIS_RISK)
+
+
+def patient_bucket(patient_id) -> int:
+    return zlib.crc32(str(patient_id or "").encode()) % PATIENT_BUCKETS
+
+
+class ModelArtifact:
+    """A fitted model together with the risk tables its features are computed from"""
+
+    def __init__(self, version: str, model, hospital_trust=None, patient_risk=None,
+                 default_hospital_trust: float = DEFAULT_HOSPITAL_TRUST,
+                 default_patient_risk: float = DEFAULT_PATIENT_RISK, info: Optional[dict] = None):
+        self.version = version
+        self.model = model
+        self.hospital_trust = hospital_trust or {}
+        # numpy array indexed by patient_bucket(), or None
+        self.patient_risk = patient_risk
+        self.default_hospital_trust = default_hospital_trust
+        self.default_patient_risk = default_patient_risk
+        self.info = info or {}
+
+    def risk_features(self, hospital_id, patient_id, diagnosis):
+        """(hospital_trust, patient_risk, diagnosis_risk) for one claim"""
+        hospital_trust = self.hospital_trust.get(hospital_id, self.default_hospital_trust)
+        if self.patient_risk is None or patient_id is None:
+            patient_risk = self.default_patient_risk
+        else:
+            patient_risk = float(self.patient_risk[patient_bucket(patient_id)])
+        return hospital_trust, patient_risk, diagnosis_risk(diagnosis)
+
+
+def synthetic_artifact() -> ModelArtifact:
+    """Train a model on synthetic data for demonstration (used until a trained model is promoted)"""
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+
+    # Features: [Amount, Hospital_Trust_Score, Patient_Risk_Score, Diagnosis_Risk_Score]
+    X = np.array([
+        [500, 0.9, 0.1, 0.1],   # Low risk
+        [1000, 0.8, 0.2, 0.2],  # Low risk
+        [5000, 0.7, 0.3, 0.3],  # Medium risk
+        [10000, 0.9, 0.1, 0.1], # High amount, but trusted hospital
+        [20000, 0.2, 0.8, 0.9], # High risk: High amount, low trust, high patient risk
+        [5000, 0.1, 0.9, 0.8],  # High risk: Suspicious hospital
+        [100, 0.95, 0.05, 0.05],# Very low risk
+        [50000, 0.5, 0.5, 0.5], # Medium-High risk
+    ])
+
+    # Labels: 0 = Legitimate, 1 = Fraudulent
+    y = np.array([0, 0, 0, 0, 1, 1, 0, 1])
+
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(X, y)
+    return ModelArtifact("synthetic", model)
+
+
+# --- Model store ---
+
+def read_current(model_dir: str = FRAUD_MODEL_DIR) -> Optional[dict]:
+    """Contents of current.json (version, metrics, trained_through), or None"""
+    try:
+        with open(os.path.join(model_dir, "current.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_artifact(artifact: ModelArtifact, model_dir: str = FRAUD_MODEL_DIR) -> str:
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, f"{artifact.version}.pkl")
+    _write_atomic(path, pickle.dumps(artifact, protocol=pickle.HIGHEST_PROTOCOL))
+    return path
+
+
+def promote(artifact: ModelArtifact, model_dir: str = FRAUD_MODEL_DIR):
+    """Point current.json at a saved artifact; workers pick it up on their next reload"""
+    current = {"version": artifact.version, **artifact.info}
+    _write_atomic(os.path.join(model_dir, "current.json"), json.dumps(current, indent=2).encode())
+
+
+def load_artifact(version: str, model_dir: str = FRAUD_MODEL_DIR) -> ModelArtifact:
+    # Artifacts are written by our own training job into a directory we control
+    with open(os.path.join(model_dir, f"{version}.pkl"), "rb") as f:
+        return pickle.load(f)
+
 
 class FraudDetector:
-    def __init__(self):
-        self.model = None
-        self.scaler = StandardScaler()
-        self.is_trained = False
-        self._train_dummy_model()
-
-    def _train_dummy_model(self):
-        """Train a model on synthetic data for demonstration"""
-        # Features: [Amount, Hospital_Trust_Score, Patient_Risk_Score, Diagnosis_Risk_Score]
-        X = np.array([
-            [500, 0.9, 0.1, 0.1],   # Low risk
-            [1000, 0.8, 0.2, 0.2],  # Low risk
-            [5000, 0.7, 0.3, 0.3],  # Medium risk
-            [10000, 0.9, 0.1, 0.1], # High amount, but trusted hospital
-            [20000, 0.2, 0.8, 0.9], # High risk: High amount, low trust, high patient risk
-            [5000, 0.1, 0.9, 0.8],  # High risk: Suspicious hospital
-            [100, 0.95, 0.05, 0.05],# Very low risk
-            [50000, 0.5, 0.5, 0.5], # Medium-High risk
-        ])
-        
-        # Labels: 0 = Legitimate, 1 = Fraudulent
-        y = np.array([0, 0, 0, 0, 1, 1, 0, 1])
-
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.model.fit(X, y)
-        self.is_trained = True
-        print("[+] Fraud Detection Model Trained on Synthetic Data")
-
-    def predict(self, amount, hospital_trust=0.8, patient_risk=0.2, diagnosis_risk=0.2):
+    """
+    RandomForest fraud model. Nothing is imported or trained until load(),
+    which the app lifespan runs at startup (predict() also loads on first use).
+    load() uses the promoted model from FRAUD_MODEL_DIR when there is one and
+    falls back to the synthetic model; reload_loop() swaps in newly promoted
+    models without blocking requests. Every prediction is recorded in the
+    drift monitor (drift.py).
+    """
+    def __init__(self, model_dir: str = FRAUD_MODEL_DIR):
+        self.model_dir = model_dir
+        self.artifact: Optional[ModelArtifact] = None
+        self._np = None
+        self._lock = threading.Lock()
+        self.drift = drift_monitor
+
+    @property
+    def is_trained(self) -> bool:
+        return self.artifact is not None
+
+    @property
+    def model(self):
+        return self.artifact.model if self.artifact else None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.artifact.version if self.artifact else None
+
+    def load(self):
+        """Load the model once; safe to call from several threads"""
+        if self.is_trained:
+            return
+        with self._lock:
+            if not self.is_trained:
+                import numpy as np
+                self._np = np
+                self.artifact = self._load_promoted() or synthetic_artifact()
+                print(f"[+] Fraud Detection Model loaded ({self.artifact.version})")
+
+    def _load_promoted(self) -> Optional[ModelArtifact]:
+        current = read_current(self.model_dir)
+        if current is None:
+            return None
+        try:
+            return load_artifact(current["version"], self.model_dir)
+        except Exception as e:
+            print(f"[!] Could not load fraud model {current.get('version')}: {e}")
+            return None
+
+    def reload(self) -> bool:
+        """Swap in the promoted model if it changed; True if swapped (blocking)"""
+        current = read_current(self.model_dir)
+        if current is None or current["version"] == self.version:
+            return False
+        artifact = self._load_promoted()
+        if artifact is None:
+            return False
+        # One attribute assignment, so a request sees either the old or the new model and tables
+        self.artifact = artifact
+        print(f"[+] Fraud Detection Model reloaded ({artifact.version})")
+        return True
+
+    async def reload_loop(self, interval: float = FRAUD_MODEL_RELOAD_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            if not self.is_trained:
+                continue
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                print(f"[!] Fraud model reload failed: {e}")
+
+    def risk_features(self, hospital_id, patient_id, diagnosis):
+        """(hospital_trust, patient_risk, diagnosis_risk) from the active model's history tables"""
+        if not self.is_trained:
+            self.load()
+        return self.artifact.risk_features(hospital_id, patient_id, diagnosis)
+
+    def predict(self, amount, hospital_trust=0.8, patient_risk=0.2, diagnosis_risk=0.2, record=True):
         """
         Predict fraud probability.
+        record=False keeps the call out of the drift histograms (warm-up, probes).
         Returns: (is_fraud, fraud_score)
         """
         if not self.is_trained:
-            return False, 0
+            self.load()
+
+        artifact = self.artifact
+        features = self._np.array([[amount, hospital_trust, patient_risk, diagnosis_risk]])
 
-        features = np.array([[amount, hospital_trust, patient_risk, diagnosis_risk]])
-        
         # Get probability of fraud (class 1)
-        fraud_prob = self.model.predict_proba(features)[0][1]
+        fraud_prob = artifact.model.predict_proba(features)[0][1]
         fraud_score = int(fraud_prob * 100)
-        
+
         is_fraud = fraud_score > 50
-        
+        if record:
+            self.drift.observe(artifact, amount, hospital_trust, patient_risk, diagnosis_risk, fraud_score)
+
         return is_fraud, fraud_score
 
 fraud_detector = FraudDetector()
@@ -0,0 +1,221 @@
+"""
+Liveness and readiness.
+
+/healthz only says the process and its event loop are up. /readyz turns 200
+once the background warm-up has completed every required step:
+- database: fill the primary (and replica) pools
+- model: load the fraud model (promoted or synthetic) and run one prediction
+- blockchain: connect to the RPC node, load the ABI and deploy the contract
+- caches: load the hospital registry
+A failed step is retried with backoff until it succeeds. After warm-up,
+/readyz re-probes the database, the RPC node and the model. Probe results are
+cached for HEALTH_PROBE_CACHE_SECONDS, and concurrent callers share one
+in-flight probe, so frequent polling costs at most one round trip per
+dependency per interval.
+
+Checks listed in READINESS_OPTIONAL are reported but do not block readiness
+(e.g. blockchain when developing without a local node).
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv()
+
+HEALTH_PROBE_CACHE_SECONDS = float(os.getenv("HEALTH_PROBE_CACHE_SECONDS", "5"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "2"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "30"))
+READINESS_OPTIONAL = frozenset(c.strip() for c in os.getenv("READINESS_OPTIONAL", "").split(",") if c.strip())
+
+# A check returns a short detail string, or raises if the dependency is unavailable
+Check = Callable[[], Awaitable[str]]
+
+
+class CheckResult:
+    __slots__ = ("ok", "detail", "duration_ms", "checked_at")
+
+    def __init__(self, ok: bool, detail: str, duration_ms: float):
+        self.ok = ok
+        self.detail = detail
+        self.duration_ms = duration_ms
+        self.checked_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "detail": self.detail,
+            "duration_ms": round(self.duration_ms, 1),
+            "age_seconds": round(time.monotonic() - self.checked_at, 1),
+        }
+
+
+async def run_check(check: Check, timeout: Optional[float]) -> CheckResult:
+    start = time.perf_counter()
+    try:
+        detail = await asyncio.wait_for(check(), timeout)
+        ok = True
+    except Exception as e:
+        detail = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        ok = False
+    return CheckResult(ok, detail, (time.perf_counter() - start) * 1000)
+
+
+class Probe:
+    """A dependency check whose result is cached and shared by concurrent callers"""
+
+    def __init__(self, check: Check, ttl: float = HEALTH_PROBE_CACHE_SECONDS, timeout: float = HEALTH_PROBE_TIMEOUT_SECONDS):
+        self.check = check
+        self.ttl = ttl
+        self.timeout = timeout
+        self.result: Optional[CheckResult] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> CheckResult:
+        self.result = await run_check(self.check, self.timeout)
+        return self.result
+
+    async def get(self) -> CheckResult:
+        if self.result is not None and time.monotonic() - self.result.checked_at < self.ttl:
+            return self.result
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        # Shielded so a client disconnecting does not cancel the probe for everyone else
+        return await asyncio.shield(self._task)
+
+
+class Health:
+    def __init__(self, warmup_steps: Dict[str, Check], probes: Dict[str, Probe], optional=READINESS_OPTIONAL):
+        self.warmup_steps = warmup_steps
+        self.probes = probes
+        self.optional = optional
+        self.warmup: Dict[str, CheckResult] = {}
+        self.started_at = time.monotonic()
+
+    async def warm_up(self):
+        """Run every warm-up step concurrently until each has succeeded"""
+        await asyncio.gather(*(self._warm_up_step(name, step) for name, step in self.warmup_steps.items()))
+        print(f"✅ Warm-up complete in {time.monotonic() - self.started_at:.1f}s")
+
+    async def _warm_up_step(self, name: str, step: Check):
+        delay = 1.0
+        while True:
+            # No timeout: model training or a deployment can legitimately take a while
+            result = self.warmup[name] = await run_check(step, None)
+            if result.ok:
+                print(f"[+] Warm-up: {name} ready ({result.detail}, {result.duration_ms:.0f} ms)")
+                return
+            print(f"[!] Warm-up: {name} failed ({result.detail}), retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+    def warmed_up(self) -> bool:
+        return all(
+            name in self.optional or (name in self.warmup and self.warmup[name].ok)
+            for name in self.warmup_steps
+        )
+
+    def liveness(self) -> dict:
+        return {"status": "ok", "uptime_seconds": round(time.monotonic() - self.started_at, 1)}
+
+    async def readiness(self):
+        """(ready, report)"""
+        if not self.warmed_up():
+            return False, {
+                "status": "warming_up",
+                "checks": {name: result.to_dict() for name, result in self.warmup.items()},
+                "pending": [name for name in self.warmup_steps if name not in self.warmup or not self.warmup[name].ok],
+            }
+        names = list(self.probes)
+        results = await asyncio.gather(*(self.probes[name].get() for name in names))
+        checks = dict(zip(names, results))
+        ready = all(result.ok for name, result in checks.items() if name not in self.optional)
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "checks": {name: result.to_dict() for name, result in checks.items()},
+            "optional": sorted(self.optional),
+        }
+
+
+# --- Checks for this app ---
+
+async def fill_pool(engine, size: int) -> int:
+    """Open size connections at once so the pool starts full, then return them"""
+    connections = []
+    try:
+        for _ in range(size):
+            connection = await engine.connect()
+            connections.append(connection)
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+def pool_size(engine) -> int:
+    size = getattr(engine.pool, "size", None)
+    return size() if callable(size) else 1
+
+
+def create_health(state) -> Health:
+    """Warm-up steps and probes over the services attached to app.state"""
+    from database import async_engine, replica_router
+    from services.hospital_registry import hospital_registry
+
+    ml_service = state.ml_service
+    blockchain_client = state.blockchain_client
+
+    async def warm_database():
+        opened = await fill_pool(async_engine, pool_size(async_engine))
+        for replica in replica_router.replicas:
+            opened += await fill_pool(replica.engine, pool_size(replica.engine))
+        return f"{opened} connections"
+
+    async def warm_model():
+        await asyncio.to_thread(ml_service.load)
+        # Not a claim, so keep it out of the drift histograms
+        await asyncio.to_thread(ml_service.fraud_detector.predict, 1000, record=False)
+        return f"model {ml_service.fraud_detector.version}"
+
+    async def warm_blockchain():
+        await asyncio.to_thread(blockchain_client.deploy_contract)
+        if blockchain_client.contract is None:
+            raise RuntimeError("contract not deployed (RPC node, account or artifact unavailable)")
+        return f"contract {blockchain_client.contract_address}"
+
+    async def warm_caches():
+        registry = await hospital_registry.snapshot()
+        return f"{len(registry.ids)} hospitals"
+
+    async def probe_database():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return "ok"
+
+    async def probe_blockchain():
+        if not await asyncio.to_thread(lambda: blockchain_client.w3.is_connected()):
+            raise RuntimeError(f"RPC node unreachable at {blockchain_client.rpc_url}")
+        return "connected"
+
+    async def probe_model():
+        if not ml_service.fraud_detector.is_trained:
+            raise RuntimeError("model not loaded")
+        return f"loaded ({ml_service.fraud_detector.version})"
+
+    return Health(
+        warmup_steps={
+            "database": warm_database,
+            "model": warm_model,
+            "blockchain": warm_blockchain,
+            "caches": warm_caches,
+        },
+        probes={
+            "database": Probe(probe_database),
+            "blockchain": Probe(probe_blockchain),
+            "model": Probe(probe_model),
+        },
+    )
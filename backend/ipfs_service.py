@@ -1,10 +1,17 @@
 import os
+import time
 import requests
 from dotenv import load_dotenv
 from services.encryption import encryption_service
+import metrics
+import tracing
 
 load_dotenv()
 
+# Overridable so tests and benchmarks can point at a local stand-in
+PINATA_API_URL = os.getenv("PINATA_API_URL", "https://api.pinata.cloud").rstrip("/")
+IPFS_GATEWAY_URL = os.getenv("IPFS_GATEWAY_URL", "https://gateway.pinata.cloud").rstrip("/")
+
 class IPFSService:
     def __init__(self):
         self.api_key = os.getenv("PINATA_API_KEY")
@@ -26,15 +33,21 @@ class IPFSService:
         Encrypt and upload file to IPFS via Pinata
         Returns: IPFS Hash (CID)
         """
+        with tracing.span("ipfs.upload", bytes=len(file_content)) as span:
+            return self._upload(file_content, filename, span)
+
+    def _upload(self, file_content: bytes, filename: str, span) -> str:
         if not self.api_key or not self.secret_key:
             print("⚠️  Pinata credentials missing. Using Mock IPFS.")
+            metrics.IPFS_SECONDS.observe(0, ("upload", "mock"))
+            span.set(mock=True)
             return f"QmMockHash{os.urandom(4).hex()}"
 
         # 1. Encrypt
         encrypted_content = self.encrypt_data(file_content)
         
         # 2. Upload to Pinata
-        url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
+        url = f"{PINATA_API_URL}/pinning/pinFileToIPFS"
         headers = {
             "pinata_api_key": self.api_key,
             "pinata_secret_api_key": self.secret_key
@@ -43,25 +56,36 @@ class IPFSService:
             'file': (filename, encrypted_content)
         }
         
+        start = time.perf_counter()
         try:
             response = requests.post(url, files=files, headers=headers, timeout=30)
             response.raise_for_status()
-            return response.json()['IpfsHash']
+            ipfs_hash = response.json()['IpfsHash']
+            metrics.IPFS_SECONDS.observe(time.perf_counter() - start, ("upload", "ok"))
+            metrics.IPFS_BYTES.inc(("upload",), len(encrypted_content))
+            return ipfs_hash
         except Exception as e:
+            metrics.IPFS_SECONDS.observe(time.perf_counter() - start, ("upload", "error"))
+            span.record_error(e)
             print(f"❌ IPFS Upload failed: {e}")
             return f"QmError{os.urandom(4).hex()}"
     
     def retrieve(self, ipfs_hash: str) -> bytes:
         """Retrieve and decrypt file from IPFS"""
-        gateway_url = f"https://gateway.pinata.cloud/ipfs/{ipfs_hash}"
+        gateway_url = f"{IPFS_GATEWAY_URL}/ipfs/{ipfs_hash}"
         
-        try:
-            response = requests.get(gateway_url, timeout=30)
-            response.raise_for_status()
-            encrypted_content = response.content
-            return self.decrypt_data(encrypted_content)
-        except Exception as e:
-            print(f"❌ IPFS Retrieval failed: {e}")
-            raise
+        start = time.perf_counter()
+        with tracing.span("ipfs.retrieve", cid=ipfs_hash):
+            try:
+                response = requests.get(gateway_url, timeout=30)
+                response.raise_for_status()
+                encrypted_content = response.content
+                metrics.IPFS_SECONDS.observe(time.perf_counter() - start, ("retrieve", "ok"))
+                metrics.IPFS_BYTES.inc(("retrieve",), len(encrypted_content))
+                return self.decrypt_data(encrypted_content)
+            except Exception as e:
+                metrics.IPFS_SECONDS.observe(time.perf_counter() - start, ("retrieve", "error"))
+                print(f"❌ IPFS Retrieval failed: {e}")
+                raise
 
 ipfs_service = IPFSService()
@@ -1,32 +1,98 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Request, Query, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-import random
 import asyncio
-from web3 import Web3
-import json
 import os
+import secrets
+import orjson
 from dotenv import load_dotenv
-from datetime import timedelta
+from datetime import timedelta, datetime
+from contextlib import asynccontextmanager, contextmanager
 
 # Import database models and session
-from database import get_db, Claim, ClaimEvent, Hospital
+from database import get_db, get_read_db, replica_router, async_engine, Claim, ClaimEvent, FraudLabel
+from services import claim_events, settlement, token_store
+from services.claim_events import load_claim_timeline, load_claim_timelines
+from services.hospital_registry import hospital_registry, etag_matches
+from services.id_generator import claim_id_generator
+from services.worker_lease import worker_lease
+from services.claim_search import search_claims, FRAUD_BANDS, SearchPageOutOfRange
+from services.claim_export import build_export_query, export_stream, MEDIA_TYPES
 import auth
+from rate_limit import limiter, role_limit
+from middleware.access_log import AccessLogMiddleware, access_log
+from middleware.tracing import TracingMiddleware
+from middleware.compression import CompressionMiddleware
+from serialization import ORJSONResponse, row_dicts
+import metrics
+import tracing
+from drift import drift_monitor
+from health import create_health
+from app_services import attach_services, check_configuration, get_ml_service, get_ipfs_service, get_blockchain_client
+from blockchain_client import BlockchainClient
+from ipfs_service import IPFSService
+from ml_service import MLService
 
 # Load environment variables
 load_dotenv()
 
-# Rate Limiter
-limiter = Limiter(key_func=get_remote_address)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background workers and load the heavy services, then stop them on shutdown"""
+    print("🚀 Starting Mumbai Hacks Claims API...")
+    access_log.start()
+    tracing.tracer.exporter.start()
+    # Claim IDs need a worker id no other running worker holds; fails startup if WORKER_ID is taken
+    await worker_lease.acquire()
+    tasks = [asyncio.create_task(worker_lease.renew_loop())]
+    if metrics.METRICS_DIR:
+        tasks.append(asyncio.create_task(metrics.flush_loop(metrics.registry, metrics.METRICS_DIR)))
+    tasks.append(asyncio.create_task(claim_events.maintenance_loop(async_engine)))
+    tasks.append(asyncio.create_task(token_store.purge_loop(async_engine)))
+    if auth.revoked_tokens.url:
+        tasks.append(asyncio.create_task(auth.revoked_tokens.sync_loop()))
+    if replica_router.replicas:
+        tasks.append(asyncio.create_task(replica_router.monitor()))
+    
+    # The worker serves requests (and /healthz) right away; /readyz turns 200
+    # once the background warm-up has loaded the model, filled the pool, etc.
+    attach_services(app)
+    check_configuration(app.state)
+    app.state.health = create_health(app.state)
+    tasks.append(asyncio.create_task(app.state.health.warm_up()))
+    # Settle approved claims whose on-chain submission failed (services/settlement.py)
+    tasks.append(asyncio.create_task(settlement.retry_loop(app.state.blockchain_client, app.state.health.warmed_up)))
+    # Pick up fraud models promoted by the training job (services/model_training.py)
+    tasks.append(asyncio.create_task(app.state.ml_service.fraud_detector.reload_loop()))
+    # Compare the model's live inputs and scores with its training baseline
+    tasks.append(asyncio.create_task(drift_monitor.drift_loop()))
+    print("✅ API accepting requests, warming up")
+    
+    yield
+    
+    # Stop background work, flush the access log and traces, and write this worker's final metrics
+    for task in tasks:
+        task.cancel()
+    await worker_lease.release()
+    access_log.stop()
+    tracing.tracer.exporter.stop()
+    if metrics.METRICS_DIR:
+        await asyncio.to_thread(metrics.registry.retire_snapshot, metrics.METRICS_DIR, metrics.registry.snapshot())
+        drift_monitor.remove_summary(metrics.METRICS_DIR)
 
-app = FastAPI(title="Mumbai Hacks Claims API", version="2.0.0")
+app = FastAPI(
+    title="Mumbai Hacks Claims API",
+    version="2.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -38,6 +104,9 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"message": "Internal Server Error", "detail": str(exc)},
     )
 
+# Compress large JSON/text responses (innermost, so logs and traces see the sent size)
+app.add_middleware(CompressionMiddleware)
+
 # Add CORS middleware
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
 app.add_middleware(
@@ -45,9 +114,18 @@ app.add_middleware(
     allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"], # Restrict methods
-    allow_headers=["Authorization", "Content-Type"], # Restrict headers
+    allow_headers=["Authorization", "Content-Type", "X-Request-ID"], # Restrict headers
+    expose_headers=["X-Request-ID"],
 )
 
+# Root tracing span per request, inside the access log so it can record the request id
+app.add_middleware(TracingMiddleware)
+
+# Structured access log (outermost, so every response is timed and logged).
+# Its per-route histograms are also served on /metrics.
+app.add_middleware(AccessLogMiddleware)
+metrics.registry.add_collector(access_log.metrics_snapshot)
+
 # --- Pydantic Models ---
 
 class ClaimSubmission(BaseModel):
@@ -63,6 +141,10 @@ class ClaimSubmission(BaseModel):
             raise ValueError("Patient details must contain 'name' and 'id'")
         return v
 
+class ClaimLabel(BaseModel):
+    fraud: bool
+    note: Optional[str] = Field(None, max_length=500)
+
 class ClaimStatusResponse(BaseModel):
     id: str
     status: str
@@ -73,32 +155,25 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-# Import ML Service
-from ml_service import ml_service
-
-# Import IPFS Service
-from ipfs_service import ipfs_service
-
-# --- Blockchain Client ---
-
-# Import Blockchain Client
-from blockchain_client import blockchain_client
-
 # --- API Endpoints ---
 
 from routers import auth_router
 app.include_router(auth_router.router)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    print("🚀 Starting Mumbai Hacks Claims API...")
-    blockchain_client.deploy_contract()
-    print("✅ API ready")
+@app.get("/healthz", include_in_schema=False)
+async def healthz(request: Request):
+    """Liveness: the process is up and its event loop responds"""
+    return request.app.state.health.liveness()
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz(request: Request):
+    """Readiness: warm-up complete and dependencies reachable (503 otherwise)"""
+    ready, report = await request.app.state.health.readiness()
+    return ORJSONResponse(report, status_code=200 if ready else 503)
 
 @app.get("/")
 async def root():
-    """Health check endpoint"""
+    """API information (health checks are /healthz and /readyz)"""
     return {
         "message": "Mumbai Hacks Autonomous Claims System API",
         "version": "2.0.0",
@@ -123,112 +198,252 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@contextmanager
+def claim_stage(stage: str):
+    """Time a submit_claim stage as a metric and as a tracing span"""
+    with tracing.span(f"claim.{stage}"), metrics.CLAIM_STAGE_SECONDS.time((stage,)):
+        yield
+
 @app.post("/api/claims/submit")
-@limiter.limit("5/minute")
+@limiter.limit(role_limit)
 async def submit_claim(
     request: Request,
     claim: ClaimSubmission, 
-    db: Session = Depends(get_db),
-    current_user: auth.TokenData = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.TokenData = Depends(auth.get_current_user),
+    ml_service: MLService = Depends(get_ml_service),
+    ipfs_service: IPFSService = Depends(get_ipfs_service),
+    blockchain_client: BlockchainClient = Depends(get_blockchain_client)
 ):
     """Submit a new insurance claim"""
     
-    # Generate unique claim ID
-    claim_id = str(random.randint(10000, 99999))
+    # Reject unknown hospitals up front, from the in-process registry
+    with claim_stage("hospital_check"):
+        hospital_known = await hospital_registry.exists(claim.hospital_id)
+    if not hospital_known:
+        raise HTTPException(status_code=400, detail="Unknown hospital_id")
     
-    # 1. Upload docs to IPFS (Simulated)
-    ipfs_hash = ipfs_service.upload(b"mock_file_content")
+    # Generate unique, time-ordered claim ID (no DB coordination needed)
+    claim_id = claim_id_generator.next_claim_id()
     
-    # 2. Create claim in database
-    db_claim = Claim(
-        claim_id=claim_id,
-        hospital_id=claim.hospital_id,
-        patient_name=claim.patient_details.get("name", "Unknown"),
-        patient_id=claim.patient_details.get("id"),
-        diagnosis=claim.diagnosis,
-        amount=claim.amount,
-        currency=claim.currency,
-        status="Submitted",
-        ipfs_hash=ipfs_hash
-    )
+    # 1. Upload docs to IPFS (Simulated); blocking HTTP, so off the event loop
+    with claim_stage("ipfs_upload"):
+        ipfs_hash = await asyncio.to_thread(ipfs_service.upload, b"mock_file_content")
     
-    try:
-        db.add(db_claim)
-        db.commit()
-        db.refresh(db_claim)
-        
-        # Log event
-        event = ClaimEvent(
+    # 2. Trigger AI Validation (Async)
+    # Returns: is_valid, fraud_score, extracted_data
+    with claim_stage("ml_scoring"):
+        is_valid, fraud_score, extracted_data = await ml_service.process_claim(claim.dict())
+    
+    # Audit trail, persisted together with the claim row
+    events = [
+        ClaimEvent(
             claim_id=claim_id,
             event_type="CLAIM_SUBMITTED",
             event_data={"hospital_id": claim.hospital_id, "amount": claim.amount}
         )
-        db.add(event)
-        db.commit()
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    
-    # 3. Trigger AI Validation (Async)
-    # Returns: is_valid, fraud_score, extracted_data
-    is_valid, fraud_score, extracted_data = await ml_service.process_claim(claim.dict())
-    
-    # Update claim with fraud score
-    db_claim.fraud_score = fraud_score
+    ]
+    approved = is_valid and fraud_score < 20
     
-    if is_valid and fraud_score < 20:
-        db_claim.status = "Approved"
-        
+    if approved:
         # Log validation event
-        event = ClaimEvent(
+        events.append(ClaimEvent(
             claim_id=claim_id,
             event_type="CLAIM_APPROVED",
             event_data={"fraud_score": fraud_score}
-        )
-        db.add(event)
-        
-        # 4. Settle on Blockchain
-        tx_hash = blockchain_client.submit_claim_on_chain(claim_id, claim.amount)
-        db_claim.tx_hash = tx_hash
-        db_claim.status = "Settled"
-        
-        # Log settlement event
-        event = ClaimEvent(
-            claim_id=claim_id,
-            event_type="CLAIM_SETTLED",
-            event_data={"tx_hash": tx_hash}
-        )
-        db.add(event)
+        ))
+        claim_status = "Submitted"
     else:
-        db_claim.status = "Rejected"
+        claim_status = "Rejected"
         
         # Log rejection event
-        event = ClaimEvent(
+        events.append(ClaimEvent(
             claim_id=claim_id,
             event_type="CLAIM_REJECTED",
             event_data={"fraud_score": fraud_score, "reason": "High fraud score or invalid"}
-        )
-        db.add(event)
+        ))
+    
+    # 3. Write claim and events in one transaction, before anything goes on
+    # chain. Approved claims also get a settlement outbox row, so the retry
+    # job settles them if this request does not get that far.
+    db_claim = Claim(
+        claim_id=claim_id,
+        hospital_id=claim.hospital_id,
+        patient_name=claim.patient_details.get("name", "Unknown"),
+        patient_id=claim.patient_details.get("id"),
+        diagnosis=claim.diagnosis,
+        amount=claim.amount,
+        currency=claim.currency,
+        status=claim_status,
+        fraud_score=fraud_score,
+        ipfs_hash=ipfs_hash
+    )
     
-    db.commit()
-    db.refresh(db_claim)
+    # Until the warm-up has deployed the contract, leave settlement to the retry job
+    settle_now = approved and settlement.can_settle(blockchain_client)
+    try:
+        with claim_stage("db_commit"):
+            db.add(db_claim)
+            db.add_all(events)
+            if approved:
+                db.add(settlement.outbox_entry(claim_id, due_now=not settle_now))
+            await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    if settle_now:
+        # 4. Settle on Blockchain, then record the tx_hash in a second transaction.
+        # The receipt wait and retry backoff block, so they run on a thread.
+        with claim_stage("chain_settlement"):
+            tx_hash = await asyncio.to_thread(blockchain_client.submit_claim_on_chain, claim_id, claim.amount)
+        if settlement.settlement_failed(tx_hash):
+            print(f"[!] Settlement of claim {claim_id} failed, left for the retry job")
+        else:
+            try:
+                with claim_stage("settlement_commit"):
+                    await settlement.record_settlement(db, claim_id, tx_hash)
+                claim_status = "Settled"
+            except Exception as e:
+                await db.rollback()
+                print(f"[!] Claim {claim_id} settled on chain but not recorded ({e}), left for the retry job")
         
     return {
         "claim_id": claim_id,
-        "status": db_claim.status,
+        "status": claim_status,
         "fraud_score": fraud_score
     }
 
+@app.get("/api/claims/search")
+async def search_claims_endpoint(
+    q: Optional[str] = Query(None, max_length=200, description="Full-text search over diagnosis"),
+    hospital_id: Optional[str] = None,
+    status: Optional[str] = None,
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    fraud_band: Optional[str] = Query(None, pattern="^(" + "|".join(list(FRAUD_BANDS) + ["unscored"]) + ")$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: auth.TokenData = Depends(auth.get_current_user)
+):
+    """Search claims by diagnosis text with hospital, status, amount and fraud-band facets"""
+    
+    try:
+        return await search_claims(
+            db,
+            q=q,
+            hospital_id=hospital_id,
+            status=status,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            fraud_band=fraud_band,
+            limit=limit,
+            offset=offset
+        )
+    except SearchPageOutOfRange as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/claims/export")
+async def export_claims(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    status: Optional[str] = None,
+    hospital_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_user: auth.TokenData = Depends(auth.require_insurer)
+):
+    """Stream all matching claims as NDJSON or CSV (constant memory; insurer/admin, rows include patient details)"""
+    
+    query = build_export_query(
+        status=status,
+        hospital_id=hospital_id,
+        created_from=created_from,
+        created_to=created_to
+    )
+    filename = f"claims-export.{format}" + (".gz" if gzip else "")
+    
+    return StreamingResponse(
+        export_stream(query, format, gzip=gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+MAX_TIMELINE_IDS = 100
+
+@app.get("/api/claims/timelines")
+async def get_claim_timelines(
+    ids: str = Query(..., description="Comma separated claim IDs"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: auth.TokenData = Depends(auth.get_current_user)
+):
+    """Timelines for several claims in a fixed number of queries"""
+    
+    claim_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not claim_ids or len(claim_ids) > MAX_TIMELINE_IDS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_TIMELINE_IDS} claim IDs")
+    
+    timelines = await load_claim_timelines(db, claim_ids)
+    
+    return Response(
+        content=orjson.dumps({
+            "timelines": [timelines[i] for i in claim_ids if i in timelines],
+            "missing": [i for i in claim_ids if i not in timelines]
+        }),
+        media_type="application/json"
+    )
+
+@app.get("/api/claims/{claim_id}/timeline")
+async def get_claim_timeline(
+    claim_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: auth.TokenData = Depends(auth.get_current_user)
+):
+    """Claim with its full event history"""
+    
+    timeline = await load_claim_timeline(db, claim_id)
+    
+    if not timeline:
+        raise HTTPException(status_code=404, detail="Claim not found")
+    
+    return Response(content=orjson.dumps(timeline), media_type="application/json")
+
+@app.post("/api/claims/{claim_id}/label")
+async def label_claim(
+    claim_id: str,
+    label: ClaimLabel,
+    db: AsyncSession = Depends(get_db),
+    current_user: auth.TokenData = Depends(auth.require_insurer)
+):
+    """Record an investigation outcome (a training label for the fraud model)"""
+    
+    exists = (await db.execute(select(Claim.id).where(Claim.claim_id == claim_id))).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Claim not found")
+    
+    # The label row is what training reads; the event keeps the outcome on the claim's timeline
+    event_type = "FRAUD_CONFIRMED" if label.fraud else "FRAUD_CLEARED"
+    db.add(FraudLabel(claim_id=claim_id, fraud=label.fraud, labeled_by=current_user.username, note=label.note))
+    db.add(ClaimEvent(
+        claim_id=claim_id,
+        event_type=event_type,
+        event_data={"labeled_by": current_user.username, "note": label.note}
+    ))
+    await db.commit()
+    
+    return {"claim_id": claim_id, "event_type": event_type}
+
 @app.get("/api/claims/{claim_id}", response_model=ClaimStatusResponse)
 async def get_claim_status(
     claim_id: str, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: auth.TokenData = Depends(auth.get_current_user)
 ):
     """Get claim status by ID"""
     
-    claim = db.query(Claim).filter(Claim.claim_id == claim_id).first()
+    result = await db.execute(select(Claim).where(Claim.claim_id == claim_id))
+    claim = result.scalars().first()
     
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -240,72 +455,63 @@ async def get_claim_status(
         "tx_hash": claim.tx_hash
     }
 
+CLAIM_LIST_FIELDS = ("claim_id", "hospital_id", "patient_name", "amount", "currency", "status", "fraud_score", "created_at")
+
 @app.get("/api/claims")
 async def list_claims(
     skip: int = 0,
     limit: int = 10,
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: auth.TokenData = Depends(auth.get_current_user)
 ):
     """List all claims with optional filtering"""
     
-    query = db.query(Claim)
+    # Select only the listed columns and serialize the rows directly
+    query = select(*[getattr(Claim, name) for name in CLAIM_LIST_FIELDS])
+    count_query = select(func.count()).select_from(Claim)
     
     if status:
-        query = query.filter(Claim.status == status)
+        query = query.where(Claim.status == status)
+        count_query = count_query.where(Claim.status == status)
     
-    claims = query.offset(skip).limit(limit).all()
+    result = await db.execute(query.offset(skip).limit(limit))
+    rows = result.all()
+    total = (await db.execute(count_query)).scalar_one()
     
-    return {
-        "total": query.count(),
-        "claims": [
-            {
-                "claim_id": c.claim_id,
-                "hospital_id": c.hospital_id,
-                "patient_name": c.patient_name,
-                "amount": float(c.amount),
-                "currency": c.currency,
-                "status": c.status,
-                "fraud_score": c.fraud_score,
-                "created_at": c.created_at.isoformat()
-            }
-            for c in claims
-        ]
-    }
+    return ORJSONResponse({"total": total, "claims": row_dicts(CLAIM_LIST_FIELDS, rows)})
 
 @app.get("/api/hospitals")
-async def list_hospitals(db: Session = Depends(get_db)):
-    """List all registered hospitals"""
+async def list_hospitals(request: Request):
+    """List all registered hospitals (cached, supports conditional GET)"""
     
-    hospitals = db.query(Hospital).all()
+    registry = await hospital_registry.snapshot()
+    headers = {"ETag": registry.etag, "Cache-Control": "no-cache"}
     
-    return {
-        "hospitals": [
-            {
-                "hospital_id": h.hospital_id,
-                "name": h.name,
-                "address": h.address
-            }
-            for h in hospitals
-        ]
-    }
+    if etag_matches(request.headers.get("if-none-match"), registry.etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=registry.body, media_type="application/json", headers=headers)
 
 @app.get("/api/stats")
 async def get_statistics(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: auth.TokenData = Depends(auth.get_current_user)
 ):
     """Get claim statistics"""
     
-    total_claims = db.query(Claim).count()
-    approved = db.query(Claim).filter(Claim.status == "Approved").count()
-    settled = db.query(Claim).filter(Claim.status == "Settled").count()
-    rejected = db.query(Claim).filter(Claim.status == "Rejected").count()
-    
-    total_amount = db.query(Claim).with_entities(
-        db.func.sum(Claim.amount)
-    ).scalar() or 0
+    # Single aggregate round trip instead of one query per counter
+    result = await db.execute(
+        select(
+            func.count(Claim.id),
+            func.count(Claim.id).filter(Claim.status == "Approved"),
+            func.count(Claim.id).filter(Claim.status == "Settled"),
+            func.count(Claim.id).filter(Claim.status == "Rejected"),
+            func.sum(Claim.amount)
+        )
+    )
+    total_claims, approved, settled, rejected, total_amount = result.one()
+    total_amount = total_amount or 0
     
     return {
         "total_claims": total_claims,
@@ -315,3 +521,25 @@ async def get_statistics(
         "total_amount": float(total_amount),
         "approval_rate": (approved / total_claims * 100) if total_claims > 0 else 0
     }
+
+@app.get("/api/access-log/stats")
+async def get_access_log_stats(current_user: auth.TokenData = Depends(auth.require_admin)):
+    """Per-route latency percentiles, access log and trace export counters (admin only)"""
+    return {
+        "routes": access_log.latency_summary(),
+        "log": access_log.stats(),
+        "tracing": tracing.tracer.stats(),
+    }
+
+@app.get("/api/model/drift")
+async def get_model_drift(current_user: auth.TokenData = Depends(auth.require_insurer)):
+    """Fraud model input and score drift against the training baseline (all workers, last DRIFT_WINDOWS windows)"""
+    return drift_monitor.latest_report()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """Prometheus metrics (requires METRICS_TOKEN as a bearer token when set)"""
+    expected = f"Bearer {metrics.METRICS_TOKEN}"
+    if metrics.METRICS_TOKEN and not secrets.compare_digest(request.headers.get("authorization", ""), expected):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(content=await metrics.registry.exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,437 @@
+"""
+Prometheus metrics, kept per worker without locks.
+
+Each uvicorn worker owns its registry. Counters and histograms are plain
+Python numbers in dicts, so recording a value is a dict lookup and an add.
+Most are updated from the event loop thread, but not all: HTTP route
+latencies are counted by the access log writer thread (see
+middleware/access_log.py), and RPC_SECONDS is observed from asyncio.to_thread
+workers (claim settlement, settlement retries, the warm-up deploy). Without
+locks, two threads updating the same series at the same moment can very
+rarely lose one update; snapshots copy each dict in one step and are safe.
+Gauges are read when /metrics is scraped.
+
+With several workers, point METRICS_DIR at a directory they share: every
+worker writes its snapshot there every METRICS_FLUSH_SECONDS, and /metrics
+is built only from those files (the worker serving the scrape writes its own
+first), so every scrape sums the same data whichever worker serves it.
+Like prometheus_client's multiprocess mode, counters and histograms of
+workers that have exited or stopped flushing stay in the totals, so sums
+never go down; their gauges are dropped. Snapshots of workers that have been
+silent for METRICS_RETIRE_SECONDS are folded into retired.json, under an
+exclusive lock that scrapes wait for (POSIX only; elsewhere the files are
+kept). All snapshot file I/O and locking runs on threads, never on the event
+loop.
+"""
+import asyncio
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+load_dotenv()
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# Snapshots older than this belong to workers that are gone
+METRICS_RETIRE_SECONDS = float(os.getenv("METRICS_RETIRE_SECONDS", "300"))
+WORKER_PREFIX = "worker-"
+RETIRED_FILE = "retired.json"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self) -> dict:
+        return {
+            "kind": self.kind, "help": self.help, "labelnames": self.labelnames,
+            "series": [[labels, value] for labels, value in list(self.values.items())],
+        }
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: LabelValues):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+
+
+class Histogram:
+    """Series are [count per bucket..., count above the last bucket, sum]"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, labels: LabelValues = ()) -> _Timer:
+        return _Timer(self, labels)
+
+    def snapshot(self) -> dict:
+        return {
+            "kind": self.kind, "help": self.help, "labelnames": self.labelnames, "buckets": self.buckets,
+            "series": [[labels, list(series)] for labels, series in list(self.values.items())],
+        }
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], callback: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def snapshot(self) -> dict:
+        return {
+            "kind": self.kind, "help": self.help, "labelnames": self.labelnames,
+            "series": [[labels, value] for labels, value in self.callback().items()],
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors: List[Callable[[], Dict[str, dict]]] = []
+        self._snapshot_pid: Optional[int] = None
+        self._snapshot_name: Optional[str] = None
+        self._written: Optional[Dict[str, dict]] = None
+        self._folded: Dict[str, dict] = {}
+        # Scrapes and the flush loop write the same file from different threads
+        self._write_lock = threading.Lock()
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str], callback: Callable[[], Dict[LabelValues, float]]) -> Gauge:
+        return self._register(Gauge(name, help, labelnames, callback))
+
+    def add_collector(self, collector: Callable[[], Dict[str, dict]]):
+        """collector() returns extra metric snapshots keyed by name"""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, dict]:
+        snapshot = {}
+        for name, metric in list(self.metrics.items()):
+            try:
+                snapshot[name] = metric.snapshot()
+            except Exception as e:
+                print(f"[!] Metric {name} failed: {e}")
+        for collector in self.collectors:
+            snapshot.update(collector())
+        return snapshot
+
+    # --- Worker snapshots (METRICS_DIR) ---
+
+    def snapshot_name(self) -> str:
+        """File name for this process; the random part keeps a reused pid from overwriting a dead worker's totals"""
+        if self._snapshot_pid != os.getpid():
+            self._snapshot_pid = os.getpid()
+            self._snapshot_name = f"{WORKER_PREFIX}{os.getpid()}-{secrets.token_hex(4)}.json"
+            self._written, self._folded = None, {}
+        return self._snapshot_name
+
+    def write_snapshot(self, directory: str, snapshot: Optional[Dict[str, dict]] = None):
+        """Blocking file I/O (and flock): call through asyncio.to_thread from async code"""
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        with self._write_lock, _locked(directory, exclusive=False):
+            path = os.path.join(directory, self.snapshot_name())
+            if self._written is not None and not os.path.exists(path):
+                # Folded into retired.json while this worker was silent; only write what it has counted since
+                self._folded = self._written
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(orjson.dumps(_subtract(snapshot, self._folded)))
+            os.replace(tmp, path)
+        self._written = snapshot
+
+    def retire_snapshot(self, directory: str, snapshot: Optional[Dict[str, dict]] = None):
+        """Final write on shutdown: keep this worker's counters and histograms, drop its gauges"""
+        self.write_snapshot(directory, without_gauges(self.snapshot() if snapshot is None else snapshot))
+
+    def worker_snapshots(self, directory: str, live_age: float) -> List[Dict[str, dict]]:
+        """Every flushed snapshot, this worker's included; gauges only from workers flushed within live_age"""
+        now = time.time()
+        snapshots = []
+        with _locked(directory, exclusive=False):
+            retired = _read(os.path.join(directory, RETIRED_FILE))
+            if retired is not None:
+                snapshots.append(retired)
+            for name in os.listdir(directory):
+                if not (name.startswith(WORKER_PREFIX) and name.endswith(".json")):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    live = now - os.path.getmtime(path) <= live_age
+                except OSError:
+                    continue
+                snapshot = _read(path)
+                if snapshot is not None:
+                    snapshots.append(snapshot if live else without_gauges(snapshot))
+        return snapshots
+
+    def _flushed_exposition(self, directory: str, snapshot: Dict[str, dict]) -> str:
+        self.write_snapshot(directory, snapshot)
+        return render(merge(self.worker_snapshots(directory, METRICS_FLUSH_SECONDS * 3)))
+
+    async def exposition(self) -> str:
+        # Gauge callbacks run here on the event loop; the files are handled on a thread
+        snapshot = self.snapshot()
+        if METRICS_DIR:
+            return await asyncio.to_thread(self._flushed_exposition, METRICS_DIR, snapshot)
+        return render(merge([snapshot]))
+
+
+@contextmanager
+def _locked(directory: str, exclusive: bool):
+    """flock on METRICS_DIR/.lock: scrapes share it, folding snapshots into retired.json takes it alone"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read(path: str) -> Optional[Dict[str, dict]]:
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _subtract(snapshot: Dict[str, dict], folded: Dict[str, dict]) -> Dict[str, dict]:
+    """Counters and histograms of snapshot minus what folded already holds"""
+    result = {}
+    for name, metric in snapshot.items():
+        if name not in folded or metric["kind"] == "gauge":
+            result[name] = metric
+            continue
+        counted = {tuple(labels): value for labels, value in folded[name]["series"]}
+        series = []
+        for labels, value in metric["series"]:
+            old = counted.get(tuple(labels))
+            if old is None:
+                series.append([labels, value])
+            elif isinstance(value, list):
+                series.append([labels, [a - b for a, b in zip(value, old)]])
+            else:
+                series.append([labels, value - old])
+        result[name] = {**metric, "series": series}
+    return result
+
+
+def without_gauges(snapshot: Dict[str, dict]) -> Dict[str, dict]:
+    return {name: metric for name, metric in snapshot.items() if metric["kind"] != "gauge"}
+
+
+def retire_stale_snapshots(directory: str, max_age: float = METRICS_RETIRE_SECONDS) -> int:
+    """Fold the snapshots of workers silent for max_age into retired.json; returns how many"""
+    if fcntl is None:
+        return 0
+    now = time.time()
+    with _locked(directory, exclusive=True):
+        stale = []
+        for name in os.listdir(directory):
+            if not (name.startswith(WORKER_PREFIX) and name.endswith(".json")):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    stale.append(path)
+            except OSError:
+                continue
+        if not stale:
+            return 0
+        snapshots = [without_gauges(snapshot) for snapshot in map(_read, stale) if snapshot is not None]
+        retired_path = os.path.join(directory, RETIRED_FILE)
+        retired = _read(retired_path)
+        if retired is not None:
+            snapshots.append(retired)
+        merged = merge(snapshots)
+        for metric in merged.values():
+            metric["series"] = [[list(labels), value] for labels, value in metric["series"].items()]
+        tmp = f"{retired_path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(merged))
+        os.replace(tmp, retired_path)
+        for path in stale:
+            os.remove(path)
+    return len(stale)
+
+
+def merge(snapshots: Iterable[Dict[str, dict]]) -> Dict[str, dict]:
+    """Sum series with the same name and labels across worker snapshots"""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, "series": {}}
+            series = target["series"]
+            for labels, value in metric["series"]:
+                labels = tuple(labels)
+                if labels not in series:
+                    series[labels] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    series[labels] = [a + b for a, b in zip(series[labels], value)]
+                else:
+                    series[labels] += value
+    return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(merged: Dict[str, dict]) -> str:
+    """Prometheus text exposition format 0.0.4"""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for labels, value in sorted(metric["series"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, labels, ('le', _number(bound)))} {_number(cumulative)}")
+            cumulative += value[len(metric["buckets"])]
+            lines.append(f"{name}_bucket{_labels(names, labels, ('le', '+Inf'))} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {_number(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+async def flush_loop(registry: "MetricsRegistry", directory: str, interval: float = METRICS_FLUSH_SECONDS):
+    while True:
+        try:
+            await asyncio.to_thread(registry.write_snapshot, directory, registry.snapshot())
+            await asyncio.to_thread(retire_stale_snapshots, directory)
+        except Exception as e:
+            print(f"[!] Metrics snapshot failed: {e}")
+        await asyncio.sleep(interval)
+
+
+registry = MetricsRegistry()
+
+# Claim pipeline
+CLAIM_STAGE_SECONDS = registry.histogram(
+    "claim_pipeline_stage_seconds", "Time spent in each submit_claim stage", ("stage",)
+)
+ML_BATCH_SIZE = registry.histogram(
+    "ml_batch_size", "Rows scored per fraud model call", buckets=SIZE_BUCKETS
+)
+ML_INFERENCE_SECONDS = registry.histogram(
+    "ml_inference_seconds", "Fraud model prediction time"
+)
+
+# Database
+DB_POOL_CHECKOUT_SECONDS = registry.histogram(
+    "db_pool_checkout_seconds", "Time to check a connection out of the pool (including connect)", ("pool",)
+)
+DB_ENGINES: Dict[str, object] = {}
+
+
+def register_engine(name: str, engine):
+    """Report pool gauges for an engine (read through engine.pool, which dispose() replaces)"""
+    DB_ENGINES[name] = engine
+
+
+def _pool_stat(method: str) -> Callable[[], Dict[LabelValues, float]]:
+    def collect():
+        stats = {}
+        for name, engine in list(DB_ENGINES.items()):
+            pool = engine.pool
+            if hasattr(pool, method):
+                stats[(name,)] = getattr(pool, method)()
+        return stats
+    return collect
+
+
+registry.gauge("db_pool_size", "Configured pool size", ("pool",), _pool_stat("size"))
+registry.gauge("db_pool_checked_out", "Connections currently checked out", ("pool",), _pool_stat("checkedout"))
+registry.gauge("db_pool_overflow", "Connections open beyond pool_size", ("pool",), _pool_stat("overflow"))
+
+# External services
+RPC_SECONDS = registry.histogram(
+    "blockchain_rpc_seconds", "Blockchain JSON-RPC call latency", ("method", "outcome")
+)
+IPFS_SECONDS = registry.histogram(
+    "ipfs_request_seconds", "IPFS (Pinata) request latency", ("operation", "outcome")
+)
+IPFS_BYTES = registry.counter(
+    "ipfs_bytes_total", "Bytes sent to or received from IPFS", ("operation",)
+)
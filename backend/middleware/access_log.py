@@ -0,0 +1,263 @@
+"""
+Structured access log written off the request path.
+
+AccessLogMiddleware only timestamps the request and appends one tuple to a
+bounded buffer (a deque append, no lock or thread wake-up); every
+ACCESS_LOG_FLUSH_INTERVAL seconds a background thread drains the buffer in
+one batch, writes JSON lines to the "access" logger and updates per-route
+latency histograms.
+Successful requests are sampled at ACCESS_LOG_SAMPLE_RATE; errors (status
+>= 400) and requests slower than ACCESS_LOG_SLOW_MS are always written. If
+the buffer is full the entry is dropped and counted rather than blocking.
+
+Each request gets an id (the caller's X-Request-ID or a random one), echoed
+in the response and available to handlers as request.state.request_id.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from dotenv import load_dotenv
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+load_dotenv()
+
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+ACCESS_LOG_QUEUE_SIZE = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000"))
+ACCESS_LOG_FLUSH_INTERVAL = float(os.getenv("ACCESS_LOG_FLUSH_INTERVAL", "0.1"))
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+REQUEST_ID_HEADER = b"x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+# (timestamp, request_id, method, route, path, status, duration_ms, client, bytes_sent)
+AccessEntry = Tuple[float, str, str, str, str, int, float, Optional[str], int]
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, duration_ms: float):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-quantile (None above the last bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return None
+
+
+class AccessLogWriter:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        sample_rate: float = ACCESS_LOG_SAMPLE_RATE,
+        slow_ms: float = ACCESS_LOG_SLOW_MS,
+        maxsize: int = ACCESS_LOG_QUEUE_SIZE,
+        flush_interval: float = ACCESS_LOG_FLUSH_INTERVAL,
+    ):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.entries: "deque[AccessEntry]" = deque()
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.status_counts: Dict[Tuple[str, str, str], int] = {}
+        self.written = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if not self.logger.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush buffered entries and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, entry: AccessEntry):
+        if len(self.entries) >= self.maxsize:
+            self.dropped += 1
+        else:
+            self.entries.append(entry)
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        entries = self.entries
+        while entries:
+            try:
+                self._record(entries.popleft())
+            except Exception as e:
+                print(f"[!] Access log write failed: {e}")
+
+    def _record(self, entry: AccessEntry):
+        timestamp, request_id, method, route, path, status_code, duration_ms, client, bytes_sent = entry
+        histogram = self.histograms.get((method, route))
+        if histogram is None:
+            histogram = self.histograms[(method, route)] = LatencyHistogram()
+        histogram.observe(duration_ms)
+        status_key = (method, route, str(status_code))
+        self.status_counts[status_key] = self.status_counts.get(status_key, 0) + 1
+
+        keep = status_code >= 400 or duration_ms >= self.slow_ms or random.random() < self.sample_rate
+        if not keep:
+            self.sampled_out += 1
+            return
+        self.logger.info(orjson.dumps({
+            "ts": timestamp,
+            "request_id": request_id,
+            "method": method,
+            "route": route,
+            "path": path,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 3),
+            "client": client,
+            "bytes": bytes_sent,
+        }).decode())
+        self.written += 1
+
+    def latency_summary(self) -> List[dict]:
+        """Per-route request counts and latency percentiles (bucket upper bounds)"""
+        summary = []
+        for (method, route), histogram in sorted(dict(self.histograms).items()):
+            summary.append({
+                "method": method,
+                "route": route,
+                "count": histogram.count,
+                "avg_ms": round(histogram.total_ms / histogram.count, 3) if histogram.count else None,
+                "p50_ms": histogram.quantile(0.5),
+                "p95_ms": histogram.quantile(0.95),
+                "p99_ms": histogram.quantile(0.99),
+            })
+        return summary
+
+    def metrics_snapshot(self) -> Dict[str, dict]:
+        """Route latency and request counts in metrics.MetricsRegistry snapshot form"""
+        return {
+            "http_request_duration_seconds": {
+                "kind": "histogram",
+                "help": "HTTP request latency by route template",
+                "labelnames": ("method", "route"),
+                "buckets": [bound / 1000 for bound in LATENCY_BUCKETS_MS],
+                "series": [
+                    [key, [*histogram.counts, histogram.total_ms / 1000]]
+                    for key, histogram in list(self.histograms.items())
+                ],
+            },
+            "http_requests_total": {
+                "kind": "counter",
+                "help": "HTTP requests by route template and status",
+                "labelnames": ("method", "route", "status"),
+                "series": [[key, count] for key, count in list(self.status_counts.items())],
+            },
+        }
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self.entries),
+            "written": self.written,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "sample_rate": self.sample_rate,
+        }
+
+
+access_log = AccessLogWriter(logging.getLogger("access"))
+
+
+class AccessLogMiddleware:
+    """Time each HTTP request and hand one entry to the access log writer"""
+
+    def __init__(self, app: ASGIApp, writer: AccessLogWriter = access_log):
+        self.app = app
+        self.writer = writer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:MAX_REQUEST_ID_LENGTH]
+                break
+        if not request_id:
+            request_id = os.urandom(8).hex()
+        scope.setdefault("state", {})["request_id"] = request_id
+        request_id_header = (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+
+        status_code = 500
+        bytes_sent = 0
+
+        async def send_with_request_id(message: Message):
+            nonlocal status_code, bytes_sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), request_id_header]
+            elif message["type"] == "http.response.body":
+                bytes_sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            route = scope.get("route")
+            client = scope.get("client")
+            self.writer.submit((
+                time.time(),
+                request_id,
+                scope["method"],
+                getattr(route, "path", "<unmatched>"),
+                scope["path"],
+                status_code,
+                (time.perf_counter() - start) * 1000,
+                client[0] if client else None,
+                bytes_sent,
+            ))
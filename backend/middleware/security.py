@@ -1,103 +1,147 @@
-from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import logging
 import secrets
+import time
 import os
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+# Plain ASGI middleware: no per-request task or body re-streaming, so streaming
+# responses pass through untouched and the cost is one dict/list operation.
+
+CONTENT_SECURITY_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+    "style-src 'self' 'unsafe-inline'; "
+    "img-src 'self' data: https:; "
+    "font-src 'self' data:; "
+    "connect-src 'self' https://polygon-rpc.com https://rpc-mumbai.maticvigil.com"
+)
+
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"content-security-policy", CONTENT_SECURITY_POLICY.encode("latin-1")),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+
+security_logger = logging.getLogger("security")
+
+class SecurityHeadersMiddleware:
     """Add security headers to all responses"""
-    
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data: https:; "
-            "font-src 'self' data:; "
-            "connect-src 'self' https://polygon-rpc.com https://rpc-mumbai.maticvigil.com"
-        )
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        
-        return response
-
-class CSRFProtectionMiddleware(BaseHTTPMiddleware):
+
+    def __init__(self, app: ASGIApp, headers=SECURITY_HEADERS):
+        self.app = app
+        self.headers = list(headers)
+        self.names = {name for name, _ in self.headers}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                raw = [h for h in message.get("headers", []) if h[0] not in self.names]
+                raw.extend(self.headers)
+                message["headers"] = raw
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+class CSRFProtectionMiddleware:
     """CSRF protection for state-changing operations"""
-    
+
     SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Skip CSRF check for safe methods
-        if request.method in self.SAFE_METHODS:
-            return await call_next(request)
-        
+        if scope["type"] != "http" or scope["method"] in self.SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
         # Skip CSRF check for API endpoints with Bearer token
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            return await call_next(request)
-        
+        headers = Headers(scope=scope)
+        if headers.get("authorization", "").startswith("Bearer "):
+            await self.app(scope, receive, send)
+            return
+
         # Check CSRF token
-        csrf_token = request.headers.get("X-CSRF-Token")
-        session_token = request.session.get("csrf_token")
-        
-        if not csrf_token or csrf_token != session_token:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="CSRF token missing or invalid"
-            )
-        
-        return await call_next(request)
+        csrf_token = headers.get("x-csrf-token")
+        session_token = scope.get("session", {}).get("csrf_token")
+
+        if not csrf_token or not session_token or not secrets.compare_digest(csrf_token, session_token):
+            response = JSONResponse({"detail": "CSRF token missing or invalid"}, status_code=403)
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
 
 def generate_csrf_token() -> str:
     """Generate a new CSRF token"""
     return secrets.token_urlsafe(32)
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """Log all requests for security auditing"""
-    
-    async def dispatch(self, request: Request, call_next):
-        # Log request
-        import logging
-        logger = logging.getLogger("security")
-        
-        client_ip = request.client.host if request.client else "unknown"
-        logger.info(f"{request.method} {request.url.path} from {client_ip}")
-        
-        response = await call_next(request)
-        
-        # Log response status
-        logger.info(f"Response: {response.status_code}")
-        
-        return response
+
+    def __init__(self, app: ASGIApp, logger: logging.Logger = security_logger):
+        self.app = app
+        self.logger = logger
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            client = scope.get("client")
+            self.logger.info(
+                "%s %s from %s -> %d in %.1fms",
+                scope["method"], scope["path"], client[0] if client else "unknown",
+                status_code, (time.perf_counter() - start) * 1000
+            )
 
 def setup_security_middleware(app):
     """Configure all security middleware"""
-    
-    # HTTPS redirect in production
-    if os.getenv("ENVIRONMENT") == "production":
-        app.add_middleware(HTTPSRedirectMiddleware)
-    
-    # Trusted host middleware
-    allowed_hosts = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
-    app.add_middleware(TrustedHostMiddleware, allowed_hosts=allowed_hosts)
-    
+
+    # Middleware added later wraps middleware added earlier, so go inside-out:
+    # CSRF reads the session that SessionMiddleware puts in the scope.
+    app.add_middleware(CSRFProtectionMiddleware)
+
     # Session middleware (required for CSRF)
     session_secret = os.getenv("SESSION_SECRET")
     if not session_secret:
         raise ValueError("SESSION_SECRET environment variable is required")
     app.add_middleware(SessionMiddleware, secret_key=session_secret)
-    
-    # Custom security middleware
+
+    # Trusted host middleware
+    allowed_hosts = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=allowed_hosts)
+
+    # HTTPS redirect in production
+    if os.getenv("ENVIRONMENT") == "production":
+        app.add_middleware(HTTPSRedirectMiddleware)
+
+    # Outermost: every response, including rejections above, gets the headers.
+    # Requests are logged by middleware.access_log.AccessLogMiddleware.
     app.add_middleware(SecurityHeadersMiddleware)
-    app.add_middleware(CSRFProtectionMiddleware)
-    app.add_middleware(RequestLoggingMiddleware)
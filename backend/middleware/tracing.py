@@ -0,0 +1,70 @@
+"""
+Root span per HTTP request (see tracing.py).
+
+An incoming W3C traceparent header continues the caller's trace; otherwise a
+new trace id is generated. The trace id is echoed in the traceresponse header
+so a slow request reported by a client can be found in the export file.
+"""
+import re
+from typing import Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from tracing import Tracer, tracer as default_tracer
+
+TRACEPARENT_HEADER = b"traceparent"
+TRACERESPONSE_HEADER = b"traceresponse"
+TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+def parse_traceparent(value: str) -> Optional[Tuple[str, str]]:
+    """(trace_id, parent span id) from a traceparent header, None if malformed"""
+    match = TRACEPARENT_RE.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2)
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp, tracer: Tracer = default_tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = parent_id = None
+        for name, value in scope["headers"]:
+            if name == TRACEPARENT_HEADER:
+                parsed = parse_traceparent(value.decode("latin-1"))
+                if parsed:
+                    trace_id, parent_id = parsed
+                break
+
+        method = scope["method"]
+        root = self.tracer.start_trace(f"{method} {scope['path']}", trace_id, parent_id)
+        traceresponse = (TRACERESPONSE_HEADER, f"00-{root.trace.trace_id}-{root.span_id}-01".encode("latin-1"))
+        status_code = 500
+
+        async def send_with_trace(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", []), traceresponse]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except Exception as e:
+            root.record_error(e)
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{method} {route.path}"
+            root.set(status=status_code, path=scope["path"], request_id=scope.get("state", {}).get("request_id"))
+            if status_code >= 500 and root.error is None:
+                root.record_error(f"HTTP {status_code}")
+            self.tracer.end_trace(root)
@@ -1,11 +1,18 @@
 import re
 import random
+import asyncio
 from typing import Dict, Any, Tuple
 from fraud_detection import fraud_detector
+import metrics
+import tracing
 
 class MLService:
     def __init__(self):
         self.fraud_detector = fraud_detector
+
+    def load(self):
+        """Load the fraud model (blocking; run it in a worker thread from async code)"""
+        self.fraud_detector.load()
         print("✅ ML Service Initialized")
 
     async def process_claim(self, claim_data: Dict[str, Any]) -> Tuple[bool, int, Dict[str, Any]]:
@@ -18,28 +25,33 @@ class MLService:
         # 1. Mock OCR & NLP (Extracting data from "diagnosis" text)
         # In a real app, we would process an image here.
         diagnosis_text = claim_data.get("diagnosis", "")
-        extracted_data = self._extract_entities(diagnosis_text)
+        with tracing.span("ml.extract_entities"):
+            extracted_data = self._extract_entities(diagnosis_text)
         
         # 2. Fraud Detection
         amount = claim_data.get("amount", 0)
         
-        # Calculate risk scores based on extracted data
-        hospital_trust = 0.9 # Mock
-        patient_risk = 0.1   # Mock
-        diagnosis_risk = 0.1
+        if not self.fraud_detector.is_trained:
+            # Still warming up: wait for the model without blocking the event loop
+            await asyncio.to_thread(self.fraud_detector.load)
         
-        if "cancer" in diagnosis_text.lower() or "surgery" in diagnosis_text.lower():
-            diagnosis_risk = 0.3
-        if "cosmetic" in diagnosis_text.lower():
-            diagnosis_risk = 0.9
-
-        is_fraud, fraud_score = self.fraud_detector.predict(
-            amount=amount,
-            hospital_trust=hospital_trust,
-            patient_risk=patient_risk,
-            diagnosis_risk=diagnosis_risk
+        # Risk scores from the hospital/patient history the active model was trained with
+        hospital_trust, patient_risk, diagnosis_risk = self.fraud_detector.risk_features(
+            claim_data.get("hospital_id"),
+            (claim_data.get("patient_details") or {}).get("id"),
+            diagnosis_text
         )
         
+        metrics.ML_BATCH_SIZE.observe(1)
+        with tracing.span("ml.predict", batch_size=1) as span, metrics.ML_INFERENCE_SECONDS.time():
+            is_fraud, fraud_score = self.fraud_detector.predict(
+                amount=amount,
+                hospital_trust=hospital_trust,
+                patient_risk=patient_risk,
+                diagnosis_risk=diagnosis_risk
+            )
+            span.set(fraud_score=fraud_score)
+        
         return not is_fraud, fraud_score, extracted_data
 
     def _extract_entities(self, text: str) -> Dict[str, Any]:
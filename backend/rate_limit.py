@@ -0,0 +1,70 @@
+"""
+Rate limiting shared by all workers.
+
+Counters live in RATE_LIMIT_STORAGE_URI (Redis in production, so every
+uvicorn worker enforces the same budget; memory:// is the single-process
+local stand-in) and use the sliding-window-counter strategy, which Redis
+updates atomically in one Lua call. Requests are keyed by the authenticated
+user (role:user_id) rather than by remote address, so integrations behind a
+shared NAT get their own budgets; anonymous requests fall back to the client
+address. The role comes from the users table via the token, and /register
+only hands out auth.SELF_REGISTER_ROLES, so nobody can sign up for the admin
+tier. If the shared store becomes unreachable, limits are enforced
+per worker in memory until it recovers.
+"""
+import os
+from typing import Dict
+
+from dotenv import load_dotenv
+from fastapi import Request
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+import auth
+
+load_dotenv()
+
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+DEFAULT_ROLE_LIMITS = "admin=300/minute,insurer=60/minute,hospital=60/minute,patient=5/minute,anonymous=5/minute"
+ANONYMOUS = "anonymous"
+
+
+def parse_role_limits(spec: str) -> Dict[str, str]:
+    """'hospital=60/minute,patient=5/minute' -> {'hospital': '60/minute', ...}"""
+    limits = {}
+    for item in spec.split(","):
+        role, _, limit = item.partition("=")
+        if role.strip() and limit.strip():
+            limits[role.strip()] = limit.strip()
+    return limits
+
+
+ROLE_LIMITS = parse_role_limits(os.getenv("RATE_LIMITS", DEFAULT_ROLE_LIMITS))
+ROLE_LIMITS.setdefault(ANONYMOUS, "5/minute")
+
+
+def rate_limit_key(request: Request) -> str:
+    """role:user_id for a valid bearer token, else anonymous:<client address>"""
+    authorization = request.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        # Revocation is left to get_current_user, so only one denylist lookup per request
+        token_data = auth.verify_access_token(authorization[7:], check_revoked=False)
+        if token_data is not None:
+            return f"{token_data.role or ANONYMOUS}:{token_data.user_id}"
+    return f"{ANONYMOUS}:{get_remote_address(request)}"
+
+
+def role_limit(key: str) -> str:
+    """Limit for the role encoded in a rate_limit_key"""
+    role = key.split(":", 1)[0]
+    return ROLE_LIMITS.get(role, ROLE_LIMITS[ANONYMOUS])
+
+
+limiter = Limiter(
+    key_func=rate_limit_key,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    key_prefix="mumbai_hacks",
+    in_memory_fallback_enabled=True,
+)
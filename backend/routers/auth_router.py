@@ -1,25 +1,49 @@
+import hmac
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime
-from database import get_db
+from database import get_db, get_read_db
+from serialization import ORJSONResponse
 from models.user import User, RefreshToken, PasswordResetToken, UserRole
 import auth
 from auth import (
     UserCreate, UserLogin, Token, PasswordReset, PasswordResetRequest,
-    get_password_hash, verify_password, create_access_token, create_refresh_token,
-    create_password_reset_token, get_current_user, TokenData
+    create_access_token, create_refresh_token,
+    create_password_reset_token, get_current_user, require_admin, TokenData
 )
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
+def new_refresh_token_row(user_id: int, token: str) -> RefreshToken:
+    lookup_key, token_hash = auth.refresh_token_lookup(token)
+    return RefreshToken(
+        user_id=user_id,
+        lookup_key=lookup_key,
+        token_hash=token_hash,
+        expires_at=datetime.utcnow() + timedelta(days=auth.REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+
+async def find_refresh_token(db: AsyncSession, token: str, *conditions):
+    """Stored row for a refresh token, matched by lookup key then full digest"""
+    lookup_key, token_hash = auth.refresh_token_lookup(token)
+    result = await db.execute(select(RefreshToken).where(
+        RefreshToken.lookup_key == lookup_key, *conditions
+    ))
+    for db_token in result.scalars():
+        if hmac.compare_digest(db_token.token_hash, token_hash):
+            return db_token
+    return None
+
 @router.post("/register", response_model=dict)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     
     # Check if user already exists
-    existing_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.email == user_data.email) | (User.username == user_data.username)
-    ).first()
+    ))
+    existing_user = result.scalars().first()
     
     if existing_user:
         raise HTTPException(
@@ -35,9 +59,14 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid role. Must be one of: {[r.value for r in UserRole]}"
         )
+    if role.value not in auth.SELF_REGISTER_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"The {role.value} role cannot be self-registered"
+        )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await auth.password_hasher.hash(user_data.password)
     new_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -49,8 +78,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return {
         "message": "User registered successfully",
@@ -60,13 +89,18 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login and get access/refresh tokens"""
     
     # Find user
-    user = db.query(User).filter(User.username == user_data.username).first()
+    result = await db.execute(select(User).where(User.username == user_data.username))
+    user = result.scalars().first()
+    
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await auth.password_hasher.verify_and_update(user_data.password, user.hashed_password)
     
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -79,9 +113,11 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
             detail="Account is disabled"
         )
     
-    # Update last login
+    # Update last login, upgrading the stored hash if its settings are outdated
     user.last_login = datetime.utcnow()
-    db.commit()
+    if new_hash:
+        user.hashed_password = new_hash
+    await db.commit()
     
     # Create tokens
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -94,15 +130,9 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
         data={"sub": user.username, "user_id": user.id}
     )
     
-    # Store refresh token in database
-    refresh_token_expires = datetime.utcnow() + timedelta(days=auth.REFRESH_TOKEN_EXPIRE_DAYS)
-    db_refresh_token = RefreshToken(
-        user_id=user.id,
-        token=refresh_token,
-        expires_at=refresh_token_expires
-    )
-    db.add(db_refresh_token)
-    db.commit()
+    # Store the refresh token's digest in database
+    db.add(new_refresh_token_row(user.id, refresh_token))
+    await db.commit()
     
     return {
         "access_token": access_token,
@@ -111,15 +141,15 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_db)):
     """Get new access token using refresh token"""
     
     # Verify refresh token in database
-    db_token = db.query(RefreshToken).filter(
-        RefreshToken.token == refresh_token,
+    db_token = await find_refresh_token(
+        db, refresh_token,
         RefreshToken.revoked == False,
         RefreshToken.expires_at > datetime.utcnow()
-    ).first()
+    )
     
     if not db_token:
         raise HTTPException(
@@ -128,7 +158,7 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
         )
     
     # Get user
-    user = db.query(User).filter(User.id == db_token.user_id).first()
+    user = await db.get(User, db_token.user_id)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -148,14 +178,8 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
     db_token.revoked = True
     
     # Store new refresh token
-    refresh_token_expires = datetime.utcnow() + timedelta(days=auth.REFRESH_TOKEN_EXPIRE_DAYS)
-    new_db_token = RefreshToken(
-        user_id=user.id,
-        token=new_refresh_token,
-        expires_at=refresh_token_expires
-    )
-    db.add(new_db_token)
-    db.commit()
+    db.add(new_refresh_token_row(user.id, new_refresh_token))
+    await db.commit()
     
     return {
         "access_token": access_token,
@@ -167,30 +191,35 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
 async def logout(
     refresh_token: str,
     current_user: TokenData = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    access_token: str = Depends(auth.oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
 ):
     """Logout and revoke refresh token"""
     
+    # Deny the access token used for this request until it expires
+    await auth.revoke_token(access_token)
+    
     # Revoke refresh token
-    db_token = db.query(RefreshToken).filter(
-        RefreshToken.token == refresh_token,
+    db_token = await find_refresh_token(
+        db, refresh_token,
         RefreshToken.user_id == current_user.user_id
-    ).first()
+    )
     
     if db_token:
         db_token.revoked = True
-        db.commit()
+        await db.commit()
     
     return {"message": "Logged out successfully"}
 
 @router.post("/request-password-reset")
 async def request_password_reset(
     request: PasswordResetRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Request password reset email"""
     
-    user = db.query(User).filter(User.email == request.email).first()
+    result = await db.execute(select(User).where(User.email == request.email))
+    user = result.scalars().first()
     
     # Don't reveal if email exists (security best practice)
     if not user:
@@ -206,7 +235,7 @@ async def request_password_reset(
         expires_at=expires_at
     )
     db.add(db_reset_token)
-    db.commit()
+    await db.commit()
     
     # TODO: Send email with reset link
     # send_email(user.email, f"Reset link: http://yourapp.com/reset?token={reset_token}")
@@ -216,16 +245,17 @@ async def request_password_reset(
 @router.post("/reset-password")
 async def reset_password(
     reset_data: PasswordReset,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Reset password using token"""
     
     # Verify token
-    db_token = db.query(PasswordResetToken).filter(
+    result = await db.execute(select(PasswordResetToken).where(
         PasswordResetToken.token == reset_data.token,
         PasswordResetToken.used == False,
         PasswordResetToken.expires_at > datetime.utcnow()
-    ).first()
+    ))
+    db_token = result.scalars().first()
     
     if not db_token:
         raise HTTPException(
@@ -234,34 +264,34 @@ async def reset_password(
         )
     
     # Get user and update password
-    user = db.query(User).filter(User.id == db_token.user_id).first()
+    user = await db.get(User, db_token.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    user.hashed_password = get_password_hash(reset_data.new_password)
+    user.hashed_password = await auth.password_hasher.hash(reset_data.new_password)
     db_token.used = True
-    db.commit()
+    await db.commit()
     
     return {"message": "Password reset successfully"}
 
 @router.get("/me")
 async def get_current_user_info(
     current_user: TokenData = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get current user information"""
     
-    user = db.query(User).filter(User.id == current_user.user_id).first()
+    user = await db.get(User, current_user.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return {
+    return ORJSONResponse({
         "id": user.id,
         "username": user.username,
         "email": user.email,
@@ -269,6 +299,11 @@ async def get_current_user_info(
         "role": user.role.value,
         "is_active": user.is_active,
         "is_verified": user.is_verified,
-        "created_at": user.created_at.isoformat(),
-        "last_login": user.last_login.isoformat() if user.last_login else None
-    }
+        "created_at": user.created_at,
+        "last_login": user.last_login
+    })
+
+@router.get("/hasher-stats")
+async def get_hasher_stats(current_user: TokenData = Depends(require_admin)):
+    """Password hashing pool queue metrics (admin only)"""
+    return auth.password_hasher.stats()
@@ -30,25 +30,36 @@ CREATE TABLE claims (
     tx_hash VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(diagnosis, ''))) STORED,
     FOREIGN KEY (hospital_id) REFERENCES hospitals(hospital_id) ON DELETE CASCADE
 );
 
--- Claim events table (audit trail)
+-- Claim events table (audit trail), range-partitioned by month.
+-- Monthly partitions are created by the API on startup and by
+-- `python -m services.claim_events ensure`; cold partitions are archived
+-- with `python -m services.claim_events archive`.
+CREATE SEQUENCE claim_events_id_seq;
 CREATE TABLE claim_events (
-    id SERIAL PRIMARY KEY,
+    id BIGINT NOT NULL DEFAULT nextval('claim_events_id_seq'),
     claim_id VARCHAR(50) NOT NULL,
     event_type VARCHAR(50) NOT NULL,
     event_data JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
     FOREIGN KEY (claim_id) REFERENCES claims(claim_id) ON DELETE CASCADE
-);
+) PARTITION BY RANGE (created_at);
+ALTER SEQUENCE claim_events_id_seq OWNED BY claim_events.id;
 
 -- Indexes for performance
 CREATE INDEX idx_claims_claim_id ON claims(claim_id);
 CREATE INDEX idx_claims_hospital_id ON claims(hospital_id);
 CREATE INDEX idx_claims_status ON claims(status);
 CREATE INDEX idx_claims_created_at ON claims(created_at);
-CREATE INDEX idx_claim_events_claim_id ON claim_events(claim_id);
+CREATE INDEX idx_claims_amount ON claims(amount);
+CREATE INDEX idx_claims_fraud_score ON claims(fraud_score);
+CREATE INDEX idx_claims_search_vector ON claims USING GIN (search_vector);
+CREATE INDEX ix_claim_events_claim_id_created_at ON claim_events(claim_id, created_at);
+CREATE INDEX ix_claim_events_created_at ON claim_events(created_at);
 
 -- Insert sample hospital data
 INSERT INTO hospitals (hospital_id, name, address) VALUES
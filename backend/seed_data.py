@@ -0,0 +1,466 @@
+"""
+Synthetic data generator and bulk loader for scale testing.
+
+    python seed_data.py --claims 1000000
+    python seed_data.py --claims 10000000 --workers 8 --defer-indexes
+    python seed_data.py --claims 200000 --fraud-ratio 0.15 --hospital-skew 1.2 --months 24
+
+Generates hospitals, users, claims and their claim_events shaped like the
+ones the API writes: time-ordered snowflake claim IDs spread over the last
+--months months, a Zipf-skewed claim volume per hospital and per user,
+lognormal amounts, and roughly a --fraud-ratio share of fraudulent claims
+(more likely at some hospitals and for some patients, with higher amounts;
+most of them scored high and rejected). Decisions follow the API's threshold,
+and a --label-ratio share of claims gets an investigation outcome: a
+fraud_labels row (what services/model_training.py learns from) plus the
+FRAUD_CONFIRMED / FRAUD_CLEARED event the API records with it.
+
+PostgreSQL: batches of claims are generated by --workers processes and
+streamed with COPY, one transaction per batch. Monthly claim_events
+partitions are created for the whole range first. --defer-indexes drops the
+secondary indexes of claims and claim_events (keeping primary keys and unique
+constraints), loads, and rebuilds them afterwards, which is much faster for
+large loads. Tables are ANALYZEd at the end.
+
+SQLite: one process with chunked executemany inserts.
+
+Data is appended to whatever is in the database (run init_db.py first).
+Generated usernames carry a run tag and claim IDs are unique per run, so
+loads can be repeated; the same --seed reproduces the same data.
+"""
+import argparse
+import io
+import math
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from database import DATABASE_URL, init_db
+import models.user  # Register user models
+from services.id_generator import EPOCH_MS, MAX_SEQUENCE, MAX_WORKER_ID, TIMESTAMP_SHIFT, WORKER_SHIFT, format_id
+
+CHAINS = ["APOLLO", "MAX", "FORTIS", "MANIPAL", "NARAYANA", "MEDANTA", "AIIMS", "KOKILABEN", "RUBY", "ASTER"]
+CITIES = {
+    "DEL": "New Delhi", "MUM": "Mumbai", "BLR": "Bengaluru", "CHE": "Chennai", "HYD": "Hyderabad",
+    "KOL": "Kolkata", "PUN": "Pune", "AHM": "Ahmedabad", "JAI": "Jaipur", "LKO": "Lucknow",
+    "KOC": "Kochi", "IND": "Indore", "NAG": "Nagpur", "BHO": "Bhopal", "PAT": "Patna",
+}
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Rohan", "Saanvi", "Arjun",
+               "Priya", "Rahul", "Sneha", "Vikram", "Meera", "Karan", "Pooja", "Nikhil", "Asha", "Farhan",
+               "Lakshmi", "Suresh", "Neha", "Imran", "Gurpreet", "Joseph", "Fatima", "Rajesh", "Divya", "Sanjay"]
+LAST_NAMES = ["Sharma", "Verma", "Patel", "Iyer", "Reddy", "Nair", "Gupta", "Singh", "Khan", "Das",
+              "Mehta", "Joshi", "Rao", "Kulkarni", "Banerjee", "Chopra", "Menon", "Pillai", "Shah", "Fernandes"]
+# (diagnosis, weight, typical amount in INR)
+DIAGNOSES = [
+    ("Dengue fever with thrombocytopenia", 8, 45000),
+    ("Viral fever", 12, 12000),
+    ("Typhoid fever", 5, 25000),
+    ("Acute appendicitis, laparoscopic appendectomy", 6, 90000),
+    ("Fracture of radius, open reduction and internal fixation", 5, 120000),
+    ("Type 2 diabetes mellitus with ketoacidosis", 4, 60000),
+    ("Community acquired pneumonia", 6, 55000),
+    ("COVID-19 infection, moderate", 3, 80000),
+    ("Urinary tract infection", 6, 15000),
+    ("Cataract surgery with lens implant", 5, 35000),
+    ("Coronary artery disease, angioplasty with stent", 3, 250000),
+    ("Gallstones, laparoscopic cholecystectomy", 4, 110000),
+    ("Normal delivery", 7, 40000),
+    ("Caesarean section", 5, 85000),
+    ("Kidney stones, ureteroscopy", 4, 70000),
+    ("Breast cancer, chemotherapy cycle", 2, 150000),
+    ("Acute gastroenteritis", 7, 18000),
+    ("Knee replacement surgery", 2, 300000),
+]
+USER_ROLES = [("HOSPITAL", 60), ("PATIENT", 29), ("INSURER", 10), ("ADMIN", 1)]
+CURRENCIES = [("INR", 95), ("USD", 3), ("EUR", 2)]
+# Same rule as submit_claim: settled only when the fraud score is below this
+APPROVAL_THRESHOLD = 20
+# Fraud share detected by the deployed model (the rest slips through with a low score)
+DETECTED_FRAUD_SHARE = 0.7
+RISKY_PATIENT_EVERY = 40
+RISKY_PATIENT_FACTOR = 4
+# Password for every generated user ("password123", hashed once)
+PASSWORD = "password123"
+
+
+def zipf_cum_weights(count: int, skew: float):
+    total = 0.0
+    cumulative = []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** skew
+        cumulative.append(total)
+    return cumulative
+
+
+def cumulative(pairs):
+    total = 0
+    weights = []
+    for _, weight in pairs:
+        total += weight
+        weights.append(total)
+    return weights
+
+
+# --- Hospitals and users (main process) ---
+
+def generated_hospitals(count: int):
+    """(hospital_id, name, address) for count hospitals, stable across runs"""
+    hospitals = []
+    for n in range(1, count // (len(CHAINS) * len(CITIES)) + 2):
+        for chain in CHAINS:
+            for code, city in CITIES.items():
+                hospitals.append((f"{chain}-{code}-{n:03d}", f"{chain.title()} Hospital {city} {n}", f"{city}, India"))
+    return hospitals[:count]
+
+
+def load_hospitals(conn, count: int):
+    existing = set(conn.execute(text("SELECT hospital_id FROM hospitals")).scalars())
+    hospitals = generated_hospitals(count)
+    missing = [h for h in hospitals if h[0] not in existing]
+    if missing:
+        conn.execute(
+            text("INSERT INTO hospitals (hospital_id, name, address, created_at) VALUES (:id, :name, :address, :created_at)"),
+            [{"id": h[0], "name": h[1], "address": h[2], "created_at": datetime.utcnow()} for h in missing],
+        )
+    print(f"[+] Hospitals: {len(missing)} added, {len(hospitals) - len(missing)} already present")
+    return [h[0] for h in hospitals]
+
+
+def user_rows(count: int, tag: str, rng: random.Random, hashed_password: str, since: datetime, span: float):
+    roles = [role for role, _ in USER_ROLES]
+    role_weights = cumulative(USER_ROLES)
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        created = (since + timedelta(seconds=span * i / max(count, 1))).isoformat(sep=" ")
+        yield (
+            f"{first.lower()}.{last.lower()}.{tag}{i}@example.com",
+            f"{tag}_{i}",
+            hashed_password,
+            f"{first} {last}",
+            rng.choices(roles, cum_weights=role_weights)[0],
+            "t", "t",
+            created, created,
+        )
+
+
+USER_COLUMNS = ("email", "username", "hashed_password", "full_name", "role", "is_active", "is_verified", "created_at", "updated_at")
+
+
+def load_users(engine, count: int, tag: str, rng: random.Random, since: datetime, span: float):
+    from auth import get_password_hash
+    rows = user_rows(count, tag, rng, get_password_hash(PASSWORD), since, span)
+    raw = engine.raw_connection()
+    try:
+        if engine.dialect.name == "postgresql":
+            copy_rows(raw, "users", USER_COLUMNS, rows)
+        else:
+            insert_rows(raw, "users", USER_COLUMNS, ((*row[:5], 1, 1, *row[7:]) for row in rows))
+        raw.commit()
+    finally:
+        raw.close()
+    with engine.connect() as conn:
+        ids = list(conn.execute(text("SELECT id FROM users WHERE username LIKE :prefix ESCAPE '\\' ORDER BY id"), {"prefix": f"{tag}\\_%"}).scalars())
+    print(f"[+] Users: {len(ids)} added (password {PASSWORD!r})")
+    return ids
+
+
+# --- Bulk writers ---
+
+def copy_rows(raw, table: str, columns, rows):
+    """COPY rows (tuples of str/None) into table with PostgreSQL's text format"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join("\\N" if value is None else value for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    with raw.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def insert_rows(raw, table: str, columns, rows, chunk: int = 10_000):
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    cursor = raw.cursor()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk:
+            cursor.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        cursor.executemany(sql, batch)
+    cursor.close()
+
+
+# --- Claims and events ---
+
+CLAIM_COLUMNS = ("claim_id", "hospital_id", "user_id", "patient_name", "patient_id", "diagnosis", "amount", "currency",
+                 "status", "fraud_score", "ipfs_hash", "tx_hash", "created_at", "updated_at")
+EVENT_COLUMNS = ("claim_id", "event_type", "event_data", "created_at")
+LABEL_COLUMNS = ("claim_id", "fraud", "labeled_by", "note", "created_at")
+
+
+class BatchGenerator:
+    """Claims (with their events and labels) for one time slice, in created_at order"""
+
+    def __init__(self, config: dict, hospital_ids, user_ids):
+        self.config = config
+        self.hospital_ids = hospital_ids
+        self.hospital_weights = zipf_cum_weights(len(hospital_ids), config["hospital_skew"])
+        self.user_ids = user_ids
+        self.user_weights = zipf_cum_weights(len(user_ids), config["user_skew"]) if user_ids else None
+        self.diagnoses = [(name, amount) for name, _, amount in DIAGNOSES]
+        self.diagnosis_weights = cumulative([(d, w) for d, w, _ in DIAGNOSES])
+        self.currencies = [c for c, _ in CURRENCIES]
+        self.currency_weights = cumulative(CURRENCIES)
+        # Fraud is more common at some hospitals (0.25x-1.75x) and for some patients
+        self.hospital_propensity = {h: 0.25 + 1.5 * (zlib.crc32(h.encode()) % 1000) / 1000 for h in hospital_ids}
+
+    def generate(self, batch: int, start: float, end: float, count: int):
+        """Yield (claim_row, event_rows, label_rows) for count claims between the start/end Unix times"""
+        config = self.config
+        rng = random.Random(config["seed"] * 1_000_003 + batch)
+        worker_bits = ((config["worker_base"] + batch) & MAX_WORKER_ID) << WORKER_SHIFT
+        hospitals = rng.choices(self.hospital_ids, cum_weights=self.hospital_weights, k=count)
+        users = rng.choices(self.user_ids, cum_weights=self.user_weights, k=count) if self.user_ids else [None] * count
+        diagnoses = rng.choices(self.diagnoses, cum_weights=self.diagnosis_weights, k=count)
+        currencies = rng.choices(self.currencies, cum_weights=self.currency_weights, k=count)
+        step = (end - start) / count
+        patients = config["patients"]
+        fraud_ratio = config["fraud_ratio"]
+        label_ratio = config["label_ratio"]
+        now = config["now"]
+        last_ms = sequence = -1
+
+        for i in range(count):
+            created = start + (i + rng.random()) * step
+            ms = int(created * 1000)
+            if ms <= last_ms:
+                # Same millisecond: next sequence number, or borrow the next millisecond when it is used up
+                sequence += 1
+                if sequence > MAX_SEQUENCE:
+                    last_ms, sequence = last_ms + 1, 0
+                ms = last_ms
+            else:
+                last_ms, sequence = ms, 0
+            claim_id = format_id(((ms - EPOCH_MS) << TIMESTAMP_SHIFT) | worker_bits | sequence)
+            created_at = datetime.utcfromtimestamp(ms / 1000)
+            decided_at = created_at + timedelta(milliseconds=rng.randint(200, 5000))
+
+            patient = rng.randrange(patients)
+            patient_name = f"{FIRST_NAMES[patient % len(FIRST_NAMES)]} {LAST_NAMES[patient // len(FIRST_NAMES) % len(LAST_NAMES)]}"
+            diagnosis, typical = diagnoses[i]
+            propensity = self.hospital_propensity[hospitals[i]] * (RISKY_PATIENT_FACTOR if patient % RISKY_PATIENT_EVERY == 0 else 1)
+            fraud = rng.random() < fraud_ratio * propensity
+            amount = typical * rng.lognormvariate(0, 0.5) * (rng.uniform(2, 6) if fraud else 1)
+            if fraud and rng.random() < DETECTED_FRAUD_SHARE:
+                fraud_score = rng.randint(51, 99)
+            else:
+                fraud_score = int(rng.random() ** 3 * 51)
+            settled = fraud_score < APPROVAL_THRESHOLD
+            tx_hash = f"0x{rng.getrandbits(256):064x}" if settled else None
+
+            created_text = created_at.isoformat(sep=" ")
+            decided_text = decided_at.isoformat(sep=" ")
+            amount_text = f"{amount:.2f}"
+            user = users[i]
+            claim = (
+                claim_id, hospitals[i], None if user is None else str(user), patient_name, f"P{patient:08d}",
+                diagnosis, amount_text, currencies[i], "Settled" if settled else "Rejected", str(fraud_score),
+                f"Qm{rng.getrandbits(176):044x}", tx_hash, created_text, decided_text,
+            )
+            events = [(claim_id, "CLAIM_SUBMITTED", f'{{"hospital_id": "{hospitals[i]}", "amount": {amount_text}}}', created_text)]
+            if settled:
+                events.append((claim_id, "CLAIM_APPROVED", f'{{"fraud_score": {fraud_score}}}', decided_text))
+                events.append((claim_id, "CLAIM_SETTLED", f'{{"tx_hash": "{tx_hash}"}}', decided_text))
+            else:
+                events.append((claim_id, "CLAIM_REJECTED",
+                               f'{{"fraud_score": {fraud_score}, "reason": "High fraud score or invalid"}}', decided_text))
+            labels = []
+            if rng.random() < label_ratio:
+                # Investigation outcome, days or weeks after the decision
+                labeled_at = decided_at + timedelta(days=rng.uniform(1, 30))
+                if labeled_at.timestamp() < now:
+                    labeled_text = labeled_at.isoformat(sep=" ")
+                    events.append((claim_id, "FRAUD_CONFIRMED" if fraud else "FRAUD_CLEARED",
+                                   '{"labeled_by": "seed_data", "note": null}', labeled_text))
+                    labels.append((claim_id, "t" if fraud else "f", "seed_data", None, labeled_text))
+            yield claim, events, labels
+
+
+_worker = {}
+
+
+def init_worker(url: str, config: dict, hospital_ids, user_ids):
+    engine = create_engine(url, poolclass=NullPool)
+    _worker["raw"] = engine.raw_connection()
+    _worker["postgresql"] = engine.dialect.name == "postgresql"
+    _worker["generator"] = BatchGenerator(config, hospital_ids, user_ids)
+
+
+def load_batch(task):
+    """Generate and write one batch in its own transaction; returns (claims, events)"""
+    batch, start, end, count = task
+    raw = _worker["raw"]
+    claims, events, labels = [], [], []
+    for claim, claim_events, claim_labels in _worker["generator"].generate(batch, start, end, count):
+        claims.append(claim)
+        events.extend(claim_events)
+        labels.extend(claim_labels)
+    if _worker["postgresql"]:
+        copy_rows(raw, "claims", CLAIM_COLUMNS, claims)
+        copy_rows(raw, "claim_events", EVENT_COLUMNS, events)
+        copy_rows(raw, "fraud_labels", LABEL_COLUMNS, labels)
+    else:
+        insert_rows(raw, "claims", CLAIM_COLUMNS, claims)
+        insert_rows(raw, "claim_events", EVENT_COLUMNS, events)
+        insert_rows(raw, "fraud_labels", LABEL_COLUMNS, ((c, int(f == "t"), *rest) for c, f, *rest in labels))
+    raw.commit()
+    return len(claims), len(events)
+
+
+# --- PostgreSQL index handling ---
+
+DEFERRABLE_INDEXES = """
+    SELECT i.indexname, i.indexdef
+    FROM pg_indexes i
+    JOIN pg_class c ON c.relname = i.indexname
+    WHERE i.schemaname = current_schema() AND i.tablename IN ('claims', 'claim_events')
+      AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = c.oid)
+"""
+
+
+def drop_secondary_indexes(engine):
+    """Drop non-constraint indexes on claims/claim_events; returns their definitions"""
+    with engine.begin() as conn:
+        indexes = conn.execute(text(DEFERRABLE_INDEXES)).all()
+        for name, _ in indexes:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    print(f"[*] Dropped {len(indexes)} secondary indexes for the load")
+    return [definition for _, definition in indexes]
+
+
+def rebuild_indexes(url: str, definitions, workers: int):
+    """Recreate the dropped indexes, several at a time"""
+    if not definitions:
+        return
+    start = time.perf_counter()
+    with Pool(min(workers, len(definitions))) as pool:
+        pool.map(build_index, [(url, definition) for definition in definitions])
+    print(f"[+] Rebuilt {len(definitions)} indexes in {time.perf_counter() - start:.0f}s")
+
+
+def build_index(task):
+    url, definition = task
+    engine = create_engine(url, poolclass=NullPool)
+    with engine.begin() as conn:
+        conn.execute(text("SET maintenance_work_mem = '512MB'"))
+        conn.execute(text(definition))
+    engine.dispose()
+
+
+# --- Main ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and bulk-load synthetic claims")
+    parser.add_argument("--claims", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=None, help="default: claims / 100, at least 10")
+    parser.add_argument("--hospitals", type=int, default=300)
+    parser.add_argument("--patients", type=int, default=None, help="distinct patients (default: claims / 3)")
+    parser.add_argument("--months", type=int, default=12, help="spread claims over this many months up to now")
+    parser.add_argument("--fraud-ratio", type=float, default=0.05)
+    parser.add_argument("--label-ratio", type=float, default=0.2, help="share of claims with an investigation outcome (training label)")
+    parser.add_argument("--hospital-skew", type=float, default=1.0, help="Zipf exponent of claims per hospital (0 = uniform)")
+    parser.add_argument("--user-skew", type=float, default=0.8, help="Zipf exponent of claims per user")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="loader processes (PostgreSQL)")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="claims per COPY/transaction")
+    parser.add_argument("--defer-indexes", action="store_true", help="drop secondary indexes during the load (PostgreSQL)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    rng = random.Random(seed)
+    tag = f"synth{seed % 100000:05d}"
+    users = args.users if args.users is not None else max(10, args.claims // 100)
+
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    postgresql = engine.dialect.name == "postgresql"
+    workers = max(1, args.workers) if postgresql else 1
+    now = time.time()
+    since = now - args.months * 30.44 * 86400
+    print(f"[*] Loading {args.claims:,} claims into {engine.dialect.name} (seed {seed}, {workers} worker(s))")
+
+    init_db()
+    if postgresql:
+        from services.claim_events import ensure_partitions
+        with engine.begin() as conn:
+            ensure_partitions(conn, start=datetime.utcfromtimestamp(since))
+
+    with engine.begin() as conn:
+        hospital_ids = load_hospitals(conn, args.hospitals)
+    # Popularity rank (for the Zipf skew) independent of chain and city
+    rng.shuffle(hospital_ids)
+    user_ids = load_users(engine, users, tag, rng, datetime.utcfromtimestamp(since), now - since)
+
+    deferred = drop_secondary_indexes(engine) if postgresql and args.defer_indexes else []
+
+    config = {
+        "seed": seed,
+        "worker_base": rng.randrange(MAX_WORKER_ID + 1),
+        "patients": args.patients or max(1, args.claims // 3),
+        "fraud_ratio": args.fraud_ratio,
+        "label_ratio": args.label_ratio,
+        "now": now,
+        "hospital_skew": args.hospital_skew,
+        "user_skew": args.user_skew,
+    }
+    batches = math.ceil(args.claims / args.batch_size) if args.claims else 0
+    span = (now - since) / max(batches, 1)
+    tasks = [
+        (b, since + b * span, since + (b + 1) * span, min(args.batch_size, args.claims - b * args.batch_size))
+        for b in range(batches)
+    ]
+
+    start = time.perf_counter()
+    claims = events = 0
+    try:
+        if workers > 1:
+            pool = Pool(workers, initializer=init_worker, initargs=(DATABASE_URL, config, hospital_ids, user_ids))
+            results = pool.imap_unordered(load_batch, tasks)
+        else:
+            pool = None
+            init_worker(DATABASE_URL, config, hospital_ids, user_ids)
+            results = map(load_batch, tasks)
+        for done, (batch_claims, batch_events) in enumerate(results, 1):
+            claims += batch_claims
+            events += batch_events
+            elapsed = time.perf_counter() - start
+            print(f"\r[*] {claims:,}/{args.claims:,} claims, {events:,} events ({claims / elapsed:,.0f} claims/s)", end="", flush=True)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        print()
+        if deferred:
+            rebuild_indexes(DATABASE_URL, deferred, workers)
+
+    load_seconds = time.perf_counter() - start
+    if postgresql:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE hospitals, users, claims, claim_events, fraud_labels"))
+    print(f"[+] Loaded {claims:,} claims and {events:,} events in {load_seconds:.0f}s "
+          f"({claims / max(load_seconds, 1e-9):,.0f} claims/s); total {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[!] Interrupted; batches already committed stay loaded")
+        sys.exit(1)
@@ -0,0 +1,42 @@
+"""
+JSON rendering with orjson.
+
+ORJSONResponse is the app's default response class. orjson serializes
+datetime, date, UUID and enums natively; Decimal (Numeric columns) is
+rendered as a JSON number. Routes that return plain dicts still go through
+FastAPI's jsonable_encoder first, so hot list endpoints build their payload
+from result rows and return a response directly (row_dicts + ORJSONResponse),
+which skips that per-value walk.
+"""
+from decimal import Decimal
+from typing import Any, Iterable, List, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def orjson_default(value: Any):
+    """Types orjson does not handle natively"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=orjson_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def row_dicts(fields: Sequence[str], rows: Iterable[Sequence]) -> List[dict]:
+    """Result rows (tuples from a column select) as dicts keyed by fields"""
+    return [dict(zip(fields, row)) for row in rows]
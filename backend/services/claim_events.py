@@ -0,0 +1,414 @@
+"""
+Monthly partition management and cold-storage archival for claim_events.
+
+On PostgreSQL claim_events is range-partitioned by created_at, one partition
+per month (claim_events_y2026m01, ...). Partitions are created ahead of time
+on startup and by a daily maintenance task. The same task streams partitions
+older than the retention window to zstd-compressed Parquet files on local
+disk, then detaches and drops them; an advisory lock keeps concurrent workers
+from archiving the same partition (set CLAIM_EVENTS_AUTO_ARCHIVE=false to
+archive from cron with the CLI instead). load_claim_timeline() reads both the
+live table and the archive, so callers don't need to know where an event lives.
+
+Usage:
+    python -m services.claim_events ensure              # create upcoming partitions
+    python -m services.claim_events migrate             # convert an existing plain table
+    python -m services.claim_events archive             # archive partitions past retention now
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import selectinload
+
+load_dotenv()
+
+ARCHIVE_DIR = os.getenv("CLAIM_EVENTS_ARCHIVE_DIR", "archive/claim_events")
+RETENTION_MONTHS = int(os.getenv("CLAIM_EVENTS_RETENTION_MONTHS", "12"))
+PREMAKE_MONTHS = int(os.getenv("CLAIM_EVENTS_PREMAKE_MONTHS", "3"))
+AUTO_ARCHIVE = os.getenv("CLAIM_EVENTS_AUTO_ARCHIVE", "true").lower() == "true"
+# How long a worker trusts its list of archived months (another worker may have archived since)
+ARCHIVE_INDEX_SECONDS = float(os.getenv("CLAIM_EVENTS_ARCHIVE_INDEX_SECONDS", "60"))
+MAINTENANCE_INTERVAL_SECONDS = 24 * 60 * 60
+# pg_try_advisory_lock key held while archiving
+ARCHIVE_LOCK_KEY = 0x636C6D65
+ARCHIVE_BATCH_SIZE = 10_000
+
+PARTITION_RE = re.compile(r"^claim_events_y(\d{4})m(\d{2})$")
+ARCHIVE_RE = re.compile(r"^claim_events_y(\d{4})m(\d{2})\.parquet$")
+
+PARTITIONED_TABLE_DDL = [
+    "CREATE SEQUENCE IF NOT EXISTS claim_events_id_seq",
+    """
+    CREATE TABLE IF NOT EXISTS claim_events (
+        id BIGINT NOT NULL DEFAULT nextval('claim_events_id_seq'),
+        claim_id VARCHAR(50) NOT NULL REFERENCES claims(claim_id) ON DELETE CASCADE,
+        event_type VARCHAR(50) NOT NULL,
+        event_data JSONB,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at)
+    """,
+    "ALTER SEQUENCE claim_events_id_seq OWNED BY claim_events.id",
+    "CREATE INDEX IF NOT EXISTS ix_claim_events_claim_id_created_at ON claim_events (claim_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_claim_events_created_at ON claim_events (created_at)",
+]
+
+
+# --- Month helpers ---
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"claim_events_y{month.year:04d}m{month.month:02d}"
+
+
+# --- Partition management (PostgreSQL) ---
+
+def is_partitioned(conn: Connection) -> bool:
+    relkind = conn.execute(
+        # Cast: asyncpg returns the "char" type as bytes
+        text("SELECT relkind::text FROM pg_class WHERE relname = 'claim_events' AND relkind IN ('r', 'p')")
+    ).scalar()
+    return relkind == "p"
+
+
+def create_partitioned_table(conn: Connection, months_ahead: int = PREMAKE_MONTHS):
+    """Create claim_events as a partitioned table plus its upcoming partitions"""
+    for statement in PARTITIONED_TABLE_DDL:
+        conn.execute(text(statement))
+    ensure_partitions(conn, months_ahead=months_ahead)
+
+
+def list_partitions(conn: Connection) -> List[date]:
+    """Months that currently have a claim_events partition, oldest first"""
+    rows = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'claim_events'
+    """)).scalars()
+    months = []
+    for name in rows:
+        match = PARTITION_RE.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_partition(conn: Connection, month: date):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF claim_events "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = PREMAKE_MONTHS, start: Optional[date] = None):
+    """Make sure partitions exist from `start` (default: this month) through months_ahead"""
+    current = month_start(datetime.utcnow())
+    month = month_start(start) if start else current
+    last = add_months(current, months_ahead)
+    while month <= last:
+        create_partition(conn, month)
+        month = add_months(month, 1)
+
+
+def migrate_to_partitioned(conn: Connection):
+    """Convert an existing plain claim_events table into the partitioned layout"""
+    if is_partitioned(conn):
+        print("[!] claim_events is already partitioned")
+        return
+
+    oldest = conn.execute(text("SELECT MIN(created_at) FROM claim_events")).scalar()
+
+    # Move the legacy table out of the way, keeping its id sequence alive
+    conn.execute(text("ALTER SEQUENCE IF EXISTS claim_events_id_seq OWNED BY NONE"))
+    conn.execute(text("ALTER TABLE claim_events RENAME TO claim_events_legacy"))
+    conn.execute(text("ALTER TABLE claim_events_legacy RENAME CONSTRAINT claim_events_pkey TO claim_events_legacy_pkey"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_claim_events_claim_id_created_at"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_claim_events_created_at"))
+
+    create_partitioned_table(conn)
+    if oldest:
+        ensure_partitions(conn, start=oldest)
+
+    conn.execute(text("""
+        INSERT INTO claim_events (id, claim_id, event_type, event_data, created_at)
+        SELECT id, claim_id, event_type, event_data, COALESCE(created_at, CURRENT_TIMESTAMP)
+        FROM claim_events_legacy
+    """))
+    conn.execute(text(
+        "SELECT setval('claim_events_id_seq', GREATEST((SELECT COALESCE(MAX(id), 0) FROM claim_events), 1))"
+    ))
+    conn.execute(text("DROP TABLE claim_events_legacy"))
+    print("[+] claim_events migrated to monthly partitions")
+
+
+# --- Archival ---
+
+def archive_path(month: date, archive_dir: str = ARCHIVE_DIR) -> str:
+    return os.path.join(archive_dir, f"{partition_name(month)}.parquet")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("pyarrow is required for claim_events archival: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def archive_partition(engine, month: date, archive_dir: str = ARCHIVE_DIR) -> int:
+    """
+    Stream one partition to Parquet, then detach and drop it.
+    Rows are written sorted by (claim_id, created_at) so row-group statistics
+    let timeline lookups skip most of the file. Returns the number of rows.
+    """
+    pa, pq = _require_pyarrow()
+    name = partition_name(month)
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("claim_id", pa.string()),
+        ("event_type", pa.string()),
+        ("event_data", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+    os.makedirs(archive_dir, exist_ok=True)
+    final_path = archive_path(month, archive_dir)
+    tmp_path = final_path + ".tmp"
+    rows_written = 0
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=ARCHIVE_BATCH_SIZE).execute(text(
+            f"SELECT id, claim_id, event_type, event_data, created_at FROM {name} ORDER BY claim_id, created_at"
+        ))
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for batch in result.partitions():
+                columns = list(zip(*batch))
+                columns[3] = [json.dumps(v) if v is not None else None for v in columns[3]]
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                rows_written += len(batch)
+
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, final_path)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE claim_events DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+
+    print(f"[+] Archived {rows_written} events from {name} to {final_path}")
+    return rows_written
+
+
+def archive_cold_partitions(engine, retention_months: int = RETENTION_MONTHS, archive_dir: str = ARCHIVE_DIR) -> List[date]:
+    """Archive every partition that ends before the retention window"""
+    cutoff = add_months(month_start(datetime.utcnow()), -retention_months)
+    with engine.connect() as conn:
+        months = [m for m in list_partitions(conn) if add_months(m, 1) <= cutoff]
+    for month in months:
+        archive_partition(engine, month, archive_dir)
+    if months:
+        archive_index.refresh()
+    return months
+
+
+def archive_if_unlocked(engine) -> Optional[List[date]]:
+    """archive_cold_partitions() unless another worker holds the archive lock (then None)"""
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ARCHIVE_LOCK_KEY}).scalar():
+            return None
+        try:
+            return archive_cold_partitions(engine)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ARCHIVE_LOCK_KEY})
+
+
+def archived_months(archive_dir: str = ARCHIVE_DIR) -> List[date]:
+    if not os.path.isdir(archive_dir):
+        return []
+    months = []
+    for filename in os.listdir(archive_dir):
+        match = ARCHIVE_RE.match(filename)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+class ArchiveIndex:
+    """Cached archived_months(), so timeline requests don't list the directory on the event loop"""
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR, ttl: float = ARCHIVE_INDEX_SECONDS):
+        self.archive_dir = archive_dir
+        self.ttl = ttl
+        self._months: List[date] = []
+        self._loaded_at: Optional[float] = None
+
+    def months(self) -> List[date]:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.refresh()
+        return self._months
+
+    def refresh(self):
+        self._months = archived_months(self.archive_dir)
+        self._loaded_at = time.monotonic()
+
+
+archive_index = ArchiveIndex()
+
+
+def read_archived_events(claim_ids: List[str], since: Optional[datetime] = None, archive_dir: str = ARCHIVE_DIR,
+                         months: Optional[List[date]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Events for the given claims from the Parquet archive (blocking; run off the event loop)"""
+    if months is None:
+        months = archived_months(archive_dir)
+    if since is not None:
+        months = [m for m in months if m >= month_start(since)]
+    events: Dict[str, List[Dict[str, Any]]] = {}
+    if not months or not claim_ids:
+        return events
+
+    _, pq = _require_pyarrow()
+    for month in months:
+        table = pq.read_table(archive_path(month, archive_dir), filters=[("claim_id", "in", list(claim_ids))])
+        for row in table.to_pylist():
+            events.setdefault(row["claim_id"], []).append({
+                "event_type": row["event_type"],
+                "event_data": json.loads(row["event_data"]) if row["event_data"] else None,
+                "created_at": row["created_at"],
+                "archived": True,
+            })
+    return events
+
+
+# --- Timeline ---
+
+def _claim_summary(claim) -> Dict[str, Any]:
+    return {
+        "claim_id": claim.claim_id,
+        "hospital_id": claim.hospital_id,
+        "status": claim.status,
+        "amount": float(claim.amount),
+        "currency": claim.currency,
+        "fraud_score": claim.fraud_score,
+        "tx_hash": claim.tx_hash,
+        "created_at": claim.created_at,
+    }
+
+
+async def load_claim_timelines(db, claim_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Claims with their full event history, keyed by claim_id.
+    Uses two queries regardless of how many claims are requested (claims,
+    then their events via selectinload), plus an archive read when cold
+    partitions have been archived.
+    """
+    from database import Claim
+
+    result = await db.execute(
+        select(Claim)
+        .options(selectinload(Claim.events))
+        .where(Claim.claim_id.in_(claim_ids))
+    )
+    timelines = {}
+    for claim in result.scalars().all():
+        timeline = _claim_summary(claim)
+        timeline["events"] = [
+            {
+                "event_type": e.event_type,
+                "event_data": e.event_data,
+                "created_at": e.created_at,
+                "archived": False,
+            }
+            for e in claim.events
+        ]
+        timelines[claim.claim_id] = timeline
+
+    months = archive_index.months() if timelines else []
+    if months:
+        since = min((t["created_at"] for t in timelines.values() if t["created_at"]), default=None)
+        archived = await asyncio.to_thread(read_archived_events, list(timelines), since, ARCHIVE_DIR, months)
+        for claim_id, events in archived.items():
+            merged = events + timelines[claim_id]["events"]
+            timelines[claim_id]["events"] = sorted(merged, key=lambda e: e["created_at"])
+    return timelines
+
+
+async def load_claim_timeline(db, claim_id: str) -> Optional[Dict[str, Any]]:
+    """Single claim with its events from the live table and the archive, or None"""
+    return (await load_claim_timelines(db, [claim_id])).get(claim_id)
+
+
+# --- Scheduled maintenance ---
+
+async def run_maintenance(async_engine):
+    """Create upcoming partitions and archive those past retention (PostgreSQL only)"""
+    if async_engine.dialect.name != "postgresql":
+        return
+    async with async_engine.begin() as conn:
+        partitioned = await conn.run_sync(is_partitioned)
+        if partitioned:
+            await conn.run_sync(ensure_partitions)
+    if partitioned and AUTO_ARCHIVE:
+        from database import engine
+        # Parquet writing and the sync driver block, so archive in a worker thread
+        archived = await asyncio.to_thread(archive_if_unlocked, engine)
+        if archived:
+            print(f"[+] Archived {len(archived)} claim_events partition(s)")
+
+
+async def maintenance_loop(async_engine, interval: int = MAINTENANCE_INTERVAL_SECONDS):
+    while True:
+        try:
+            await run_maintenance(async_engine)
+        except Exception as e:
+            print(f"[!] claim_events maintenance failed: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from database import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+    if engine.dialect.name != "postgresql":
+        print("[!] claim_events partitioning requires PostgreSQL")
+        sys.exit(1)
+
+    if command == "ensure":
+        with engine.begin() as conn:
+            ensure_partitions(conn)
+        print("[+] claim_events partitions are up to date")
+    elif command == "migrate":
+        with engine.begin() as conn:
+            migrate_to_partitioned(conn)
+    elif command == "archive":
+        archived = archive_if_unlocked(engine)
+        if archived is None:
+            print("[!] Another process is archiving claim_events")
+            sys.exit(1)
+        print(f"[+] Archived {len(archived)} partition(s)")
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
@@ -0,0 +1,242 @@
+"""
+Full-text and faceted claim search.
+
+On PostgreSQL, claims.search_vector is a stored generated tsvector over the
+diagnosis text with a GIN index, and the facet columns (hospital_id, status,
+amount, fraud_score) have B-tree indexes. A search runs the ranked page of
+results and one GROUPING SETS query for all facet counts. Both are capped so
+broad searches stay cheap: results are ranked among the newest
+RANK_CANDIDATE_LIMIT matches (looked up in the newest RANK_WINDOW claims
+first, see _rank_candidates), and ranked pages past those matches are
+refused with SearchPageOutOfRange, and facet counting scans at most
+FACET_SCAN_LIMIT matching rows (beyond that the counts are a lower bound and
+flagged as such). benchmarks/claim_search.py times both against a seeded
+database.
+
+SQLite (local tooling) falls back to a LIKE match (q taken literally) without
+ranking.
+
+    python -m services.claim_search    # add the column and indexes to an existing database
+"""
+import os
+import sys
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, case, func, literal_column, select, text, tuple_
+from sqlalchemy.engine import Connection
+
+FACET_SCAN_LIMIT = int(os.getenv("SEARCH_FACET_SCAN_LIMIT", "5000"))
+RANK_CANDIDATE_LIMIT = int(os.getenv("SEARCH_RANK_CANDIDATE_LIMIT", "200"))
+RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "50000"))
+TEXT_SEARCH_CONFIG = "english"
+
+# fraud_score bands, aligned with submit_claim (approved below 20, fraud above 50)
+FRAUD_BANDS = {
+    "low": (0, 19),
+    "medium": (20, 50),
+    "high": (51, 100),
+}
+AMOUNT_BUCKETS = [1000, 10000, 100000, 1000000]
+
+SEARCH_SCHEMA_DDL = [
+    f"""
+    ALTER TABLE claims ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(diagnosis, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_claims_search_vector ON claims USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_claims_hospital_id ON claims (hospital_id)",
+    "CREATE INDEX IF NOT EXISTS ix_claims_status ON claims (status)",
+    "CREATE INDEX IF NOT EXISTS ix_claims_amount ON claims (amount)",
+    "CREATE INDEX IF NOT EXISTS ix_claims_fraud_score ON claims (fraud_score)",
+    "CREATE INDEX IF NOT EXISTS ix_claims_created_at ON claims (created_at)",
+]
+
+
+def ensure_search_schema(conn: Connection):
+    """Add the tsvector column and search indexes (PostgreSQL; rewrites claims once)"""
+    for statement in SEARCH_SCHEMA_DDL:
+        conn.execute(text(statement))
+
+
+class SearchPageOutOfRange(ValueError):
+    """offset + limit goes past the ranked candidates"""
+
+
+def _amount_band(column):
+    whens = []
+    lower = 0
+    for upper in AMOUNT_BUCKETS:
+        whens.append((column < upper, f"{lower}-{upper}"))
+        lower = upper
+    return case(*whens, else_=f"{AMOUNT_BUCKETS[-1]}+")
+
+
+def _fraud_band(column):
+    return case(
+        (column.is_(None), "unscored"),
+        *[(column <= high, band) for band, (_, high) in FRAUD_BANDS.items()],
+        else_="high"
+    )
+
+
+async def _rank_candidates(db, match, window_match, filters, candidates: int = RANK_CANDIDATE_LIMIT):
+    """
+    Ids of the newest `candidates` matches, which is all that gets ranked:
+    ts_rank_cd reads every candidate's tsvector. A broad search finds them by
+    walking the newest RANK_WINDOW claims down the created_at index, which
+    costs the same whatever the terms. Only when that window has fewer than
+    `candidates` matches does the search go to the GIN index, whose bitmap
+    scan visits every match. Both paths return the same set, which does not
+    depend on the page, so pages never overlap or skip results.
+    """
+    from database import Claim
+
+    newest_first = Claim.created_at.desc()
+    cutoff = (await db.execute(
+        select(Claim.created_at).order_by(newest_first).offset(RANK_WINDOW).limit(1)
+    )).scalar()
+    if cutoff is not None:
+        ids = (await db.execute(
+            select(Claim.id).where(Claim.created_at >= cutoff, window_match, *filters)
+            .order_by(newest_first).limit(candidates)
+        )).scalars().all()
+        if len(ids) >= candidates:
+            return ids
+    return (await db.execute(
+        select(Claim.id).where(match, *filters).order_by(newest_first).limit(candidates)
+    )).scalars().all()
+
+
+async def search_claims(
+    db,
+    q: Optional[str] = None,
+    hospital_id: Optional[str] = None,
+    status: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    fraud_band: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    from database import Claim
+
+    postgres = db.bind.dialect.name == "postgresql"
+    filters = []
+    match = None
+    rank = None
+
+    if q:
+        if postgres:
+            search_vector = literal_column("claims.search_vector")
+            tsquery = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, q)
+            match = search_vector.op("@@")(tsquery)
+            rank = func.ts_rank_cd(search_vector, tsquery)
+            # Same match as a function call, which the GIN index does not serve
+            window_match = func.ts_match_vq(search_vector, tsquery)
+        else:
+            pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            match = Claim.diagnosis.ilike(f"%{pattern}%", escape="\\")
+    if hospital_id:
+        filters.append(Claim.hospital_id == hospital_id)
+    if status:
+        filters.append(Claim.status == status)
+    if min_amount is not None:
+        filters.append(Claim.amount >= min_amount)
+    if max_amount is not None:
+        filters.append(Claim.amount <= max_amount)
+    if fraud_band:
+        if fraud_band == "unscored":
+            filters.append(Claim.fraud_score.is_(None))
+        else:
+            low, high = FRAUD_BANDS[fraud_band]
+            filters.append(Claim.fraud_score.between(low, high))
+
+    where = and_(True, *([match] if match is not None else []), *filters)
+
+    if postgres:
+        # asyncpg prepares statements, and after five runs PostgreSQL may switch
+        # to a generic plan that cannot see how selective the search terms are
+        await db.execute(text("SET LOCAL plan_cache_mode = force_custom_plan"))
+
+    # 1. Ranked page of results
+    columns = [
+        Claim.claim_id, Claim.hospital_id, Claim.patient_name, Claim.diagnosis,
+        Claim.amount, Claim.currency, Claim.status, Claim.fraud_score, Claim.created_at
+    ]
+    if rank is None:
+        page = select(*columns).where(where).order_by(Claim.created_at.desc(), Claim.id.desc())
+    else:
+        if offset + limit > RANK_CANDIDATE_LIMIT:
+            raise SearchPageOutOfRange(
+                f"Ranked results stop at {RANK_CANDIDATE_LIMIT}; narrow the search with filters"
+            )
+        candidate_ids = await _rank_candidates(db, match, window_match, filters)
+        page = (
+            select(*columns, rank.label("rank"))
+            .where(Claim.id.in_(candidate_ids))
+            .order_by(rank.desc(), Claim.created_at.desc(), Claim.id.desc())
+        )
+    rows = (await db.execute(page.offset(offset).limit(limit))).all()
+
+    results = [
+        {
+            "claim_id": r.claim_id,
+            "hospital_id": r.hospital_id,
+            "patient_name": r.patient_name,
+            "diagnosis": r.diagnosis,
+            "amount": float(r.amount),
+            "currency": r.currency,
+            "status": r.status,
+            "fraud_score": r.fraud_score,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+            "rank": float(r.rank) if rank is not None else None,
+        }
+        for r in rows
+    ]
+
+    # 2. Facet counts over (at most FACET_SCAN_LIMIT) matching rows
+    matched = select(
+        Claim.hospital_id,
+        Claim.status,
+        _fraud_band(Claim.fraud_score).label("fraud_band"),
+        _amount_band(Claim.amount).label("amount_band"),
+    ).where(where).limit(FACET_SCAN_LIMIT + 1).subquery()
+    facet_names = ["hospital_id", "status", "fraud_band", "amount_band"]
+    facets: Dict[str, Dict[str, int]] = {name: {} for name in facet_names}
+
+    if postgres:
+        facet_rows = (await db.execute(
+            select(*[matched.c[name] for name in facet_names], func.count())
+            .group_by(func.grouping_sets(*[tuple_(matched.c[name]) for name in facet_names]))
+        )).all()
+        for row in facet_rows:
+            for i, name in enumerate(facet_names):
+                if row[i] is not None:
+                    facets[name][row[i]] = row[-1]
+                    break
+    else:
+        for name in facet_names:
+            facet_rows = (await db.execute(
+                select(matched.c[name], func.count()).group_by(matched.c[name])
+            )).all()
+            facets[name] = {value: count for value, count in facet_rows}
+
+    total = sum(facets["status"].values())
+    return {
+        "total": total,
+        "total_is_estimate": total > FACET_SCAN_LIMIT,
+        "results": results,
+        "facets": facets,
+    }
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from database import engine
+
+    if engine.dialect.name != "postgresql":
+        print("[!] Full-text search indexes require PostgreSQL")
+        sys.exit(1)
+    with engine.begin() as conn:
+        ensure_search_schema(conn)
+    print("[+] Claim search column and indexes are in place")
@@ -9,6 +9,17 @@ class EncryptionService:
     """Centralized encryption service with proper key management"""
     
     def __init__(self):
+        self.encryption_key = None
+        self._cipher_suite: Optional[Fernet] = None
+    
+    @property
+    def cipher_suite(self) -> Fernet:
+        if self._cipher_suite is None:
+            self.load()
+        return self._cipher_suite
+    
+    def load(self):
+        """Read and validate ENCRYPTION_KEY (the app lifespan calls this at startup, so a bad key fails the boot)"""
         # Require encryption key from environment
         self.encryption_key = os.getenv("ENCRYPTION_KEY")
         
@@ -19,7 +30,7 @@ class EncryptionService:
             )
         
         try:
-            self.cipher_suite = Fernet(self.encryption_key.encode())
+            self._cipher_suite = Fernet(self.encryption_key.encode())
         except Exception as e:
             raise ValueError(f"Invalid ENCRYPTION_KEY: {e}")
         
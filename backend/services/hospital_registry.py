@@ -0,0 +1,111 @@
+"""
+In-process cache of the hospital registry.
+
+Hospitals change rarely, so each worker keeps the full list in memory along
+with a pre-serialized /api/hospitals body. The registry version is a digest of
+its contents and doubles as the ETag, so it only changes when the data does.
+The cache reloads from the database every HOSPITAL_REGISTRY_TTL_SECONDS, on
+invalidate(), or (rate limited) when a lookup misses.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+load_dotenv()
+
+REGISTRY_TTL_SECONDS = float(os.getenv("HOSPITAL_REGISTRY_TTL_SECONDS", "60"))
+# A miss may mean a hospital was just added; reload at most this often on misses
+MISS_RELOAD_INTERVAL_SECONDS = 5.0
+
+
+class RegistrySnapshot:
+    """Immutable view of the registry at one version"""
+
+    def __init__(self, hospitals: List[Dict[str, Optional[str]]]):
+        self.hospitals = hospitals
+        self.ids: FrozenSet[str] = frozenset(h["hospital_id"] for h in hospitals)
+        self.body = json.dumps({"hospitals": hospitals}, separators=(",", ":")).encode("utf-8")
+        self.version = hashlib.sha256(self.body).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+
+
+class HospitalRegistry:
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._snapshot: Optional[RegistrySnapshot] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _session(self):
+        if self._session_factory is None:
+            from database import replica_router
+            return replica_router.session()
+        return self._session_factory()
+
+    async def _reload(self) -> RegistrySnapshot:
+        from database import Hospital
+
+        async with self._session() as db:
+            result = await db.execute(select(Hospital).order_by(Hospital.hospital_id))
+            hospitals = [
+                {
+                    "hospital_id": h.hospital_id,
+                    "name": h.name,
+                    "address": h.address
+                }
+                for h in result.scalars().all()
+            ]
+        snapshot = RegistrySnapshot(hospitals)
+        if self._snapshot is None or snapshot.version != self._snapshot.version:
+            print(f"[*] Hospital registry loaded: {len(hospitals)} hospitals (version {snapshot.version})")
+        self._snapshot = snapshot
+        self._loaded_at = time.monotonic()
+        return snapshot
+
+    async def snapshot(self, max_age: float = REGISTRY_TTL_SECONDS) -> RegistrySnapshot:
+        """Current registry, reloading if it is older than max_age"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < max_age:
+            return snapshot
+        async with self._lock:
+            # Another request may have reloaded while we waited
+            if self._snapshot is not None and time.monotonic() - self._loaded_at < max_age:
+                return self._snapshot
+            return await self._reload()
+
+    async def exists(self, hospital_id: str) -> bool:
+        """Check a hospital_id against the registry without a per-request query"""
+        snapshot = await self.snapshot()
+        if hospital_id in snapshot.ids:
+            return True
+        snapshot = await self.snapshot(max_age=MISS_RELOAD_INTERVAL_SECONDS)
+        return hospital_id in snapshot.ids
+
+    def invalidate(self):
+        """Force a reload on next access (call after writing to hospitals)"""
+        self._loaded_at = 0.0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against a strong ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+# Global hospital registry instance
+hospital_registry = HospitalRegistry()
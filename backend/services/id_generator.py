@@ -0,0 +1,117 @@
+"""
+Snowflake-style, time-ordered ID generator for claim IDs.
+
+Layout of the 63-bit ID (fits BIGINT and the contract's uint256 claim ID):
+
+    | 41 bits: ms since EPOCH | 10 bits: worker id | 12 bits: sequence |
+
+Each worker issues up to 4096 IDs per millisecond without any database
+coordination; IDs from one worker are strictly increasing and IDs across
+workers are ordered by time to the millisecond. Claim IDs are rendered as
+zero-padded 19-digit strings so that string order matches numeric order in
+the claims.claim_id index.
+
+Worker ids must be unique among running processes. API workers lease one
+from the database on startup (services/worker_lease.py); the process-wide
+generator refuses to issue IDs until it has one.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+# 2024-01-01T00:00:00Z in milliseconds
+EPOCH_MS = 1704067200000
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WORKER_SHIFT = SEQUENCE_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS
+ID_DIGITS = 19
+
+# Tolerate small NTP adjustments by waiting; larger jumps are an error
+MAX_CLOCK_BACKWARDS_MS = 50
+
+
+def check_worker_id(worker_id: int) -> int:
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+    return worker_id
+
+
+class SnowflakeGenerator:
+    def __init__(self, worker_id: Optional[int] = None):
+        self.worker_id = None
+        self._worker_bits = 0
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+        if worker_id is not None:
+            self.set_worker_id(worker_id)
+
+    def set_worker_id(self, worker_id: Optional[int]):
+        """Switch to a newly leased worker id (None stops issuing IDs)"""
+        with self._lock:
+            self.worker_id = None if worker_id is None else check_worker_id(worker_id)
+            self._worker_bits = (worker_id or 0) << WORKER_SHIFT
+
+    @staticmethod
+    def _now_ms() -> int:
+        return time.time_ns() // 1_000_000 - EPOCH_MS
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self.worker_id is None:
+                raise RuntimeError("No worker id leased; refusing to generate IDs")
+            now = self._now_ms()
+            if now < self._last_ms:
+                drift = self._last_ms - now
+                if drift > MAX_CLOCK_BACKWARDS_MS:
+                    raise RuntimeError(f"Clock moved backwards by {drift}ms; refusing to generate IDs")
+                while now < self._last_ms:
+                    time.sleep(drift / 1000)
+                    now = self._now_ms()
+
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond
+                    while now <= self._last_ms:
+                        now = self._now_ms()
+            else:
+                self._sequence = 0
+
+            self._last_ms = now
+            return (now << TIMESTAMP_SHIFT) | self._worker_bits | self._sequence
+
+    def next_claim_id(self) -> str:
+        return format_id(self.next_id())
+
+
+def format_id(value: int) -> str:
+    return str(value).zfill(ID_DIGITS)
+
+
+def parse_id(value) -> dict:
+    """Split an ID into its timestamp (ms since Unix epoch), worker and sequence"""
+    value = int(value)
+    return {
+        "timestamp_ms": (value >> TIMESTAMP_SHIFT) + EPOCH_MS,
+        "worker_id": (value >> WORKER_SHIFT) & MAX_WORKER_ID,
+        "sequence": value & MAX_SEQUENCE,
+    }
+
+
+# Global generator for this process; gets its worker id from the lease
+claim_id_generator = SnowflakeGenerator()
+
+
+def _reinit_after_fork():
+    # Workers forked from a preloaded parent must lease their own worker id
+    claim_id_generator.__init__()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
@@ -0,0 +1,413 @@
+"""
+Fraud model retraining from labeled claim history.
+
+Labels are investigation outcomes recorded with POST /api/claims/{id}/label,
+stored in fraud_labels (indexed on created_at). They are not read from
+claim_events, whose old partitions are archived and dropped. Training runs
+in its own process, never inside an API worker:
+
+    python -m services.model_training train           # train, evaluate, promote if good enough
+    python -m services.model_training watch           # retrain on a schedule or after enough new labels
+    python -m services.model_training status
+    python -m services.model_training migrate-labels  # copy labels recorded as claim events (live and archived)
+
+Only the latest label of each claim is used, so a relabeled claim is trained
+on with its current outcome only. Labeled claims are streamed from the
+database in label order with a server-side cursor, TRAIN_CHUNK_SIZE rows at a time, and each chunk is turned
+into features with numpy. Hospital trust and patient risk come from the fraud
+rate of the earlier labels (smoothed towards the overall rate; patients by hash
+bucket), looked up before the chunk's own labels are counted, which is how
+they look at scoring time. Rows go into fixed-size reservoir samples: the
+oldest part of the history for training (TRAIN_MAX_ROWS), the most recent
+TRAIN_HOLDOUT_FRACTION for evaluation (HOLDOUT_MAX_ROWS). Memory therefore
+stays bounded no matter how much history there is.
+
+The candidate is scored on the holdout together with the active model. It is
+promoted only if its ROC AUC reaches PROMOTE_MIN_AUC and is not worse than
+the active model's by more than PROMOTE_TOLERANCE. Promotion writes the
+artifact, then atomically replaces current.json, and API workers pick it up
+on their next reload (FRAUD_MODEL_RELOAD_SECONDS). The artifact also carries
+the baseline the API's drift monitor (drift.py) compares live traffic with:
+histograms of the most recent DRIFT_BASELINE_ROWS claims (labeled or not),
+featurized with the artifact's own risk tables as the API will featurize
+them, and of the candidate's scores for them.
+"""
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select, text
+
+from database import Claim, ClaimEvent, FraudLabel
+from drift import FEATURES, baseline_histograms
+from fraud_detection import (
+    FRAUD_LABEL_EVENTS, FRAUD_MODEL_DIR, PATIENT_BUCKETS, DEFAULT_DIAGNOSIS_RISK, DIAGNOSIS_RISK_KEYWORDS,
+    ModelArtifact, load_artifact, promote, read_current, save_artifact, synthetic_artifact,
+)
+
+load_dotenv()
+
+TRAIN_CHUNK_SIZE = int(os.getenv("TRAIN_CHUNK_SIZE", "20000"))
+TRAIN_MAX_ROWS = int(os.getenv("TRAIN_MAX_ROWS", "200000"))
+TRAIN_HOLDOUT_FRACTION = float(os.getenv("TRAIN_HOLDOUT_FRACTION", "0.2"))
+HOLDOUT_MAX_ROWS = int(os.getenv("HOLDOUT_MAX_ROWS", "50000"))
+TRAIN_MIN_ROWS = int(os.getenv("TRAIN_MIN_ROWS", "200"))
+RETRAIN_INTERVAL_SECONDS = float(os.getenv("RETRAIN_INTERVAL_SECONDS", str(24 * 60 * 60)))
+RETRAIN_MIN_NEW_LABELS = int(os.getenv("RETRAIN_MIN_NEW_LABELS", "1000"))
+RETRAIN_CHECK_SECONDS = float(os.getenv("RETRAIN_CHECK_SECONDS", "300"))
+PROMOTE_MIN_AUC = float(os.getenv("PROMOTE_MIN_AUC", "0.6"))
+PROMOTE_TOLERANCE = float(os.getenv("PROMOTE_TOLERANCE", "0.005"))
+DRIFT_BASELINE_ROWS = int(os.getenv("DRIFT_BASELINE_ROWS", "50000"))
+
+# Weight (in labels) of the overall fraud rate when smoothing per-hospital / per-patient rates
+SMOOTHING = 20.0
+
+
+def label_query(since: Optional[datetime] = None):
+    """Labeled claims in label order, one row per claim: a relabel supersedes the claim's earlier labels"""
+    latest = select(
+        FraudLabel.id,
+        func.row_number().over(
+            partition_by=FraudLabel.claim_id,
+            order_by=(FraudLabel.created_at.desc(), FraudLabel.id.desc())
+        ).label("position"),
+    ).subquery()
+    query = (
+        select(Claim.amount, Claim.hospital_id, Claim.patient_id, Claim.diagnosis, FraudLabel.fraud, FraudLabel.created_at)
+        .join(Claim, Claim.claim_id == FraudLabel.claim_id)
+        .join(latest, latest.c.id == FraudLabel.id)
+        .where(latest.c.position == 1)
+        .order_by(FraudLabel.created_at, FraudLabel.id)
+    )
+    if since is not None:
+        query = query.where(FraudLabel.created_at > since)
+    return query
+
+
+def count_labels(engine, since: Optional[datetime] = None) -> int:
+    query = select(func.count()).select_from(FraudLabel)
+    if since is not None:
+        query = query.where(FraudLabel.created_at > since)
+    with engine.connect() as conn:
+        return conn.execute(query).scalar_one()
+
+
+INSERT_MISSING_LABEL = text("""
+    INSERT INTO fraud_labels (claim_id, fraud, labeled_by, note, created_at)
+    SELECT :claim_id, :fraud, :labeled_by, :note, :created_at
+    WHERE NOT EXISTS (SELECT 1 FROM fraud_labels WHERE claim_id = :claim_id AND created_at = :created_at)
+""")
+
+
+def migrate_labels(engine) -> int:
+    """Copy FRAUD_CONFIRMED / FRAUD_CLEARED claim events, live and archived, into fraud_labels (idempotent)"""
+    from services.claim_events import ARCHIVE_DIR, archive_path, archived_months, _require_pyarrow
+
+    FraudLabel.__table__.create(engine, checkfirst=True)
+    existing = select(FraudLabel.id).where(
+        FraudLabel.claim_id == ClaimEvent.claim_id, FraudLabel.created_at == ClaimEvent.created_at
+    ).exists()
+    live = select(
+        ClaimEvent.claim_id,
+        ClaimEvent.event_type == "FRAUD_CONFIRMED",
+        ClaimEvent.event_data["labeled_by"].as_string(),
+        ClaimEvent.event_data["note"].as_string(),
+        ClaimEvent.created_at,
+    ).where(ClaimEvent.event_type.in_(list(FRAUD_LABEL_EVENTS)), ~existing)
+    with engine.begin() as conn:
+        copied = conn.execute(
+            FraudLabel.__table__.insert().from_select(["claim_id", "fraud", "labeled_by", "note", "created_at"], live)
+        ).rowcount
+
+    months = archived_months(ARCHIVE_DIR)
+    if months:
+        _, pq = _require_pyarrow()
+    for month in months:
+        table = pq.read_table(archive_path(month), filters=[("event_type", "in", list(FRAUD_LABEL_EVENTS))])
+        rows = []
+        for row in table.to_pylist():
+            data = json.loads(row["event_data"]) if row["event_data"] else {}
+            rows.append({
+                "claim_id": row["claim_id"], "fraud": row["event_type"] == "FRAUD_CONFIRMED",
+                "labeled_by": data.get("labeled_by"), "note": data.get("note"), "created_at": row["created_at"],
+            })
+        if rows:
+            with engine.begin() as conn:
+                copied += conn.execute(INSERT_MISSING_LABEL, rows).rowcount
+    return copied
+
+
+def stream_label_chunks(engine, chunk_size: int = TRAIN_CHUNK_SIZE):
+    """Yield column arrays for chunk_size labeled claims at a time, oldest label first"""
+    import numpy as np
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(label_query())
+        for rows in result.partitions():
+            amount, hospital_id, patient_id, diagnosis, fraud, created_at = zip(*rows)
+            yield {
+                "amount": np.asarray(amount, dtype=np.float64),
+                "hospital_id": hospital_id,
+                "patient_bucket": np.fromiter(
+                    (zlib.crc32(str(p or "").encode()) % PATIENT_BUCKETS for p in patient_id), dtype=np.int64, count=len(rows)
+                ),
+                "diagnosis_risk": diagnosis_risks(np.asarray(diagnosis, dtype=str)),
+                "label": np.asarray(fraud, dtype=np.int8),
+                "last_labeled_at": created_at[-1],
+            }
+
+
+def diagnosis_risks(diagnoses):
+    """fraud_detection.diagnosis_risk over an array of diagnosis texts"""
+    import numpy as np
+
+    lowered = np.char.lower(diagnoses)
+    risk = np.full(len(diagnoses), DEFAULT_DIAGNOSIS_RISK)
+    for keyword, value in DIAGNOSIS_RISK_KEYWORDS:
+        risk = np.where(np.char.find(lowered, keyword) >= 0, np.maximum(risk, value), risk)
+    return risk
+
+
+class RiskHistory:
+    """Running label counts per hospital and per patient bucket"""
+
+    def __init__(self):
+        import numpy as np
+        self.np = np
+        self.hospitals = {}
+        self.patient_count = np.zeros(PATIENT_BUCKETS, dtype=np.int64)
+        self.patient_fraud = np.zeros(PATIENT_BUCKETS, dtype=np.int64)
+        self.count = 0
+        self.fraud = 0
+
+    def prior(self) -> float:
+        return (self.fraud + 1) / (self.count + 2)
+
+    def features(self, chunk):
+        """Feature matrix for a chunk from the labels seen before it"""
+        np = self.np
+        prior = self.prior()
+        hospital = np.array([self.hospitals.get(h, (0, 0)) for h in chunk["hospital_id"]], dtype=np.float64).reshape(-1, 2)
+        hospital_trust = 1 - (hospital[:, 1] + SMOOTHING * prior) / (hospital[:, 0] + SMOOTHING)
+        buckets = chunk["patient_bucket"]
+        patient_risk = (self.patient_fraud[buckets] + SMOOTHING * prior) / (self.patient_count[buckets] + SMOOTHING)
+        return np.column_stack([chunk["amount"], hospital_trust, patient_risk, chunk["diagnosis_risk"]])
+
+    def update(self, chunk):
+        np = self.np
+        labels = chunk["label"]
+        np.add.at(self.patient_count, chunk["patient_bucket"], 1)
+        np.add.at(self.patient_fraud, chunk["patient_bucket"], labels)
+        for hospital_id, label in zip(chunk["hospital_id"], labels.tolist()):
+            count, fraud = self.hospitals.get(hospital_id, (0, 0))
+            self.hospitals[hospital_id] = (count + 1, fraud + label)
+        self.count += len(labels)
+        self.fraud += int(labels.sum())
+
+    def artifact_tables(self) -> dict:
+        np = self.np
+        prior = self.prior()
+        return {
+            "hospital_trust": {
+                h: 1 - (fraud + SMOOTHING * prior) / (count + SMOOTHING) for h, (count, fraud) in self.hospitals.items()
+            },
+            "patient_risk": ((self.patient_fraud + SMOOTHING * prior) / (self.patient_count + SMOOTHING)).astype(np.float32),
+            "default_hospital_trust": 1 - prior,
+            "default_patient_risk": prior,
+        }
+
+
+class Reservoir:
+    """Uniform fixed-size sample of the rows added so far (Algorithm R, a chunk at a time)"""
+
+    def __init__(self, capacity: int, width: int, rng):
+        import numpy as np
+        self.np = np
+        self.rng = rng
+        self.X = np.empty((capacity, width))
+        self.y = np.empty(capacity, dtype=np.int8)
+        self.capacity = capacity
+        self.seen = 0
+
+    def add(self, X, y):
+        n = len(y)
+        fill = max(0, min(n, self.capacity - self.seen))
+        if fill:
+            self.X[self.seen:self.seen + fill] = X[:fill]
+            self.y[self.seen:self.seen + fill] = y[:fill]
+        if n > fill:
+            # The row at stream index i replaces a random slot with probability capacity / (i + 1)
+            index = self.np.arange(self.seen + fill, self.seen + n)
+            positions = self.rng.integers(0, index + 1)
+            keep = positions < self.capacity
+            self.X[positions[keep]] = X[fill:][keep]
+            self.y[positions[keep]] = y[fill:][keep]
+        self.seen += n
+
+    def arrays(self):
+        size = min(self.seen, self.capacity)
+        return self.X[:size], self.y[:size]
+
+
+def serving_baseline(engine, artifact: ModelArtifact, rows: int = DRIFT_BASELINE_ROWS) -> dict:
+    """Drift baseline: the latest claims scored the way the API scores them with this artifact"""
+    import numpy as np
+
+    query = select(Claim.amount, Claim.hospital_id, Claim.patient_id, Claim.diagnosis).order_by(Claim.id.desc()).limit(rows)
+    with engine.connect() as conn:
+        claims = conn.execute(query).all()
+    X = np.array([
+        [float(amount), *artifact.risk_features(hospital_id, patient_id, diagnosis)]
+        for amount, hospital_id, patient_id, diagnosis in claims
+    ]).reshape(-1, 4)
+    scores = (artifact.model.predict_proba(X)[:, 1] * 100).astype(int)
+    return baseline_histograms(dict(zip(FEATURES, [*X.T, scores])))
+
+
+def evaluate(model, X, y) -> dict:
+    from sklearn.metrics import average_precision_score, precision_score, recall_score, roc_auc_score
+
+    probability = model.predict_proba(X)[:, 1]
+    flagged = (probability * 100).astype(int) > 50
+    return {
+        "roc_auc": round(float(roc_auc_score(y, probability)), 4),
+        "average_precision": round(float(average_precision_score(y, probability)), 4),
+        "precision": round(float(precision_score(y, flagged, zero_division=0)), 4),
+        "recall": round(float(recall_score(y, flagged, zero_division=0)), 4),
+    }
+
+
+def active_artifact(model_dir: str) -> ModelArtifact:
+    current = read_current(model_dir)
+    if current is not None:
+        try:
+            return load_artifact(current["version"], model_dir)
+        except Exception as e:
+            print(f"[!] Active model {current['version']} unreadable ({e}); comparing with the synthetic model")
+    return synthetic_artifact()
+
+
+def train(engine, model_dir: str = FRAUD_MODEL_DIR, seed: int = 42, force: bool = False) -> dict:
+    """Stream the labels, fit a candidate, evaluate it and promote it if it qualifies"""
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+
+    started = time.perf_counter()
+    total = count_labels(engine)
+    holdout_start = int(total * (1 - TRAIN_HOLDOUT_FRACTION))
+    rng = np.random.default_rng(seed)
+    history = RiskHistory()
+    training = Reservoir(TRAIN_MAX_ROWS, 4, rng)
+    holdout = Reservoir(HOLDOUT_MAX_ROWS, 4, rng)
+    seen = 0
+    trained_through = None
+
+    for chunk in stream_label_chunks(engine):
+        X = history.features(chunk)
+        history.update(chunk)
+        y = chunk["label"]
+        split = min(max(holdout_start - seen, 0), len(y))
+        if split:
+            training.add(X[:split], y[:split])
+        if split < len(y):
+            holdout.add(X[split:], y[split:])
+        seen += len(y)
+        trained_through = chunk["last_labeled_at"]
+
+    X_train, y_train = training.arrays()
+    X_holdout, y_holdout = holdout.arrays()
+    report = {"labels": seen, "train_rows": len(y_train), "holdout_rows": len(y_holdout)}
+    if len(y_train) < TRAIN_MIN_ROWS or len(set(y_train.tolist())) < 2 or len(set(y_holdout.tolist())) < 2:
+        report.update(promoted=False, reason=f"not enough labels of both classes (need {TRAIN_MIN_ROWS} training rows)")
+        return report
+
+    model = RandomForestClassifier(
+        n_estimators=100, min_samples_leaf=5, class_weight="balanced_subsample", n_jobs=1, random_state=seed
+    )
+    model.fit(X_train, y_train)
+
+    candidate = evaluate(model, X_holdout, y_holdout)
+    active = active_artifact(model_dir)
+    baseline = evaluate(active.model, X_holdout, y_holdout)
+    report.update(candidate=candidate, active={"version": active.version, **baseline})
+
+    if not force and candidate["roc_auc"] < PROMOTE_MIN_AUC:
+        report.update(promoted=False, reason=f"ROC AUC {candidate['roc_auc']} below {PROMOTE_MIN_AUC}")
+    elif not force and candidate["roc_auc"] < baseline["roc_auc"] - PROMOTE_TOLERANCE:
+        report.update(promoted=False, reason=f"ROC AUC {candidate['roc_auc']} worse than active {baseline['roc_auc']}")
+    else:
+        version = datetime.utcnow().strftime("v%Y%m%d%H%M%S")
+        artifact = ModelArtifact(version, model, info={
+            "trained_at": datetime.utcnow().isoformat(),
+            "trained_through": trained_through.isoformat() if trained_through else None,
+            "labels": seen,
+            "metrics": candidate,
+        }, **history.artifact_tables())
+        artifact.info["baseline"] = serving_baseline(engine, artifact)
+        save_artifact(artifact, model_dir)
+        promote(artifact, model_dir)
+        report.update(promoted=True, version=version)
+    report["seconds"] = round(time.perf_counter() - started, 1)
+    return report
+
+
+def print_report(report: dict):
+    print(f"[*] Labels {report['labels']:,}: {report['train_rows']:,} training rows, {report['holdout_rows']:,} holdout rows")
+    if "candidate" in report:
+        print(f"    candidate: {report['candidate']}")
+        print(f"    active ({report['active']['version']}): {dict((k, v) for k, v in report['active'].items() if k != 'version')}")
+    if report["promoted"]:
+        print(f"[+] Promoted {report['version']} ({report['seconds']}s)")
+    else:
+        print(f"[!] Not promoted: {report['reason']}")
+
+
+def watch(engine, model_dir: str = FRAUD_MODEL_DIR):
+    """Retrain every RETRAIN_INTERVAL_SECONDS, or sooner once RETRAIN_MIN_NEW_LABELS labels arrived"""
+    # Lower priority so a training run on a shared host does not starve API workers
+    if hasattr(os, "nice"):
+        os.nice(10)
+    last_run = 0.0
+    last_labels = None
+    while True:
+        current = read_current(model_dir) or {}
+        since = datetime.fromisoformat(current["trained_through"]) if current.get("trained_through") else None
+        new_labels = count_labels(engine, since)
+        total = count_labels(engine)
+        due = time.monotonic() - last_run >= RETRAIN_INTERVAL_SECONDS and new_labels > 0
+        # Labels that arrived since the last attempt (promoted or not)
+        fresh = total - last_labels if last_labels is not None else new_labels
+        if (new_labels >= RETRAIN_MIN_NEW_LABELS and fresh >= RETRAIN_MIN_NEW_LABELS) or due:
+            print(f"[*] Retraining: {new_labels:,} labels since {current.get('version', 'the synthetic model')}")
+            try:
+                print_report(train(engine, model_dir))
+            except Exception as e:
+                print(f"[!] Training failed: {e}")
+            last_run = time.monotonic()
+            last_labels = total
+        time.sleep(RETRAIN_CHECK_SECONDS)
+
+
+if __name__ == "__main__":
+    from database import engine
+    import models.user  # Register user models
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "train"
+    if command == "train":
+        print_report(train(engine, force="--force" in sys.argv))
+    elif command == "watch":
+        watch(engine)
+    elif command == "migrate-labels":
+        print(f"[+] Copied {migrate_labels(engine):,} label(s) into fraud_labels")
+    elif command == "status":
+        current = read_current()
+        print(current if current else "[*] No promoted model; API workers use the synthetic model")
+        print(f"[*] Labels: {count_labels(engine):,}")
+    else:
+        print(f"Unknown command: {command} (expected train, watch, status or migrate-labels)")
+        sys.exit(1)
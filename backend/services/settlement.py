@@ -0,0 +1,157 @@
+"""
+On-chain settlement of approved claims, with a transactional outbox.
+
+submit_claim commits the claim (status Submitted, fraud score, events) and,
+for approved claims, a settlement_outbox row in one transaction, and only
+then sends the settlement transaction. The tx_hash, status Settled and the
+CLAIM_SETTLED event are recorded in a second transaction that also deletes
+the outbox row. A claim that failed to settle (RPC down, worker killed
+between the two transactions) keeps its outbox row, and retry_loop() picks
+it up once next_attempt_at has passed.
+
+A retry first asks the contract whether the claim is already there (the
+contract rejects duplicate claim ids, so a settlement whose receipt was lost
+is recorded rather than sent twice) and only then submits it again. Failed
+attempts back off exponentially up to SETTLEMENT_MAX_BACKOFF_SECONDS.
+Due rows are claimed with FOR UPDATE SKIP LOCKED and leased for
+SETTLEMENT_GRACE_SECONDS, so every worker can run the loop.
+
+Workers take requests before the warm-up has deployed the contract. Claims
+approved in that window are not sent on chain (they would get a mock tx
+hash): their outbox row is due at once, and the retry loop, which waits for
+the warm-up, settles them.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select, update
+
+from health import READINESS_OPTIONAL
+
+load_dotenv()
+
+RETRY_INTERVAL_SECONDS = int(os.getenv("SETTLEMENT_RETRY_SECONDS", "60"))
+# How long submit_claim has to settle a claim itself before the retry job may
+GRACE_SECONDS = int(os.getenv("SETTLEMENT_GRACE_SECONDS", "300"))
+MAX_BACKOFF_SECONDS = int(os.getenv("SETTLEMENT_MAX_BACKOFF_SECONDS", "3600"))
+BATCH_SIZE = int(os.getenv("SETTLEMENT_BATCH_SIZE", "50"))
+# Without a chain, claims are "settled" with mock tx hashes
+MOCK_SETTLEMENT = "blockchain" in READINESS_OPTIONAL
+
+
+def settlement_failed(tx_hash: Optional[str]) -> bool:
+    """
+    BlockchainClient returns an 0xError hash once its own retries are used up,
+    and an 0xMock hash while no contract is loaded. A mock hash only counts as
+    settled when the chain is optional (READINESS_OPTIONAL=blockchain, i.e.
+    development without a node).
+    """
+    if not tx_hash or tx_hash.startswith("0xError"):
+        return True
+    return tx_hash.startswith("0xMock") and not MOCK_SETTLEMENT
+
+
+def can_settle(blockchain_client) -> bool:
+    """Whether a settlement sent now can succeed (or may be mocked)"""
+    return blockchain_client.contract is not None or MOCK_SETTLEMENT
+
+
+def outbox_entry(claim_id: str, due_now: bool = False):
+    """Outbox row for a claim; due_now hands it straight to the retry job instead of after the grace period"""
+    from database import SettlementOutbox
+
+    return SettlementOutbox(
+        claim_id=claim_id,
+        next_attempt_at=datetime.utcnow() + timedelta(seconds=0 if due_now else GRACE_SECONDS)
+    )
+
+
+async def record_settlement(db, claim_id: str, tx_hash: str, **event_data) -> bool:
+    """Mark the claim Settled with its tx_hash and clear its outbox row, in one transaction"""
+    from database import Claim, ClaimEvent, SettlementOutbox
+
+    result = await db.execute(
+        update(Claim)
+        .where(Claim.claim_id == claim_id, Claim.status == "Submitted")
+        .values(status="Settled", tx_hash=tx_hash, updated_at=datetime.utcnow())
+    )
+    await db.execute(delete(SettlementOutbox).where(SettlementOutbox.claim_id == claim_id))
+    if result.rowcount:
+        db.add(ClaimEvent(claim_id=claim_id, event_type="CLAIM_SETTLED", event_data={"tx_hash": tx_hash, **event_data}))
+    await db.commit()
+    return bool(result.rowcount)
+
+
+async def claim_due(db, now: datetime, batch_size: int = BATCH_SIZE):
+    """Lease up to batch_size due outbox rows; returns [(claim_id, amount, attempts)]"""
+    from database import Claim, SettlementOutbox
+
+    rows = (await db.execute(
+        select(SettlementOutbox, Claim.amount)
+        .join(Claim, Claim.claim_id == SettlementOutbox.claim_id)
+        .where(SettlementOutbox.next_attempt_at <= now)
+        .order_by(SettlementOutbox.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(of=SettlementOutbox, skip_locked=True)
+    )).all()
+    due = []
+    for entry, amount in rows:
+        entry.attempts += 1
+        entry.next_attempt_at = now + timedelta(seconds=GRACE_SECONDS)
+        due.append((entry.claim_id, amount, entry.attempts))
+    await db.commit()
+    return due
+
+
+async def retry_pending(blockchain_client, batch_size: int = BATCH_SIZE) -> dict:
+    """Settle due outbox claims; returns counts of settled, recovered and failed claims"""
+    from database import AsyncSessionLocal, SettlementOutbox
+
+    counts = {"settled": 0, "recovered": 0, "failed": 0}
+    async with AsyncSessionLocal() as db:
+        due = await claim_due(db, datetime.utcnow(), batch_size)
+        for claim_id, amount, attempts in due:
+            error = None
+            try:
+                tx_hash = await asyncio.to_thread(blockchain_client.find_claim_on_chain, claim_id)
+                recovered = tx_hash is not None
+                if not recovered:
+                    tx_hash = await asyncio.to_thread(blockchain_client.submit_claim_on_chain, claim_id, amount)
+                    if settlement_failed(tx_hash):
+                        error = f"settlement failed ({tx_hash})"
+            except Exception as e:
+                error = str(e)
+
+            if error is None:
+                await record_settlement(db, claim_id, tx_hash, attempts=attempts, recovered=recovered)
+                counts["recovered" if recovered else "settled"] += 1
+                continue
+
+            backoff = min(RETRY_INTERVAL_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+            await db.execute(
+                update(SettlementOutbox)
+                .where(SettlementOutbox.claim_id == claim_id)
+                .values(last_error=error[:1000], next_attempt_at=datetime.utcnow() + timedelta(seconds=backoff))
+            )
+            await db.commit()
+            counts["failed"] += 1
+            print(f"[!] Settlement of claim {claim_id} failed (attempt {attempts}): {error}")
+    return counts
+
+
+async def retry_loop(blockchain_client, ready, interval: int = RETRY_INTERVAL_SECONDS):
+    """Retry due settlements every interval, once ready() says the warm-up has loaded the contract"""
+    while True:
+        await asyncio.sleep(interval)
+        if not ready():
+            continue
+        try:
+            counts = await retry_pending(blockchain_client)
+            if any(counts.values()):
+                print(f"[*] Settlement retries: {counts}")
+        except Exception as e:
+            print(f"[!] Settlement retry failed: {e}")
+
@@ -0,0 +1,132 @@
+"""
+Maintenance for the auth token tables.
+
+Refresh tokens are stored as a SHA-256 digest (token_hash) plus a BIGINT
+lookup_key taken from its first 8 bytes, so the index on refresh_tokens
+stays small no matter how long the JWTs get. Expired or revoked refresh
+tokens and expired or used password reset tokens are deleted by a
+background task in batches of TOKEN_PURGE_BATCH_SIZE rows, one short
+transaction per batch, so the purge never holds long locks.
+
+Usage:
+    python -m services.token_store purge      # purge once
+    python -m services.token_store migrate    # convert refresh_tokens.token to digests (PostgreSQL)
+"""
+import asyncio
+import hashlib
+import os
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, or_, select, text
+from sqlalchemy.engine import Connection
+
+load_dotenv()
+
+PURGE_INTERVAL_SECONDS = int(os.getenv("TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+PURGE_BATCH_SIZE = int(os.getenv("TOKEN_PURGE_BATCH_SIZE", "1000"))
+
+
+def _purge_targets(now: datetime):
+    from models.user import PasswordResetToken, RefreshToken
+
+    return [
+        (RefreshToken, or_(RefreshToken.expires_at < now, RefreshToken.revoked == True)),
+        (PasswordResetToken, or_(PasswordResetToken.expires_at < now, PasswordResetToken.used == True)),
+    ]
+
+
+async def purge_expired_tokens(async_engine, batch_size: int = PURGE_BATCH_SIZE) -> dict:
+    """Delete dead token rows in batches; returns rows deleted per table"""
+    deleted = {}
+    for model, condition in _purge_targets(datetime.utcnow()):
+        total = 0
+        while True:
+            batch = select(model.id).where(condition).limit(batch_size).scalar_subquery()
+            async with async_engine.begin() as conn:
+                result = await conn.execute(delete(model).where(model.id.in_(batch)))
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+            await asyncio.sleep(0)  # let request handlers run between batches
+        deleted[model.__tablename__] = total
+    return deleted
+
+
+async def purge_loop(async_engine, interval: int = PURGE_INTERVAL_SECONDS):
+    while True:
+        try:
+            deleted = await purge_expired_tokens(async_engine)
+            if any(deleted.values()):
+                print(f"[*] Purged auth tokens: {deleted}")
+        except Exception as e:
+            print(f"[!] Token purge failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def migrate_refresh_tokens(conn: Connection, batch_size: int = PURGE_BATCH_SIZE):
+    """Replace the plaintext refresh_tokens.token column with lookup_key/token_hash"""
+    columns = {
+        row[0] for row in conn.execute(text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'refresh_tokens'"
+        ))
+    }
+    if "token" not in columns:
+        print("[*] refresh_tokens already stores digests")
+        return
+
+    conn.execute(text("ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS lookup_key BIGINT"))
+    conn.execute(text("ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS token_hash VARCHAR(64)"))
+    # Dead rows don't need converting
+    conn.execute(text("DELETE FROM refresh_tokens WHERE revoked OR expires_at < :now"), {"now": datetime.utcnow()})
+
+    converted = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, token FROM refresh_tokens WHERE token_hash IS NULL ORDER BY id LIMIT :limit"
+        ), {"limit": batch_size}).all()
+        if not rows:
+            break
+        params = []
+        for row_id, token in rows:
+            digest = hashlib.sha256(token.encode()).digest()
+            params.append({
+                "id": row_id,
+                "lookup_key": int.from_bytes(digest[:8], "big", signed=True),
+                "token_hash": digest.hex(),
+            })
+        conn.execute(text(
+            "UPDATE refresh_tokens SET lookup_key = :lookup_key, token_hash = :token_hash WHERE id = :id"
+        ), params)
+        converted += len(rows)
+
+    conn.execute(text("ALTER TABLE refresh_tokens ALTER COLUMN lookup_key SET NOT NULL"))
+    conn.execute(text("ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL"))
+    conn.execute(text("ALTER TABLE refresh_tokens DROP COLUMN token"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_refresh_tokens_lookup_key ON refresh_tokens (lookup_key)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_refresh_tokens_expires_at ON refresh_tokens (expires_at)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_password_reset_tokens_expires_at ON password_reset_tokens (expires_at)"
+    ))
+    print(f"[+] Converted {converted} refresh token(s) to digests")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import models.user  # noqa: F401  (registers the token tables)
+    from database import async_engine, engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "purge"
+    if command == "purge":
+        print(f"[+] Purged: {asyncio.run(purge_expired_tokens(async_engine))}")
+    elif command == "migrate":
+        if engine.dialect.name != "postgresql":
+            print("[!] Migration requires PostgreSQL; recreate a local SQLite database instead")
+            sys.exit(1)
+        with engine.begin() as conn:
+            migrate_refresh_tokens(conn)
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
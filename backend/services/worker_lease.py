@@ -0,0 +1,147 @@
+"""
+Worker id leases for the claim ID generator.
+
+Every API worker holds a row in worker_id_leases for the worker id it puts
+into claim IDs, renewed every WORKER_ID_LEASE_SECONDS / 3. With WORKER_ID
+set the worker takes exactly that id, and startup fails while another live
+worker holds it. Otherwise it takes the lowest id that is free or whose
+lease has expired. Taking an id is an INSERT on the primary key or an
+UPDATE conditioned on the expired lease, so two workers never get the same
+id. A worker that cannot renew stops issuing IDs once its lease runs out
+and then leases a new id.
+"""
+import asyncio
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from services.id_generator import MAX_WORKER_ID, check_worker_id, claim_id_generator
+
+load_dotenv()
+
+# Fixed worker id for this process (optional); startup fails if it is taken
+WORKER_ID = os.getenv("WORKER_ID")
+LEASE_SECONDS = int(os.getenv("WORKER_ID_LEASE_SECONDS", "60"))
+
+
+class WorkerIdTaken(RuntimeError):
+    pass
+
+
+class WorkerLease:
+    def __init__(self, generator, worker_id: Optional[int] = None, lease_seconds: int = LEASE_SECONDS):
+        self.generator = generator
+        self.requested = None if worker_id is None else check_worker_id(worker_id)
+        self.lease_seconds = lease_seconds
+        self.worker_id: Optional[int] = None
+        self.expires_at: Optional[datetime] = None
+        self.owner: Optional[str] = None
+
+    async def _take(self, db, worker_id: int, now: datetime, expires_at: datetime) -> bool:
+        from database import WorkerIdLease
+
+        result = await db.execute(
+            update(WorkerIdLease)
+            .where(WorkerIdLease.worker_id == worker_id, WorkerIdLease.expires_at < now)
+            .values(owner=self.owner, expires_at=expires_at)
+        )
+        if result.rowcount:
+            await db.commit()
+            return True
+        db.add(WorkerIdLease(worker_id=worker_id, owner=self.owner, expires_at=expires_at))
+        try:
+            await db.commit()
+            return True
+        except IntegrityError:
+            await db.rollback()
+            return False
+
+    async def acquire(self) -> int:
+        """Lease a worker id and hand it to the generator; raises WorkerIdTaken if none is free"""
+        from database import AsyncSessionLocal, WorkerIdLease, async_engine
+
+        # Set here rather than at import, so workers forked after import hold their own leases
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"[-100:]
+        async with async_engine.begin() as conn:
+            await conn.run_sync(lambda sync_conn: WorkerIdLease.__table__.create(sync_conn, checkfirst=True))
+
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=self.lease_seconds)
+            if self.requested is not None:
+                candidates = [self.requested]
+            else:
+                held = set((await db.execute(
+                    select(WorkerIdLease.worker_id).where(WorkerIdLease.expires_at >= now)
+                )).scalars())
+                candidates = [i for i in range(MAX_WORKER_ID + 1) if i not in held]
+            for worker_id in candidates:
+                if await self._take(db, worker_id, now, expires_at):
+                    self.worker_id, self.expires_at = worker_id, expires_at
+                    self.generator.set_worker_id(worker_id)
+                    print(f"[+] Leased claim ID worker id {worker_id}")
+                    return worker_id
+
+        if self.requested is not None:
+            raise WorkerIdTaken(f"WORKER_ID {self.requested} is leased by another running worker")
+        raise WorkerIdTaken(f"All {MAX_WORKER_ID + 1} claim ID worker ids are leased")
+
+    async def renew(self) -> bool:
+        """Extend the lease; False if another worker has taken it over"""
+        from database import AsyncSessionLocal, WorkerIdLease
+
+        expires_at = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(WorkerIdLease)
+                .where(WorkerIdLease.worker_id == self.worker_id, WorkerIdLease.owner == self.owner)
+                .values(expires_at=expires_at)
+            )
+            await db.commit()
+        if result.rowcount:
+            self.expires_at = expires_at
+            return True
+        return False
+
+    async def renew_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if self.worker_id is not None and await self.renew():
+                    if self.generator.worker_id is None:
+                        self.generator.set_worker_id(self.worker_id)
+                    continue
+                if self.worker_id is not None:
+                    print(f"[!] Lost the lease on worker id {self.worker_id}")
+                self.generator.set_worker_id(None)
+                self.worker_id = None
+                await self.acquire()
+            except Exception as e:
+                print(f"[!] Worker id lease renewal failed: {e}")
+                if self.expires_at and datetime.utcnow() >= self.expires_at:
+                    # Another worker may take the id from now on
+                    self.generator.set_worker_id(None)
+
+    async def release(self):
+        from database import AsyncSessionLocal, WorkerIdLease
+
+        if self.worker_id is None:
+            return
+        self.generator.set_worker_id(None)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(WorkerIdLease)
+                .where(WorkerIdLease.worker_id == self.worker_id, WorkerIdLease.owner == self.owner)
+            )
+            await db.commit()
+        self.worker_id = None
+
+
+# Lease for this process's claim_id_generator
+worker_lease = WorkerLease(claim_id_generator, int(WORKER_ID) if WORKER_ID is not None else None)
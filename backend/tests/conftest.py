@@ -0,0 +1,58 @@
+"""
+Tests run against a throwaway SQLite database and need no PostgreSQL,
+Redis, chain node or IPFS gateway. The environment is set here, before any
+backend module reads it at import.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="claims-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.sqlite"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+os.environ["TOKEN_DENYLIST_URL"] = ""
+os.environ.setdefault("SECRET_KEY", "test-secret-key-0123456789abcdef0123456789")
+os.environ.setdefault("ENCRYPTION_KEY", "ZmDfcTF7_60GrrY167zsiPd67pEvs0aGOv2oasOM1Pg=")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import models.user  # noqa: E402,F401 - register User for Claim.user relationship
+
+
+@pytest.fixture(scope="session")
+def session_loop():
+    # One loop for the whole session: pooled aiosqlite connections belong to it
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(database.async_engine.dispose())
+    loop.close()
+
+
+@pytest.fixture
+def run(session_loop):
+    """run(coro) -> result, on the session's event loop"""
+    return session_loop.run_until_complete
+
+
+@pytest.fixture
+def db_tables():
+    """Empty tables for one test"""
+    database.Base.metadata.create_all(database.engine)
+    yield
+    with database.engine.begin() as conn:
+        for table in reversed(database.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+def make_claim(claim_id: str, **values):
+    defaults = dict(
+        hospital_id="APOLLO-DEL-001", patient_name="Patient", patient_id="P-1", diagnosis="fever",
+        amount=1000, currency="INR", status="Submitted", fraud_score=5,
+    )
+    defaults.update(values)
+    return database.Claim(claim_id=claim_id, **defaults)
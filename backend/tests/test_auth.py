@@ -0,0 +1,142 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import auth
+
+
+@pytest.fixture(autouse=True)
+def fresh_denylist(monkeypatch):
+    """A local-only revoked-token store and an empty token cache per test"""
+    monkeypatch.setattr(auth, "revoked_tokens", auth.RevokedTokenStore(url=None))
+    auth.token_cache.clear()
+    yield
+    auth.token_cache.clear()
+
+
+def access_token(**extra):
+    return auth.create_access_token({"sub": "u1", "user_id": 1, "role": "hospital", **extra})
+
+
+def shared_stores(count):
+    """Stores for `count` workers sharing one in-memory Redis"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    stores = []
+    for _ in range(count):
+        store = auth.RevokedTokenStore(url="redis://denylist")
+        store._client = fakeredis.FakeAsyncRedis(server=server)
+        stores.append(store)
+    return stores
+
+
+def test_revoked_token_rejected_even_when_cached(run):
+    token = access_token()
+    assert auth.verify_access_token(token).username == "u1"
+    run(auth.revoke_token(token))
+    assert auth.verify_access_token(token) is None
+    assert auth.verify_access_token(token, check_revoked=False) is not None
+    # Revoking drops the cache entry; a re-verified token is still denied
+    assert auth.verify_access_token(token) is None
+
+
+def test_other_tokens_unaffected(run):
+    revoked, kept = access_token(), access_token()
+    run(auth.revoke_token(revoked))
+    assert auth.verify_access_token(kept) is not None
+
+
+def test_token_without_jti_revoked_by_digest(run):
+    exp = time.time() + 60
+    token = jwt.encode({"sub": "u1", "user_id": 1, "role": "hospital", "type": "access", "exp": exp},
+                       auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    assert auth.verify_access_token(token) is not None
+    run(auth.revoke_token(token))
+    assert auth.verify_access_token(token) is None
+    assert auth.revoked_tokens.contains(auth.token_digest(token).hex())
+
+
+def test_expired_revocations_dropped():
+    store = auth.RevokedTokenStore(url=None)
+    store._remember("old", time.time() - 1)
+    store._revoked["stale"] = time.time() - 1
+    assert not store.contains("old")
+    assert not store.contains("stale")
+    assert "stale" not in store._revoked
+
+
+def test_get_current_user_rejects_revoked_token(run):
+    token = access_token()
+    assert run(auth.get_current_user(token)).user_id == 1
+    run(auth.revoke_token(token))
+    with pytest.raises(HTTPException) as exc:
+        run(auth.get_current_user(token))
+    assert exc.value.status_code == 401
+
+
+def test_revocation_reaches_other_workers(run):
+    here, there = shared_stores(2)
+    token = access_token()
+    jti = jwt.get_unverified_claims(token)["jti"]
+    exp = time.time() + 60
+
+    assert run(here.add(jti, exp))
+    assert here.contains(jti)
+    assert not there.contains(jti)
+    assert run(there.sync()) == 1
+    assert there.contains(jti)
+    # Later syncs only read new entries
+    assert run(there.sync()) == 0
+    run(here.add("second", exp))
+    assert run(there.sync()) == 1
+    assert there.contains("second")
+
+
+def test_revocations_synced_in_batches(run):
+    here, there = shared_stores(2)
+    exp = time.time() + 60
+    for i in range(1001):
+        run(here.add(f"jti-{i}", exp))
+    assert run(there.sync()) == 1001
+    assert there.contains("jti-0") and there.contains("jti-1000")
+
+
+def test_stale_denylist_fails_closed(run, monkeypatch):
+    store, = shared_stores(1)
+    store.max_lag = 5.0
+    store._synced_at = time.monotonic() - 10
+    monkeypatch.setattr(auth, "revoked_tokens", store)
+    token = access_token()
+
+    with pytest.raises(auth.DenylistUnavailable):
+        auth.verify_access_token(token)
+    with pytest.raises(HTTPException) as exc:
+        run(auth.get_current_user(token))
+    assert exc.value.status_code == 503
+
+    # Catching up with Redis lets requests through again
+    run(store.sync())
+    assert auth.verify_access_token(token) is not None
+
+
+def test_stale_denylist_fails_open_when_configured(run, monkeypatch):
+    store, = shared_stores(1)
+    store.fail_closed = False
+    store.max_lag = 5.0
+    store._synced_at = time.monotonic() - 10
+    monkeypatch.setattr(auth, "revoked_tokens", store)
+    token = access_token()
+    revoked = access_token()
+    run(auth.revoke_token(revoked))
+
+    assert auth.verify_access_token(token) is not None
+    # Revocations already in the local set still apply
+    assert auth.verify_access_token(revoked) is None
+
+
+def test_unreachable_denylist_keeps_local_revocation(run):
+    store = auth.RevokedTokenStore(url="redis://127.0.0.1:1/0")
+    assert run(store.add("jti", time.time() + 60)) is False
+    assert store.contains("jti")
@@ -0,0 +1,80 @@
+import csv
+import gzip
+import io
+from datetime import datetime
+from decimal import Decimal
+
+import orjson
+
+from conftest import make_claim
+from database import SessionLocal
+from services import claim_export
+from services.claim_export import EXPORT_FIELDS, build_export_query, export_stream
+
+
+def add_claims():
+    with SessionLocal() as db:
+        db.add_all([
+            make_claim("0000000000000000001", amount=Decimal("1234.50"), status="Settled",
+                       tx_hash="0xabc", created_at=datetime(2026, 1, 1, 9, 30)),
+            make_claim("0000000000000000002", diagnosis='knee, "left"\nreplacement', status="Rejected",
+                       fraud_score=None, created_at=datetime(2026, 2, 1)),
+            make_claim("0000000000000000003", hospital_id="FORTIS-MUM-002", status="Settled",
+                       created_at=datetime(2026, 3, 1)),
+        ])
+        db.commit()
+
+
+def export(run, fmt, gzip_body=False, **filters):
+    async def collect():
+        return b"".join([chunk async for chunk in export_stream(build_export_query(**filters), fmt, gzip=gzip_body)])
+    body = run(collect())
+    return gzip.decompress(body) if gzip_body else body
+
+
+def test_ndjson_has_one_object_per_claim(run, db_tables):
+    add_claims()
+    rows = [orjson.loads(line) for line in export(run, "ndjson").splitlines()]
+
+    assert [row["claim_id"] for row in rows] == ["0000000000000000001", "0000000000000000002", "0000000000000000003"]
+    assert list(rows[0]) == EXPORT_FIELDS
+    assert rows[0]["amount"] == "1234.50"
+    assert rows[0]["created_at"] == "2026-01-01T09:30:00"
+    assert rows[1]["fraud_score"] is None
+    assert rows[1]["diagnosis"] == 'knee, "left"\nreplacement'
+
+
+def test_csv_has_a_header_and_quotes_awkward_values(run, db_tables):
+    add_claims()
+    rows = list(csv.reader(io.StringIO(export(run, "csv").decode("utf-8"))))
+
+    assert rows[0] == EXPORT_FIELDS
+    assert len(rows) == 4
+    record = dict(zip(EXPORT_FIELDS, rows[1]))
+    assert (record["amount"], record["tx_hash"], record["created_at"]) == ("1234.50", "0xabc", "2026-01-01T09:30:00")
+    assert dict(zip(EXPORT_FIELDS, rows[2]))["diagnosis"] == 'knee, "left"\nreplacement'
+
+
+def test_gzip_bodies_decompress_to_the_plain_export(run, db_tables):
+    add_claims()
+    for fmt in ("ndjson", "csv"):
+        assert export(run, fmt, gzip_body=True) == export(run, fmt)
+
+
+def test_filters_and_batches(run, db_tables, monkeypatch):
+    add_claims()
+    settled = [orjson.loads(line)["claim_id"] for line in export(run, "ndjson", status="Settled").splitlines()]
+    assert settled == ["0000000000000000001", "0000000000000000003"]
+
+    window = export(run, "ndjson", created_from=datetime(2026, 1, 15), created_to=datetime(2026, 3, 1))
+    assert [orjson.loads(line)["claim_id"] for line in window.splitlines()] == ["0000000000000000002"]
+
+    # One row per batch encodes the same as a single batch
+    whole = {fmt: export(run, fmt) for fmt in ("ndjson", "csv")}
+    monkeypatch.setattr(claim_export, "EXPORT_BATCH_SIZE", 1)
+    assert {fmt: export(run, fmt) for fmt in ("ndjson", "csv")} == whole
+
+
+def test_empty_export(run, db_tables):
+    assert export(run, "ndjson") == b""
+    assert export(run, "csv").decode("utf-8").splitlines() == [",".join(EXPORT_FIELDS)]
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from database import SessionLocal, WorkerIdLease
+from services import id_generator
+from services.id_generator import MAX_SEQUENCE, SnowflakeGenerator, format_id, parse_id
+from services.worker_lease import WorkerIdTaken, WorkerLease
+
+
+class Clock:
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.now_ms
+
+
+def test_ids_are_strictly_increasing_and_carry_the_worker_id():
+    generator = SnowflakeGenerator(7)
+    ids = [generator.next_id() for _ in range(10000)]
+    assert ids == sorted(set(ids))
+    assert {parse_id(value)["worker_id"] for value in ids} == {7}
+
+
+def test_claim_id_strings_sort_like_the_numbers():
+    generator = SnowflakeGenerator(1)
+    values = [generator.next_id() for _ in range(100)] + [1, 12345]
+    assert sorted(map(format_id, values)) == [format_id(value) for value in sorted(values)]
+    assert all(len(format_id(value)) == 19 for value in values)
+
+
+def test_ids_from_different_workers_never_collide(monkeypatch):
+    monkeypatch.setattr(SnowflakeGenerator, "_now_ms", staticmethod(Clock(1000)))
+    first, second = SnowflakeGenerator(1), SnowflakeGenerator(2)
+    assert {first.next_id() for _ in range(100)}.isdisjoint(second.next_id() for _ in range(100))
+
+
+def test_sequence_exhaustion_waits_for_the_next_millisecond(monkeypatch):
+    clock = Clock(1000)
+    monkeypatch.setattr(SnowflakeGenerator, "_now_ms", staticmethod(clock))
+    generator = SnowflakeGenerator(3)
+    ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 1)]
+    assert parse_id(ids[-1])["sequence"] == MAX_SEQUENCE
+
+    def later():
+        # The clock only moves on after the generator has polled it a few times
+        clock.reads += 1
+        return 1000 if clock.reads < 5 else 1001
+    clock.reads = 0
+    monkeypatch.setattr(SnowflakeGenerator, "_now_ms", staticmethod(later))
+    following = generator.next_id()
+    assert following > ids[-1]
+    assert parse_id(following)["sequence"] == 0
+    assert following >> id_generator.TIMESTAMP_SHIFT == 1001
+
+
+def test_clock_moving_far_backwards_is_refused(monkeypatch):
+    clock = Clock(5000)
+    monkeypatch.setattr(SnowflakeGenerator, "_now_ms", staticmethod(clock))
+    generator = SnowflakeGenerator(1)
+    generator.next_id()
+    clock.now_ms -= id_generator.MAX_CLOCK_BACKWARDS_MS + 1
+    with pytest.raises(RuntimeError, match="backwards"):
+        generator.next_id()
+
+
+def test_generator_without_a_worker_id_refuses():
+    generator = SnowflakeGenerator()
+    with pytest.raises(RuntimeError):
+        generator.next_id()
+    generator.set_worker_id(4)
+    assert parse_id(generator.next_id())["worker_id"] == 4
+    generator.set_worker_id(None)
+    with pytest.raises(RuntimeError):
+        generator.next_id()
+
+
+def test_worker_id_out_of_range_is_rejected():
+    with pytest.raises(ValueError):
+        SnowflakeGenerator(id_generator.MAX_WORKER_ID + 1)
+
+
+def expire(worker_id):
+    with SessionLocal() as db:
+        db.execute(
+            update(WorkerIdLease).where(WorkerIdLease.worker_id == worker_id)
+            .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        db.commit()
+
+
+def test_leases_hand_out_distinct_worker_ids(run, db_tables):
+    first, second = WorkerLease(SnowflakeGenerator()), WorkerLease(SnowflakeGenerator())
+    assert run(first.acquire()) == 0
+    assert run(second.acquire()) == 1
+    assert (first.generator.worker_id, second.generator.worker_id) == (0, 1)
+
+
+def test_pinned_worker_id_held_by_a_live_worker_fails(run, db_tables):
+    run(WorkerLease(SnowflakeGenerator(), worker_id=5).acquire())
+    with pytest.raises(WorkerIdTaken):
+        run(WorkerLease(SnowflakeGenerator(), worker_id=5).acquire())
+
+
+def test_expired_lease_is_taken_over_and_the_old_holder_stops(run, db_tables):
+    stale = WorkerLease(SnowflakeGenerator(), worker_id=5)
+    run(stale.acquire())
+    expire(5)
+
+    fresh = WorkerLease(SnowflakeGenerator(), worker_id=5)
+    assert run(fresh.acquire()) == 5
+    assert run(stale.renew()) is False
+    assert run(fresh.renew()) is True
+    with SessionLocal() as db:
+        assert db.execute(select(WorkerIdLease.owner)).scalars().all() == [fresh.owner]
+
+
+def test_release_frees_the_worker_id(run, db_tables):
+    lease = WorkerLease(SnowflakeGenerator())
+    run(lease.acquire())
+    run(lease.release())
+    assert lease.generator.worker_id is None
+    assert run(WorkerLease(SnowflakeGenerator()).acquire()) == 0
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import make_claim
+from database import AsyncSessionLocal, SessionLocal
+from services import claim_search
+from services.claim_search import SearchPageOutOfRange, search_claims
+
+SAME_TIME = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def add_claims(*claims):
+    with SessionLocal() as db:
+        db.add_all(claims)
+        db.commit()
+
+
+def search(run, **params):
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await search_claims(db, **params)
+    return run(call())
+
+
+def ids(result):
+    return [row["claim_id"] for row in result["results"]]
+
+
+def test_pages_neither_overlap_nor_skip(run, db_tables):
+    # Identical created_at everywhere: the order must still be total
+    add_claims(*[make_claim(f"{i:019d}", diagnosis="acute fever", created_at=SAME_TIME) for i in range(45)])
+
+    pages = [ids(search(run, q="fever", offset=offset, limit=10)) for offset in range(0, 50, 10)]
+    paged = [claim_id for page in pages for claim_id in page]
+    assert len(paged) == len(set(paged)) == 45
+    assert paged == ids(search(run, q="fever", offset=0, limit=100))
+
+
+def test_filters_and_facets(run, db_tables):
+    add_claims(
+        make_claim("0000000000000000001", diagnosis="fever", status="Settled", fraud_score=5, amount=500),
+        make_claim("0000000000000000002", diagnosis="fever", status="Rejected", fraud_score=80, amount=50000),
+        make_claim("0000000000000000003", diagnosis="fracture", status="Settled", fraud_score=10, amount=500),
+    )
+
+    result = search(run, q="fever")
+    assert result["total"] == 2
+    assert result["facets"]["status"] == {"Settled": 1, "Rejected": 1}
+    assert result["facets"]["fraud_band"] == {"low": 1, "high": 1}
+    assert ids(search(run, q="fever", fraud_band="high")) == ["0000000000000000002"]
+    assert ids(search(run, status="Settled", max_amount=1000)) == ["0000000000000000003", "0000000000000000001"]
+
+
+def test_like_wildcards_in_the_query_are_literal(run, db_tables):
+    add_claims(
+        make_claim("0000000000000000001", diagnosis="feverax"),
+        make_claim("0000000000000000002", diagnosis="100% recovered"),
+    )
+
+    assert ids(search(run, q="fever_x")) == []
+    assert ids(search(run, q="%")) == ["0000000000000000002"]
+    assert ids(search(run, q="100%")) == ["0000000000000000002"]
+
+
+def test_facet_counts_stop_at_the_scan_limit(run, db_tables, monkeypatch):
+    monkeypatch.setattr(claim_search, "FACET_SCAN_LIMIT", 5)
+    add_claims(*[make_claim(f"{i:019d}") for i in range(8)])
+
+    result = search(run, q="fever")
+    assert result["total"] == 6
+    assert result["total_is_estimate"] is True
+
+
+class _PostgresDialect:
+    name = "postgresql"
+
+
+class _PostgresBind:
+    dialect = _PostgresDialect()
+
+
+class _RankedSession:
+    """Session that reports PostgreSQL and fails if a statement gets past the page check"""
+    bind = _PostgresBind()
+
+    async def execute(self, statement):
+        if "plan_cache_mode" in str(statement):
+            return None
+        raise AssertionError("ranked page past the candidates reached the database")
+
+
+def test_ranked_pages_past_the_candidates_are_refused(run, monkeypatch):
+    monkeypatch.setattr(claim_search, "RANK_CANDIDATE_LIMIT", 100)
+    with pytest.raises(SearchPageOutOfRange):
+        run(search_claims(_RankedSession(), q="fever", offset=90, limit=20))
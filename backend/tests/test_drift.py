@@ -0,0 +1,130 @@
+import math
+import random
+from bisect import bisect_right
+from types import SimpleNamespace
+
+import pytest
+
+import drift
+
+
+def histogram(values, edges):
+    counts = [0] * (len(edges) + 1)
+    for value in values:
+        counts[bisect_right(edges, value)] += 1
+    return counts
+
+
+def test_identical_histograms_do_not_drift():
+    counts = [100, 200, 300, 200, 100]
+    assert drift.psi(counts, counts) == pytest.approx(0.0)
+    statistic, p_value = drift.ks(counts, counts)
+    assert statistic == pytest.approx(0.0)
+    assert p_value == 1.0
+    # Same shape, different sample sizes
+    assert drift.psi(counts, [c * 3 for c in counts]) == pytest.approx(0.0)
+
+
+def test_psi_matches_formula():
+    expected, actual = [50, 30, 20], [30, 30, 40]
+    want = sum((a / 100 - e / 100) * math.log((a / 100) / (e / 100)) for e, a in zip(expected, actual))
+    assert drift.psi(expected, actual) == pytest.approx(want)
+    assert drift.psi(expected, actual) == pytest.approx(drift.psi(actual, expected))
+
+
+def test_psi_empty_bins_are_floored():
+    assert math.isfinite(drift.psi([100, 0], [50, 50]))
+    assert drift.psi([100, 0], [50, 50]) > drift.PSI_DRIFT
+
+
+def test_ks_statistic_is_largest_cdf_gap():
+    statistic, _ = drift.ks([50, 50, 0], [0, 50, 50])
+    assert statistic == pytest.approx(0.5)
+
+
+def test_kolmogorov_p_value():
+    # Q_KS(1.0) = 0.2700 for large samples
+    n = 10 ** 8
+    assert drift.kolmogorov_p_value(1.0 / math.sqrt(n / 2), n, n) == pytest.approx(0.2700, abs=1e-3)
+    assert drift.kolmogorov_p_value(0.0, 100, 100) == 1.0
+    assert drift.kolmogorov_p_value(1.0, 1000, 1000) < 1e-10
+    # Same gap, more observations: more significant
+    assert drift.kolmogorov_p_value(0.05, 5000, 5000) < drift.kolmogorov_p_value(0.05, 500, 500)
+
+
+def test_feature_drift_statuses():
+    edges = [1.0, 2.0, 3.0]
+    baseline = {"edges": edges, "counts": [250, 250, 250, 250]}
+    assert drift.feature_drift(None, [1, 2, 3, 4], edges)["status"] == "no_baseline"
+
+    few = [10, 10, 10, 10]
+    assert sum(few) < drift.DRIFT_MIN_OBSERVATIONS
+    result = drift.feature_drift(baseline, few, edges)
+    assert result["status"] == "insufficient_data"
+    assert "psi" not in result
+
+    stable = drift.feature_drift(baseline, [252, 248, 251, 249], edges)
+    assert stable["status"] == "stable"
+    assert stable["psi"] < drift.PSI_WARNING and stable["ks_p_value"] >= drift.KS_ALPHA
+
+    shifted = drift.feature_drift(baseline, [50, 100, 250, 600], edges)
+    assert shifted["status"] == "drift"
+    assert shifted["psi"] >= drift.PSI_DRIFT and shifted["ks_p_value"] < drift.KS_ALPHA
+    assert shifted["baseline_counts"] == baseline["counts"]
+
+
+def test_feature_drift_warning_from_ks_alone():
+    # A small shift across many observations: PSI under the warning level, KS significant
+    edges = [1.0, 2.0, 3.0]
+    baseline = {"edges": edges, "counts": [25000, 25000, 25000, 25000]}
+    result = drift.feature_drift(baseline, [23500, 25000, 25000, 26500], edges)
+    assert result["psi"] < drift.PSI_WARNING
+    assert result["ks_p_value"] < drift.KS_ALPHA
+    assert result["status"] == "warning"
+
+
+def test_bin_counts_match_bisect_right():
+    pytest.importorskip("numpy")
+    rng = random.Random(7)
+    values = [rng.choice([0.5, 1.0, 1.5, 2.0, 3.0, 9.0]) for _ in range(1000)]
+    edges = [1.0, 2.0, 3.0]
+    assert drift.bin_counts(values, edges) == histogram(values, edges)
+
+
+def test_quantile_edges():
+    np = pytest.importorskip("numpy")
+    # Few distinct values: one bin per value
+    assert drift.quantile_edges([3, 1, 2, 2, 1], bins=10) == [1.0, 2.0, 3.0]
+    values = np.arange(1000, dtype=float)
+    edges = drift.quantile_edges(values, bins=4)
+    assert len(edges) == 3
+    counts = drift.bin_counts(values, edges)
+    assert max(counts) - min(counts) <= 1
+
+
+def test_monitor_reports_drift_against_baseline(monkeypatch):
+    monkeypatch.setattr(drift, "METRICS_DIR", None)
+    edges = [1.0, 2.0, 3.0]
+    baseline = {feature: {"edges": edges, "counts": [250, 250, 250, 250]} for feature in drift.FEATURES}
+    artifact = SimpleNamespace(version="v1", info={"baseline": baseline})
+    monitor = drift.DriftMonitor()
+
+    rng = random.Random(1)
+    for _ in range(1000):
+        value = rng.uniform(0, 4)
+        monitor.observe(artifact, value, value, value, value, 3.5)
+    monitor.rotate()
+    report = monitor.compute_report()
+
+    assert report["model_version"] == "v1"
+    assert report["features"]["amount"]["status"] == "stable"
+    assert report["features"]["amount"]["observations"] == 1000
+    assert report["features"]["fraud_score"]["status"] == "drift"
+    assert report["status"] == "drift"
+
+    # A new model starts over with its own bins
+    monitor.observe(SimpleNamespace(version="v2", info=None), 1, 0.5, 0.5, 0.5, 10)
+    report = monitor.compute_report()
+    assert report["model_version"] == "v2"
+    assert report["status"] == "no_baseline"
+    assert report["features"]["amount"]["observations"] == 1
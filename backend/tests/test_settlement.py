@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from conftest import make_claim
+from database import AsyncSessionLocal, Claim, ClaimEvent, SessionLocal, SettlementOutbox
+from services import settlement
+
+
+class Chain:
+    """BlockchainClient stand-in: records calls, answers from lists"""
+
+    def __init__(self, found=None, submitted=("0xabc",)):
+        self.contract = object()
+        self.found = found
+        self.submitted = list(submitted)
+        self.submits = []
+
+    def find_claim_on_chain(self, claim_id):
+        return self.found
+
+    def submit_claim_on_chain(self, claim_id, amount):
+        self.submits.append(claim_id)
+        return self.submitted.pop(0)
+
+
+def add_pending(claim_id="0000000000000000001", due=True):
+    with SessionLocal() as db:
+        db.add(make_claim(claim_id))
+        entry = settlement.outbox_entry(claim_id, due_now=due)
+        if due:
+            entry.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.add(entry)
+        db.commit()
+
+
+def make_due():
+    with SessionLocal() as db:
+        db.execute(update(SettlementOutbox).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+
+
+def outbox():
+    with SessionLocal() as db:
+        return db.execute(select(SettlementOutbox)).scalars().all()
+
+
+def claim(claim_id="0000000000000000001"):
+    with SessionLocal() as db:
+        return db.execute(select(Claim).where(Claim.claim_id == claim_id)).scalar_one()
+
+
+def test_failed_settlement_backs_off_then_settles(run, db_tables):
+    add_pending()
+    chain = Chain(submitted=["0xError123", "0xsettled"])
+
+    assert run(settlement.retry_pending(chain)) == {"settled": 0, "recovered": 0, "failed": 1}
+    [entry] = outbox()
+    assert entry.attempts == 1
+    assert "0xError123" in entry.last_error
+    assert entry.next_attempt_at > datetime.utcnow()
+    assert claim().status == "Submitted"
+
+    # Not due yet: nothing is retried
+    assert run(settlement.retry_pending(chain)) == {"settled": 0, "recovered": 0, "failed": 0}
+
+    make_due()
+    assert run(settlement.retry_pending(chain)) == {"settled": 1, "recovered": 0, "failed": 0}
+    assert outbox() == []
+    settled = claim()
+    assert (settled.status, settled.tx_hash) == ("Settled", "0xsettled")
+    with SessionLocal() as db:
+        events = db.execute(select(ClaimEvent).where(ClaimEvent.event_type == "CLAIM_SETTLED")).scalars().all()
+    assert [event.event_data["attempts"] for event in events] == [2]
+
+
+def test_backoff_grows_exponentially(run, db_tables, monkeypatch):
+    monkeypatch.setattr(settlement, "RETRY_INTERVAL_SECONDS", 10)
+    monkeypatch.setattr(settlement, "MAX_BACKOFF_SECONDS", 25)
+    add_pending()
+    chain = Chain(submitted=["0xError1", "0xError2", "0xError3"])
+    delays = []
+    for _ in range(3):
+        make_due()
+        start = datetime.utcnow()
+        run(settlement.retry_pending(chain))
+        delays.append((outbox()[0].next_attempt_at - start).total_seconds())
+    assert [round(delay) for delay in delays] == [10, 20, 25]
+
+
+def test_claim_already_on_chain_is_recorded_not_resent(run, db_tables):
+    add_pending()
+    chain = Chain(found="0xfound")
+
+    assert run(settlement.retry_pending(chain)) == {"settled": 0, "recovered": 1, "failed": 0}
+    assert chain.submits == []
+    assert claim().tx_hash == "0xfound"
+    assert outbox() == []
+
+
+def test_claim_within_grace_period_is_left_to_the_request(run, db_tables):
+    add_pending(due=False)
+    chain = Chain()
+
+    assert run(settlement.retry_pending(chain)) == {"settled": 0, "recovered": 0, "failed": 0}
+    assert chain.submits == []
+
+
+def test_mock_hash_counts_as_settled_only_without_a_chain(monkeypatch):
+    monkeypatch.setattr(settlement, "MOCK_SETTLEMENT", False)
+    assert settlement.settlement_failed("0xMock123456")
+    assert settlement.settlement_failed("0xError1")
+    assert settlement.settlement_failed(None)
+    assert not settlement.settlement_failed("0xabc")
+    monkeypatch.setattr(settlement, "MOCK_SETTLEMENT", True)
+    assert not settlement.settlement_failed("0xMock123456")
+
+
+def test_record_settlement_is_idempotent(run, db_tables):
+    add_pending()
+
+    async def record_twice():
+        async with AsyncSessionLocal() as db:
+            first = await settlement.record_settlement(db, "0000000000000000001", "0xabc")
+            second = await settlement.record_settlement(db, "0000000000000000001", "0xother")
+        return first, second
+
+    assert run(record_twice()) == (True, False)
+    assert claim().tx_hash == "0xabc"
@@ -0,0 +1,308 @@
+"""
+Request-scoped tracing with tail-based sampling.
+
+TracingMiddleware opens a root span per HTTP request; code below it opens
+child spans with `with tracing.span("ipfs.upload"):`. The current span lives
+in a ContextVar, so it follows the request through awaits and into
+SQLAlchemy's greenlets (instrument_engine adds a span per SQL statement).
+Outside a request span() is a no-op.
+
+Spans are buffered per trace until the root span ends; only then is the
+trace kept or dropped. Traces slower than TRACE_SLOW_MS or with an error are
+always kept, the rest at TRACE_SAMPLE_RATE. Kept traces are appended as one
+JSON line each to TRACE_EXPORT_PATH by a background thread.
+
+    python -m tracing summarize traces/traces.jsonl   # slowest stages and traces
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces/traces.jsonl")
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+TRACE_BUFFER_SIZE = 10_000
+TRACE_FLUSH_INTERVAL = 1.0
+MAX_STATEMENT_LENGTH = 300
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "dropped_spans", "error", "start", "start_perf")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.dropped_spans = 0
+        self.error = False
+        # Span start times are perf_counter readings, converted to epoch on export
+        self.start = time.time()
+        self.start_perf = time.perf_counter()
+
+    def to_dict(self, root: "Span") -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "start": self.start,
+            "duration_ms": round(root.duration_ms, 3),
+            "error": self.error,
+            "dropped_spans": self.dropped_spans,
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_perf", "duration_ms", "attributes", "error", "_token")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_perf = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error):
+        """Mark the span (and so its trace) as failed; error is an exception or a message"""
+        message = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        self.error = message[:500]
+        self.trace.error = True
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        _current_span.reset(self._token)
+        finish_span(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.trace.start + (self.start_perf - self.trace.start_perf),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def span(name: str, **attributes):
+    """Child span of the current span (use with `with`); no-op outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    trace = parent.trace
+    if len(trace.spans) >= TRACE_MAX_SPANS:
+        trace.dropped_spans += 1
+        return NOOP_SPAN
+    return Span(trace, name, parent.span_id, attributes)
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Child span that is not made current (for callbacks with separate start/end hooks)"""
+    child = span(name, **attributes)
+    return child if child is not NOOP_SPAN else None
+
+
+def finish_span(finished: Optional[Span]):
+    if finished is None or finished.duration_ms is not None:
+        return
+    finished.duration_ms = (time.perf_counter() - finished.start_perf) * 1000
+    finished.trace.spans.append(finished)
+
+
+class TraceExporter:
+    """Serializes kept traces and appends them to a JSON lines file from a background thread"""
+
+    def __init__(self, path: str = TRACE_EXPORT_PATH, maxsize: int = TRACE_BUFFER_SIZE, flush_interval: float = TRACE_FLUSH_INTERVAL):
+        self.path = path
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.pending: "deque[Span]" = deque()
+        self.exported = 0
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def submit(self, root: Span):
+        if len(self.pending) >= self.maxsize:
+            self.dropped += 1
+        else:
+            self.pending.append(root)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines = []
+        while self.pending:
+            root = self.pending.popleft()
+            lines.append(orjson.dumps(root.trace.to_dict(root), default=str) + b"\n")
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(b"".join(lines))
+            self.exported += len(lines)
+        except OSError as e:
+            self.dropped += len(lines)
+            print(f"[!] Trace export failed: {e}")
+
+
+class Tracer:
+    def __init__(self, exporter: TraceExporter, sample_rate: float = TRACE_SAMPLE_RATE, slow_ms: float = TRACE_SLOW_MS, enabled: bool = TRACING_ENABLED):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.enabled = enabled
+        self.started = 0
+        self.kept = 0
+
+    def start_trace(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes) -> Span:
+        """Root span of a new trace, made current until end_trace"""
+        root = Span(Trace(trace_id or f"{random.getrandbits(128):032x}"), name, parent_id, attributes)
+        root._token = _current_span.set(root)
+        self.started += 1
+        return root
+
+    def end_trace(self, root: Span):
+        _current_span.reset(root._token)
+        finish_span(root)
+        trace = root.trace
+        if not (trace.error or root.duration_ms >= self.slow_ms or random.random() < self.sample_rate):
+            return
+        self.kept += 1
+        self.exporter.submit(root)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "kept": self.kept,
+            "exported": self.exporter.exported,
+            "dropped": self.exporter.dropped,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+        }
+
+
+tracer = Tracer(TraceExporter())
+
+
+def instrument_engine(engine):
+    """Add a db.query span per SQL statement executed on a (sync) engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._trace_span = start_span("db.query", statement=statement[:MAX_STATEMENT_LENGTH], executemany=executemany)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            finished = getattr(context, "_trace_span", None)
+            if finished is not None:
+                finished.set(rows=cursor.rowcount)
+            finish_span(finished)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        context = exception_context.execution_context
+        failed = getattr(context, "_trace_span", None) if context is not None else None
+        if failed is not None:
+            failed.record_error(exception_context.original_exception)
+            finish_span(failed)
+
+
+def summarize(path: str, top: int = 10):
+    """Per-stage latency percentiles and the slowest traces in an export file"""
+    durations: Dict[str, List[float]] = {}
+    traces = []
+    with open(path, "rb") as f:
+        for line in f:
+            trace = orjson.loads(line)
+            traces.append((trace["duration_ms"], trace["name"], trace["trace_id"]))
+            for s in trace["spans"]:
+                durations.setdefault(s["name"], []).append(s["duration_ms"])
+
+    print(f"{len(traces)} traces")
+    print(f"{'span':40s} {'count':>7s} {'p50 ms':>10s} {'p95 ms':>10s} {'max ms':>10s}")
+    for name, values in sorted(durations.items(), key=lambda item: -sorted(item[1])[int(len(item[1]) * 0.95)]):
+        values.sort()
+        print(f"{name[:40]:40s} {len(values):7d} {values[len(values) // 2]:10.1f} {values[int(len(values) * 0.95)]:10.1f} {values[-1]:10.1f}")
+    print("\nslowest traces")
+    for duration, name, trace_id in sorted(traces, reverse=True)[:top]:
+        print(f"  {duration:10.1f}ms  {name}  {trace_id}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "summarize":
+        summarize(sys.argv[2] if len(sys.argv) > 2 else TRACE_EXPORT_PATH)
+    else:
+        print("Usage: python -m tracing summarize [traces.jsonl]")
+        sys.exit(1)